@@ -0,0 +1,13 @@
+"""
+OCR extraction with Tesseract (tha+eng), offline, one process per CPU core
+Usage: python Extract_Inv_tesseract.py <source_dir> <output_dir> <page_config> [document_type]
+
+Tesseract: TESSERACT_PATH / TESSERACT_WORKERS environment variables, Poppler: POPPLER_PATH
+Output: <name>_pageN.txt, <name>_pageN.fields.json and summary_ocr_tesseract.xlsx in output_dir
+"""
+import sys
+
+from ocr_core import main
+
+if __name__ == "__main__":
+    sys.exit(main("tesseract"))
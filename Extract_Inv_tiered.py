@@ -0,0 +1,15 @@
+"""
+Tiered OCR extraction: cheap engine first, escalate only pages that fail validation
+Usage: python Extract_Inv_tiered.py <source_dir> <output_dir> <page_config> [document_type]
+
+Tiers: OCR_TIERS environment variable, e.g. "text,typhoon" (default), "tesseract,ollama",
+"text,tesseract,typhoon". A page is escalated when a required field is missing or the
+tax ID / amount does not validate.
+Output: <name>_pageN.txt, <name>_pageN.fields.json and summary_ocr_tiered.xlsx (with "OCR Tier")
+"""
+import sys
+
+from ocr_core import main
+
+if __name__ == "__main__":
+    sys.exit(main("tiered"))
@@ -5,7 +5,6 @@ import sys
 import base64
 import platform
 import subprocess
-import openpyxl
 import re
 import io 
 import time 
@@ -32,22 +31,39 @@ try:
 except ImportError:
     HAS_PDF_VIEWER = False
 
-# --- Library สำหรับ PDF Text Search (PyMuPDF) ---
+# --- Library สำหรับหาตำแหน่งข้อความใน PDF แบบ scan (pytesseract) ---
 try:
-    import fitz  # PyMuPDF
-    HAS_PYMUPDF = True
+    import pytesseract
+    HAS_PYTESSERACT = True
 except ImportError:
-    HAS_PYMUPDF = False
-    # Warning จะแสดงเมื่อมีการใช้งานจริง (ใน find_text_bbox_in_pdf)
+    HAS_PYTESSERACT = False
 
 # --- CONFIGURATION (Cross-Platform) ---
 import shutil
+from ocr_core.config import PREFETCH_ROWS, HIGHLIGHT_WORKERS, VIEWER_OVERLAY
+from ocr_core.raster import PageRasterCache, PagePrefetcher
+from ocr_core.assets import StaticAssets
+from ocr_core.tiles import PageTiles, pyramid_dpi, BASE_DPI
+from ocr_core.workbook import WorkbookCache, source_identity
+from ocr_core import highlight
+from ocr_core.highlight import find_text_bbox, load_field_span, HighlightPrecompute, HighlightJobs, \
+    HIGHLIGHT_SKIP_COLUMNS
+from ocr_core.vendor import VendorMasterStore, clean_tax_id, clean_branch, vendor_suggestions, \
+    remap_vendor_codes
 
 # ใช้ path แบบ relative กับตำแหน่งที่ app.py อยู่
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 VENDOR_MASTER_PATH = os.path.join(SCRIPT_DIR, "Vendor_branch.xlsx")
 CONFIG_FILE = "config.json"
 
+# โหมด OCR -> สคริปต์ที่ใช้รัน (ทุกสคริปต์ใช้ ocr_core และให้ผลลัพธ์รูปแบบเดียวกัน)
+OCR_SCRIPTS = {
+    "API Typhoon": "Extract_Inv.py",
+    "Local Typhoon": "Extract_Inv_local.py",
+    "Tesseract (Offline)": "Extract_Inv_tesseract.py",
+    "Tiered (Auto)": "Extract_Inv_tiered.py",
+}
+
 def get_default_output_path():
     """Get default output path based on operating system"""
     if platform.system() == 'Windows':
@@ -417,8 +433,6 @@ if 'loaded_file_path' not in st.session_state:
     st.session_state.loaded_file_path = None
 if 'doc_editor_path' not in st.session_state:
     st.session_state.doc_editor_path = get_default_output_path()
-if 'vendor_master_df' not in st.session_state: 
-    st.session_state.vendor_master_df = None
 if 'data_version' not in st.session_state: 
     st.session_state.data_version = 0
 if 'highlighted_field' not in st.session_state:
@@ -858,896 +872,170 @@ def save_txt_local(df, default_name, start_path, delimiter='\t'):
     except Exception as e:
         return False, f"Error saving text file: {e}"
 
-def find_text_bbox_in_pdf(pdf_path, search_text, page_num, field_name=None):
+def ocr_output_dirs():
+    """โฟลเดอร์ที่อาจมีไฟล์ _pageN.txt / .fields.json / .boxes.json (นอกจากโฟลเดอร์ของ PDF)"""
+    return [st.session_state.get('ocr_output_folder', DEFAULT_OUTPUT_PATH), DEFAULT_OUTPUT_PATH]
+
+def find_ocr_txt_path(pdf_path, page_num):
+    """หาไฟล์ <ชื่อ PDF>_pageN.txt ที่ OCR สร้างไว้ (โฟลเดอร์เดียวกับ PDF / output folder)"""
+    return highlight.find_ocr_txt_path(pdf_path, page_num, ocr_output_dirs())
+
+def ocr_boxes_dir(pdf_path, page_num):
+    """โฟลเดอร์ของ sidecar _pageN.boxes.json: ที่เดียวกับ _pageN.txt ถ้ามี ไม่งั้น output folder"""
+    return highlight.ocr_boxes_dir(pdf_path, page_num, ocr_output_dirs())
+
+@st.cache_resource
+def get_raster_cache():
     """
-    หา bounding box ของ text ใน PDF ด้วย Tesseract OCR
-    Args:
-        pdf_path: path to PDF file
-        search_text: text to search for
-        page_num: page number (1-indexed)
-        field_name: name of the field (e.g., "Description") - used to adjust bounding box size
-    Returns: list of dicts with 'x0', 'y0', 'x1', 'y1', 'page', 'text', 'method', 'page_width', 'page_height'
+    Cache ภาพหน้า PDF ที่ render แล้ว ใช้ร่วมกันทุก session (render_pdf + find_text_bbox_in_pdf)
+    ขนาดใน memory: OCR_RASTER_CACHE_MB, เก็บลง disk ด้วยถ้าตั้ง OCR_RASTER_CACHE_DIR
     """
-    positions = []
-    
-    if not search_text or not str(search_text).strip():
-        return positions
-    
-    # Clean search text
-    search_str = str(search_text).strip()
-    if search_str.isdigit() or re.match(r'^[\d\-\s]+$', search_str):
-        clean_search = re.sub(r'\D', '', search_str)
-    else:
-        clean_search = search_str
-    
-    if not clean_search:
-        return positions
-    
-    # สำหรับ Description field: ใช้ bounding box ที่กำหนดไว้เลย (ไม่ต้องรัน OCR)
-    if field_name and 'description' in str(field_name).lower():
-        # หา page dimensions จาก PDF
-        if HAS_PYMUPDF:
-            try:
-                doc = fitz.open(pdf_path)
-                if page_num > 0 and page_num <= len(doc):
-                    page = doc[page_num - 1]
-                    page_rect = page.rect
-                    page_width = page_rect.width
-                    page_height = page_rect.height
-                    doc.close()
-                    
-                    # กำหนด bounding box สำหรับ Description
-                    new_x0 = 40.0
-                    original_width_ratio = 0.60  # 60% ของความกว้างหน้า
-                    new_x1 = new_x0 + (page_width * original_width_ratio)
-                    new_y0 = 290.0
-                    line_height = 20
-                    new_y1 = new_y0 + (line_height * 5.5)  # 110 points
-                    
-                    # จำกัดให้อยู่ในขอบเขตของหน้า
-                    new_x0 = max(0, min(new_x0, page_width - 100))
-                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-                    
-                    positions.append({
-                        'x0': float(new_x0),
-                        'y0': float(new_y0),
-                        'x1': float(new_x1),
-                        'y1': float(new_y1),
-                        'page': page_num,
-                        'text': search_str,
-                        'method': 'description_fixed',
-                        'page_width': float(page_width),
-                        'page_height': float(page_height)
-                    })
-                    return positions
-            except Exception as e:
-                print(f"[DEBUG] Error getting page dimensions for Description: {e}")
-                # Fall through to OCR methods if error
-    
-    # สำหรับ Sales Promotion field: ใช้ bounding box ที่กำหนดไว้เลย (ไม่ต้องรัน OCR)
-    if field_name and ('sales' in str(field_name).lower() and 'promotion' in str(field_name).lower()):
-        # หา page dimensions จาก PDF
-        if HAS_PYMUPDF:
-            try:
-                doc = fitz.open(pdf_path)
-                if page_num > 0 and page_num <= len(doc):
-                    page = doc[page_num - 1]
-                    page_rect = page.rect
-                    page_width = page_rect.width
-                    page_height = page_rect.height
-                    doc.close()
-                    
-                    # กำหนด bounding box สำหรับ Sales Promotion
-                    # คำนวณขนาดเดิม (หลังจากลด 50% แล้ว)
-                    base_width = 156.0  # width หลังจากลด 50%
-                    base_height = 50.0  # height หลังจากลด 50%
-                    
-                    # ขยายขนาดขึ้น 30%
-                    new_width = base_width * 1.3  # 156 * 1.3 = 202.8
-                    new_height = base_height * 1.3  # 50 * 1.3 = 65
-                    
-                    # x0 = 20 (เลื่อนมาทางซ้าย)
-                    new_x0 = 20.0
-                    new_x1 = new_x0 + new_width  # 20 + 202.8 = 222.8
-                    
-                    # y0 = 510 (คงเดิม)
-                    new_y0 = 510.0
-                    new_y1 = new_y0 + new_height  # 510 + 65 = 575
-                    
-                    # จำกัดให้อยู่ในขอบเขตของหน้า
-                    new_x0 = max(0, min(new_x0, page_width - 10))
-                    new_x1 = max(new_x0 + 10, min(new_x1, page_width))
-                    new_y0 = max(0, min(new_y0, page_height - 10))
-                    new_y1 = max(new_y0 + 10, min(new_y1, page_height))
-                    
-                    positions.append({
-                        'x0': float(new_x0),
-                        'y0': float(new_y0),
-                        'x1': float(new_x1),
-                        'y1': float(new_y1),
-                        'page': page_num,
-                        'text': search_str,
-                        'method': 'sales_promotion_fixed',
-                        'page_width': float(page_width),
-                        'page_height': float(page_height)
-                    })
-                    return positions
-            except Exception as e:
-                print(f"[DEBUG] Error getting page dimensions for Sales Promotion: {e}")
-                # Fall through to OCR methods if error
-    
-    # วิธีที่ 1: ใช้ Tesseract OCR เพื่อหา bounding box ที่แม่นยำ
+    return PageRasterCache()
+
+@st.cache_resource
+def get_page_prefetcher():
+    """
+    Background thread เดียวต่อ process สำหรับ render หน้า PDF ของแถวข้างเคียงล่วงหน้า
+    (รวมถึงตัด tile ของ level ที่ viewer จะใช้ เมื่อแสดงแบบ tile - เปลี่ยนแถวแล้วไม่ต้องรอ)
+    """
+    tiles = get_page_tiles() if VIEWER_OVERLAY and static_serving_enabled() else None
+    return PagePrefetcher(get_raster_cache(), tiles)
+
+@st.cache_resource
+def get_page_assets():
+    """
+    tile ของหน้า PDF เป็นไฟล์ PNG ใน static/pages (ชื่อไฟล์ = hash ของเนื้อหา) ให้ browser โหลดจาก URL และ cache ไว้
+    ขนาดรวมไม่เกิน OCR_STATIC_CACHE_MB
+    """
+    return StaticAssets("pages")
+
+@st.cache_resource
+def get_file_assets():
+    """สำเนาไฟล์ PDF ใน static/files สำหรับโหมด iframe (browser cache ไว้ ไม่ต้องส่ง base64 ทุก rerun)"""
+    return StaticAssets("files")
+
+def static_serving_enabled():
+    """Streamlit เสิร์ฟโฟลเดอร์ static/ ที่ app/static/ หรือไม่ (server.enableStaticServing ใน .streamlit/config.toml)"""
     try:
-        import pytesseract
-        from pdf2image import convert_from_path
-        from PIL import Image
-        
-        # Set Tesseract path
-        if TESSERACT_PATH and os.path.exists(TESSERACT_PATH):
-            pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
-        
-        # Convert PDF page to image
-        images = convert_from_path(
-            pdf_path,
-            first_page=page_num,
-            last_page=page_num,
-            dpi=150,
-            poppler_path=POPPLER_PATH if POPPLER_PATH else None
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+@st.cache_resource
+def get_page_tiles():
+    """Tile pyramid ของหน้า PDF (render ครั้งเดียวต่อ level แล้วตัดเป็น tile ลง static/pages)"""
+    return PageTiles(get_raster_cache(), get_page_assets())
+
+def highlight_overlay_svg(highlight_positions, page_num, level):
+    """
+    กรอบ highlight เป็น SVG วางทับภาพหน้า PDF: viewBox เป็นขนาด pixel ของ level (ขนาดเดียวกับภาพ tile)
+    positions (พิกัดของ page_width x page_height) ถูกแปลงเป็น pixel ของ level
+    padding/เส้นขอบคิดเป็น pixel ที่ 150 DPI ใน viewBox จึงย่อ/ขยายไปพร้อมภาพ (เหมือนวาดลงภาพ)
+    """
+    boxes = [pos for pos in (highlight_positions or []) if pos.get('page') == page_num]
+    if not boxes:
+        return ""
+    level_width, level_height = level['width'], level['height']
+    scale_x = level_width / float(boxes[0].get('page_width', 595))
+    scale_y = level_height / float(boxes[0].get('page_height', 842))
+    unit = level['dpi'] / BASE_DPI  # 1 pixel ที่ 150 DPI ในหน่วยของ viewBox
+    padding = 8 * unit
+    rects = []
+    for pos in boxes:
+        x0, y0, x1, y1 = pos['x0'], pos['y0'], pos['x1'], pos['y1']
+        if x1 <= x0 or y1 <= y0:
+            continue  # กรอบว่าง/กลับด้าน ข้ามไป
+        x0 = max(0, min(x0 * scale_x - padding, level_width - unit))
+        y0 = max(0, min(y0 * scale_y - padding, level_height - unit))
+        x1 = max(x0 + 10 * unit, min(x1 * scale_x + padding, level_width))
+        y1 = max(y0 + 10 * unit, min(y1 * scale_y + padding, level_height))
+        # กรอบแดงหนา 5px ด้านนอก + เส้นในสีอ่อน (เหมือนที่เคยวาดลงภาพ)
+        rects.append(
+            f'<rect x="{x0 - 2 * unit:.2f}" y="{y0 - 2 * unit:.2f}" width="{x1 - x0 + 4 * unit:.2f}" '
+            f'height="{y1 - y0 + 4 * unit:.2f}" fill="none" stroke="red" stroke-width="{5 * unit:.2f}"/>'
         )
-        
-        if not images:
-            raise Exception("Failed to convert PDF to image")
-        
-        img = images[0]
-        img_width, img_height = img.size
-        
-        # Run Tesseract OCR with bounding box data
-        # Output format: TSV with columns: level, page_num, block_num, par_num, line_num, word_num, left, top, width, height, conf, text
-        ocr_data = pytesseract.image_to_data(img, lang='tha+eng', output_type=pytesseract.Output.DICT)
-        
-        # สำหรับข้อความยาวๆ (multi-word) ใช้วิธีค้นหาคำหลายคำและรวม bounding boxes
-        # แต่สำหรับคำเดียวหรือข้อความสั้นๆ ใช้วิธีเดิม
-        search_words = clean_search.split()
-        is_multi_word = len(search_words) > 1
-        
-        if is_multi_word and len(clean_search) > 10:
-            # Multi-word search: หาคำต่างๆ ใน OCR results และรวม bounding boxes
-            # สร้าง list ของ words พร้อม indices
-            word_boxes = []
-            for i, text in enumerate(ocr_data['text']):
-                if not text.strip():
-                    continue
-                ocr_text_clean = text.strip()
-                conf = ocr_data['conf'][i]
-                if conf < 30:
-                    continue
-                
-                word_boxes.append({
-                    'text': ocr_text_clean,
-                    'x': ocr_data['left'][i],
-                    'y': ocr_data['top'][i],
-                    'w': ocr_data['width'][i],
-                    'h': ocr_data['height'][i],
-                    'conf': conf,
-                    'line': ocr_data['line_num'][i],
-                    'index': i
-                })
-            
-            # ค้นหาลำดับคำที่ match กับ search_words
-            # ใช้ sliding window เพื่อหาลำดับคำที่ติดกัน
-            best_match = None
-            best_score = 0
-            
-            for start_idx in range(len(word_boxes)):
-                matched_words = []
-                search_idx = 0
-                
-                for word_box_idx in range(start_idx, len(word_boxes)):
-                    word_box = word_boxes[word_box_idx]
-                    search_word = search_words[search_idx] if search_idx < len(search_words) else None
-                    
-                    if not search_word:
-                        break
-                    
-                    # เปรียบเทียบคำ
-                    if (search_word.lower() in word_box['text'].lower() or 
-                        word_box['text'].lower() in search_word.lower() or
-                        (len(search_word) >= 3 and len(word_box['text']) >= 3 and 
-                         search_word[:3].lower() == word_box['text'][:3].lower())):
-                        matched_words.append(word_box)
-                        search_idx += 1
-                        
-                        # ถ้า match ครบทุกคำ
-                        if search_idx >= len(search_words):
-                            # คำนวณ bounding box รวม
-                            min_x = min(w['x'] for w in matched_words)
-                            min_y = min(w['y'] for w in matched_words)
-                            max_x = max(w['x'] + w['w'] for w in matched_words)
-                            max_y = max(w['y'] + w['h'] for w in matched_words)
-                            avg_conf = sum(w['conf'] for w in matched_words) / len(matched_words)
-                            
-                            match_score = 100 if search_idx == len(search_words) else int((search_idx / len(search_words)) * 100)
-                            
-                            if match_score > best_score:
-                                best_score = match_score
-                                best_match = {
-                                    'x0': float(min_x),
-                                    'y0': float(min_y),
-                                    'x1': float(max_x),
-                                    'y1': float(max_y),
-                                    'page': page_num,
-                                    'text': clean_search,
-                                    'method': 'tesseract_ocr_multiword',
-                                    'confidence': float(avg_conf),
-                                    'match_score': match_score,
-                                    'page_width': float(img_width),
-                                    'page_height': float(img_height)
-                                }
-                                
-                                # สำหรับ Description field: ขยาย bounding box
-                                if field_name and 'description' in str(field_name).lower():
-                                    new_x0 = 40.0  # x0 = 40 (คงที่)
-                                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                                    original_width_ratio = 0.60  # 70% - 10% = 60%
-                                    new_x1 = new_x0 + (img_width * original_width_ratio)
-                                    line_height = 20
-                                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
-                                    new_y0 = 290.0  # y0 = 290
-                                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                                    new_x0 = max(0, min(new_x0, img_width - 100))
-                                    new_x1 = max(new_x0 + 100, min(new_x1, img_width))
-                                    new_y1 = max(new_y0 + 20, min(new_y1, img_height))
-                                    best_match['x0'] = float(new_x0)
-                                    best_match['x1'] = float(new_x1)
-                                    best_match['y0'] = float(new_y0)
-                                    best_match['y1'] = float(new_y1)
-                            break
-                    else:
-                        # ถ้าไม่ match ให้เริ่มใหม่จากคำถัดไป
-                        break
-            
-            if best_match and best_score >= 70:
-                positions.append(best_match)
-        
-        else:
-            # Single word หรือ short text search: ใช้วิธีเดิม
-            for i, text in enumerate(ocr_data['text']):
-                if not text.strip():
-                    continue
-                
-                # Clean OCR text for comparison
-                ocr_text_clean = text.strip()
-                if ocr_text_clean.isdigit() or re.match(r'^[\d\-\s]+$', ocr_text_clean):
-                    ocr_text_clean = re.sub(r'\D', '', ocr_text_clean)
-                
-                # Skip if too short
-                if len(ocr_text_clean) < 3:
-                    continue
-                
-                # Check if match - ใช้ exact match หรือ high similarity
-                is_match = False
-                match_score = 0
-                
-                # Exact match (best)
-                if clean_search == ocr_text_clean:
-                    is_match = True
-                    match_score = 100
-                # Full search text found in OCR text (good for long strings)
-                elif len(clean_search) >= 8 and clean_search in ocr_text_clean:
-                    is_match = True
-                    match_score = 90
-                # OCR text is complete substring of search (good)
-                elif len(ocr_text_clean) >= 8 and ocr_text_clean in clean_search:
-                    is_match = True
-                    match_score = 85
-                # High overlap for shorter strings (>70% match)
-                elif len(clean_search) >= 5 and len(ocr_text_clean) >= 5:
-                    # Calculate overlap ratio
-                    if clean_search in ocr_text_clean or ocr_text_clean in clean_search:
-                        overlap = min(len(clean_search), len(ocr_text_clean))
-                        ratio = overlap / max(len(clean_search), len(ocr_text_clean))
-                        if ratio >= 0.7:
-                            is_match = True
-                            match_score = int(ratio * 80)
-                
-                if not is_match:
-                    continue
-                
-                # Get bounding box from Tesseract
-                x = ocr_data['left'][i]
-                y = ocr_data['top'][i]
-                w = ocr_data['width'][i]
-                h = ocr_data['height'][i]
-                conf = ocr_data['conf'][i]
-                
-                # Skip low confidence results
-                if conf < 30:
-                    continue
-                
-                # Convert image coordinates to PDF coordinates (same scale for pdf2image)
-                pos = {
-                    'x0': float(x),
-                    'y0': float(y),
-                    'x1': float(x + w),
-                    'y1': float(y + h),
-                    'page': page_num,
-                    'text': text.strip(),
-                    'method': 'tesseract_ocr',
-                    'confidence': float(conf),
-                    'match_score': match_score,
-                    'page_width': float(img_width),
-                    'page_height': float(img_height)
-                }
-                
-                # สำหรับ Description field: ขยาย bounding box
-                if field_name and 'description' in str(field_name).lower():
-                    new_x0 = 40.0  # x0 = 40 (คงที่)
-                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                    original_width_ratio = 0.60  # 70% - 10% = 60%
-                    new_x1 = new_x0 + (img_width * original_width_ratio)
-                    line_height = 20
-                    # y0 = 290 (เลื่อนลงมา)
-                    new_y0 = 290.0  # y0 = 290
-                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                    new_x0 = max(0, min(new_x0, img_width - 100))
-                    new_x1 = max(new_x0 + 100, min(new_x1, img_width))
-                    new_y1 = max(new_y0 + 20, min(new_y1, img_height))
-                    pos['x0'] = float(new_x0)
-                    pos['x1'] = float(new_x1)
-                    pos['y0'] = float(new_y0)
-                    pos['y1'] = float(new_y1)
-                
-                positions.append(pos)
-        
-        # ถ้าเจอแล้ว filter และเลือก best matches
-        if positions:
-            # Debug: แสดงข้อมูล matches ทั้งหมด
-            print(f"\n[DEBUG] Tesseract found {len(positions)} potential matches for '{clean_search}':")
-            for idx, p in enumerate(positions):
-                print(f"  {idx+1}. Text='{p.get('text')}' | Match={p.get('match_score')}% | Conf={p.get('confidence'):.0f}% | Pos=({p.get('x0'):.0f},{p.get('y0'):.0f})")
-            
-            # Sort by match_score (descending) then confidence (descending)
-            positions.sort(key=lambda p: (p.get('match_score', 0), p.get('confidence', 0)), reverse=True)
-            
-            # เอาแค่ top 3 matches หรือ matches ที่มี score เท่ากับ max score
-            if len(positions) > 0:
-                max_score = positions[0].get('match_score', 0)
-                # เอา matches ที่มี score ใกล้เคียง max (ต่างกันไม่เกิน 10)
-                filtered = [p for p in positions if p.get('match_score', 0) >= max_score - 10]
-                # จำกัดไม่เกิน 3 boxes
-                positions = filtered[:3]
-                print(f"[DEBUG] Selected top {len(positions)} match(es) with max_score={max_score}")
-                
-                # สำหรับ Description field: ขยาย bounding box ก่อน return
-                if field_name and 'description' in str(field_name).lower():
-                    for pos in positions:
-                        page_width = pos.get('page_width', 595)
-                        page_height = pos.get('page_height', 842)
-                        new_x0 = 40.0  # x0 = 40 (คงที่)
-                        # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                        original_width_ratio = 0.60  # 70% - 10% = 60%
-                        new_x1 = new_x0 + (page_width * original_width_ratio)
-                        line_height = 20
-                        # y0 = 290 (เลื่อนลงมา)
-                        new_y0 = 290.0  # y0 = 290
-                        new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                        new_x0 = max(0, min(new_x0, page_width - 100))
-                        new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-                        new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-                        pos['x0'] = float(new_x0)
-                        pos['x1'] = float(new_x1)
-                        pos['y0'] = float(new_y0)
-                        pos['y1'] = float(new_y1)
-            
-            return positions
-            
-    except ImportError:
-        st.info("💡 Install Tesseract OCR for accurate text positioning: `pip install pytesseract` and install Tesseract binary")
-    except Exception as e:
-        print(f"[DEBUG] Tesseract OCR failed: {e}")
-        # Fall through to other methods
-    
-    # วิธีที่ 1: ลองค้นหาใน PDF text layer ก่อน (สำหรับ PDF ที่มี text)
-    if HAS_PYMUPDF:
-        try:
-            doc = fitz.open(pdf_path)
-            if page_num > 0 and page_num <= len(doc):
-                page = doc[page_num - 1]
-                
-                # ค้นหา text instances ใน PDF
-                text_instances = page.search_for(clean_search)
-                
-                # ถ้าไม่เจอ ลองค้นหาแบบ partial
-                if not text_instances and len(clean_search) > 3:
-                    parts = re.findall(r'\d+', clean_search)
-                    if parts:
-                        for part in parts:
-                            if len(part) >= 4:
-                                partial_instances = page.search_for(part)
-                                text_instances.extend(partial_instances)
-                
-                if text_instances:
-                    # Get page dimensions
-                    page_rect = page.rect
-                    page_width = page_rect.width
-                    page_height = page_rect.height
-                    
-                    for inst in text_instances:
-                        pos = {
-                            'x0': float(inst.x0),
-                            'y0': float(inst.y0),
-                            'x1': float(inst.x1),
-                            'y1': float(inst.y1),
-                            'page': page_num,
-                            'text': clean_search,
-                            'method': 'pdf_text_layer',
-                            'page_width': float(page_width),
-                            'page_height': float(page_height)
-                        }
-                        
-                        # สำหรับ Description field: ขยาย bounding box ให้ครอบคลุมข้อความทั้งหมด
-                        if field_name and 'description' in str(field_name).lower():
-                            # x0 = 40 (คงที่)
-                            new_x0 = 40.0
-                            # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                            original_width_ratio = 0.60  # 70% - 10% = 60%
-                            new_x1 = new_x0 + (page_width * original_width_ratio)
-                            
-                            # ขยายความสูง: ครอบคลุม 5.5 บรรทัด (ประมาณ 110 points)
-                            # y0 = 290 (เลื่อนลงมา)
-                            line_height = 20
-                            new_y0 = 290.0  # y0 = 290
-                            new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                            
-                            # จำกัดให้อยู่ในขอบเขตของหน้า
-                            new_x0 = max(0, min(new_x0, page_width - 100))
-                            new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-                            new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-                            
-                            # อัพเดท bounding box
-                            pos['x0'] = float(new_x0)
-                            pos['x1'] = float(new_x1)
-                            pos['y0'] = float(new_y0)
-                            pos['y1'] = float(new_y1)
-                        
-                        positions.append(pos)
-            
-            doc.close()
-            
-            # ถ้าเจอแล้ว return
-            if positions:
-                return positions
-        except Exception as e:
-            # ถ้า error ในการอ่าน PDF text layer ให้ลองวิธีอื่น
-            pass
+        if x1 > x0 + 6 * unit and y1 > y0 + 6 * unit:
+            rects.append(
+                f'<rect x="{x0 + 3 * unit:.2f}" y="{y0 + 3 * unit:.2f}" width="{x1 - x0 - 6 * unit:.2f}" '
+                f'height="{y1 - y0 - 6 * unit:.2f}" fill="none" stroke="#FF8888" stroke-width="{2 * unit:.2f}"/>'
+            )
+    return (
+        f'<svg viewBox="0 0 {level_width} {level_height}" preserveAspectRatio="none" '
+        f'style="position: absolute; left: 0; top: 0; width: 100%; height: 100%; pointer-events: none;">'
+        + "".join(rects) + '</svg>'
+    )
+
+def render_pdf_overlay(file_path, page_num=1, highlight_positions=None, zoom_level=1.0):
+    """
+    แสดงหน้า PDF เป็น tile จาก static URL (browser โหลดครั้งเดียวแล้ว cache) และวาด highlight เป็น SVG ทับ
+    เปลี่ยน field ที่ highlight ส่งไปแค่พิกัดกรอบไม่กี่ byte ไม่ต้องวาดภาพและ encode ใหม่
+    zoom ใช้ level ของ pyramid ที่ใกล้ที่สุด (browser ย่อ/ขยายเอง) และ tile ที่อยู่นอกจอยังไม่ถูกโหลด (loading="lazy")
+    """
+    dpi = pyramid_dpi(zoom_level)
+    level = get_page_tiles().level(file_path, page_num, dpi, POPPLER_PATH)
+    level_width, level_height = level['width'], level['height']
     
-    # วิธีที่ 2: สำหรับ PDF แบบ scan - อ่านจากไฟล์ .txt ที่ OCR สร้างไว้
-    try:
-        # หาไฟล์ .txt ที่เกี่ยวข้อง
-        pdf_dir = os.path.dirname(pdf_path)
-        pdf_basename = os.path.splitext(os.path.basename(pdf_path))[0]
-        txt_filename = f"{pdf_basename}_page{page_num}.txt"
-        
-        # ลองหาใน output folder ก่อน
-        possible_txt_paths = [
-            os.path.join(pdf_dir, txt_filename),  # ในโฟลเดอร์เดียวกับ PDF
-            os.path.join(st.session_state.get('ocr_output_folder', DEFAULT_OUTPUT_PATH), txt_filename),  # ใน output folder
-            os.path.join(DEFAULT_OUTPUT_PATH, txt_filename),  # ใน default output folder
-        ]
-        
-        txt_path = None
-        for path in possible_txt_paths:
-            if os.path.exists(path):
-                txt_path = path
-                break
-        
-        if txt_path and os.path.exists(txt_path):
-            # อ่านไฟล์ .txt
-            with open(txt_path, 'r', encoding='utf-8') as f:
-                ocr_text = f.read()
-            
-            # ทำความสะอาด search_text เพื่อเปรียบเทียบกับ OCR text (ลบ HTML tags)
-            # แต่เก็บ original search_text ไว้สำหรับ highlight
-            search_for_matching = clean_search
-            # ลบ HTML tags จาก search text (ถ้ามี) เพื่อให้ match ได้ดีขึ้น
-            search_clean_html = re.sub(r'<[^>]+>', ' ', search_for_matching)
-            search_clean_html = re.sub(r'\s+', ' ', search_clean_html).strip()
-            
-            # สร้าง clean version ของ OCR text เพื่อค้นหา
-            ocr_text_clean = re.sub(r'<br/?>', ' ', ocr_text)
-            ocr_text_clean = re.sub(r'<[^>]+>', '', ocr_text_clean)
-            ocr_text_clean = re.sub(r'\s+', ' ', ocr_text_clean)
-            
-            # ค้นหาโดยใช้ลำดับความสำคัญ:
-            # 1. Exact match ใน clean text (ดีที่สุด)
-            # 2. Exact match ใน original text
-            # 3. Partial match ที่ครอบคลุมมากที่สุด (สำหรับข้อความยาวๆ)
-            found_match = None
-            used_pattern = None
-            match_quality = 0  # 0=not found, 1=partial, 2=exact clean, 3=exact original
-            
-            # สำหรับ Sales Promotion - ตรวจสอบ keyword เพื่อหาเฉพาะบรรทัดที่ถูกต้อง
-            is_sales_promotion = 'ค่าส่งเสริมการขาย' in search_clean_html or 'Sales Promotion' in search_for_matching
-            
-            # วิธีที่ 1: Exact match ใน clean text (ดีที่สุด - ไม่มี HTML tags)
-            if search_clean_html:
-                # สำหรับ Sales Promotion ให้หาเฉพาะบรรทัดที่มี "ค่าส่งเสริมการขาย" โดยไม่รวม "หมายเหตุ"
-                if is_sales_promotion:
-                    # แบ่งเป็นบรรทัดทั้ง clean และ original
-                    ocr_lines_clean = ocr_text_clean.split('\n')
-                    ocr_lines_orig = ocr_text.split('\n')
-                    
-                    for line_idx, line_clean in enumerate(ocr_lines_clean):
-                        # ตรวจสอบว่าเป็นบรรทัดที่มี "ค่าส่งเสริมการขาย" และไม่มี "หมายเหตุ"
-                        if 'ค่าส่งเสริมการขาย' in line_clean and 'หมายเหตุ' not in line_clean:
-                            # ตรวจสอบว่า search text อยู่ในบรรทัดนี้
-                            if search_clean_html in line_clean:
-                                # หาในบรรทัดนี้
-                                line_match = re.search(re.escape(search_clean_html), line_clean, re.IGNORECASE)
-                                if line_match:
-                                    # หาบรรทัดที่ตรงกันใน original text
-                                    if line_idx < len(ocr_lines_orig):
-                                        line_orig = ocr_lines_orig[line_idx]
-                                        # ลบ HTML tags จาก original line เพื่อหา position
-                                        line_orig_clean = re.sub(r'<[^>]+>', '', line_orig)
-                                        line_orig_clean = re.sub(r'\s+', ' ', line_orig_clean)
-                                        
-                                        # หา position ใน original line
-                                        orig_line_match = re.search(re.escape(search_clean_html), line_orig_clean, re.IGNORECASE)
-                                        if orig_line_match:
-                                            # คำนวณตำแหน่งใน original full text
-                                            chars_before_line = sum(len(l) + 1 for l in ocr_lines_orig[:line_idx])
-                                            match_start = chars_before_line + orig_line_match.start()
-                                            match_end = chars_before_line + orig_line_match.end()
-                                            
-                                            from collections import namedtuple
-                                            MatchObj = namedtuple('MatchObj', ['start', 'end', 'group'])
-                                            found_match = MatchObj(
-                                                start=match_start, 
-                                                end=match_end, 
-                                                group=lambda: search_clean_html
-                                            )
-                                            match_quality = 3
-                                            break
-                else:
-                    # สำหรับ fields อื่นๆ ใช้วิธีเดิม
-                    exact_match_clean = re.search(re.escape(search_clean_html), ocr_text_clean, re.IGNORECASE)
-                    if exact_match_clean:
-                        found_match = exact_match_clean
-                        match_quality = 3
-                        # แปลงตำแหน่งกลับไปหาใน original text
-                        # หาโดยนับจำนวนตัวอักษรที่ผ่านมา
-                        char_count_before_match = len(ocr_text_clean[:exact_match_clean.start()])
-                        # ค้นหาใน original text โดยใช้ char count ที่ประมาณ
-                        approx_start = 0
-                        clean_idx = 0
-                        for orig_idx, char in enumerate(ocr_text):
-                            if clean_idx >= char_count_before_match:
-                                approx_start = orig_idx
-                                break
-                            if char not in ['<', '>'] and not (orig_idx > 0 and ocr_text[orig_idx-1:orig_idx+1] == '</'):
-                                clean_idx += 1
-                        # สร้าง match object ใหม่ที่มีตำแหน่งใน original text
-                        match_end = approx_start + len(search_clean_html)
-                        # ใช้ original text สำหรับการคำนวณตำแหน่ง
-                        from collections import namedtuple
-                        MatchObj = namedtuple('MatchObj', ['start', 'end', 'group'])
-                        found_match = MatchObj(start=approx_start, end=match_end, group=lambda: search_clean_html)
-            
-            # วิธีที่ 2: Exact match ใน original text (ถ้ายังไม่เจอ)
-            if not found_match or match_quality < 2:
-                exact_match_orig = re.search(re.escape(search_for_matching), ocr_text, re.IGNORECASE)
-                if exact_match_orig:
-                    found_match = exact_match_orig
-                    match_quality = 2
-            
-            # วิธีที่ 3: Partial match ที่ครอบคลุมมากที่สุด (สำหรับข้อความยาวๆ หรือเมื่อ exact ไม่เจอ)
-            if not found_match or (match_quality == 0 and len(search_clean_html) > 30):
-                # สำหรับข้อความยาวๆ ให้หา pattern ที่ครอบคลุมมากที่สุด
-                # ใช้คำสำคัญหลายคำเพื่อหา pattern ที่ถูกต้อง
-                words = search_clean_html.split()
-                if len(words) >= 3:
-                    # ลองหลายแบบ: 3 คำแรก, 5 คำแรก, หรือคำสำคัญ
-                    for num_words in [min(10, len(words)), min(7, len(words)), min(5, len(words)), min(3, len(words))]:
-                        key_phrase = ' '.join(words[:num_words])
-                        pattern = re.escape(key_phrase)
-                        partial_match = re.search(pattern, ocr_text_clean, re.IGNORECASE)
-                        if partial_match:
-                            found_match = partial_match
-                            match_quality = 1
-                            break
-            
-            # ถ้ายังไม่เจอ ให้ลองหาใน original text (ไม่ clean)
-            if not found_match:
-                if search_clean_html:
-                    final_match = re.search(re.escape(search_clean_html[:min(50, len(search_clean_html))]), ocr_text, re.IGNORECASE)
-                    if final_match:
-                        found_match = final_match
-                        match_quality = 1
-            
-            if found_match:
-                # สำหรับ scan PDF เราไม่สามารถหา exact position ได้
-                # แต่เราสามารถสร้าง approximate positions โดยแบ่ง PDF เป็น grid
-                # หรือแสดง highlight แบบ overlay ที่ประมาณตำแหน่ง
-                
-                # ใช้ PyMuPDF เพื่อหา page dimensions
-                if HAS_PYMUPDF:
-                    try:
-                        doc = fitz.open(pdf_path)
-                        if page_num > 0 and page_num <= len(doc):
-                            page = doc[page_num - 1]
-                            page_rect = page.rect
-                            
-                            # ใช้ text position ใน OCR text เพื่อประมาณตำแหน่งใน PDF
-                            # แบ่ง OCR text เป็น lines และหา line ที่มี text
-                            ocr_lines = ocr_text.split('\n')
-                            
-                            # หา line number ของ match ใน original text
-                            match_start = found_match.start()
-                            line_start = ocr_text[:match_start].count('\n')
-                            match_end = found_match.end()
-                            
-                            # หา line ที่ครอบคลุม match (อาจมีหลายบรรทัด)
-                            end_line = ocr_text[:match_end].count('\n')
-                            num_lines = max(1, end_line - line_start + 1)
-                            
-                            # สำหรับ Sales Promotion - ตรวจสอบว่าต้องไม่ match กับ "หมายเหตุ..."
-                            # ถ้า match กับ line ที่มี "หมายเหตุ" ให้ข้ามไปหา line ถัดไป
-                            if line_start < len(ocr_lines):
-                                current_line = ocr_lines[line_start]
-                                if 'หมายเหตุ' in current_line and 'ค่าส่งเสริมการขาย' in search_clean_html:
-                                    # ถ้า match กับ line ที่มี "หมายเหตุ" ให้หา line ถัดไปที่มี "ค่าส่งเสริมการขาย"
-                                    for next_line_idx in range(line_start + 1, min(line_start + 3, len(ocr_lines))):
-                                        if 'ค่าส่งเสริมการขาย' in ocr_lines[next_line_idx]:
-                                            line_start = next_line_idx
-                                            # ปรับ match_end ให้ครอบคลุมทั้งบรรทัด
-                                            match_text = found_match.group(0) if hasattr(found_match, 'group') else search_clean_html
-                                            num_lines = 1
-                                            break
-                            
-                            # นับจำนวนบรรทัดที่มีข้อความจริงๆ (non-empty lines)
-                            total_lines = len([l for l in ocr_lines if l.strip()])
-                            if total_lines > 0:
-                                # คำนวณ Y position (จากบนลงล่าง)
-                                page_height = page_rect.height
-                                page_width = page_rect.width
-                                top_margin = 50
-                                bottom_margin = 50
-                                content_height = page_height - top_margin - bottom_margin
-                                
-                                # คำนวณ Y position จากบรรทัดแรกของ match
-                                line_ratio_start = line_start / max(total_lines, 1)
-                                y0 = top_margin + (line_ratio_start * content_height)
-                                
-                                # คำนวณความสูงของ box ตามจำนวนบรรทัด (ประมาณ 18 points ต่อบรรทัด)
-                                box_height = max(18, num_lines * 18)
-                                
-                                # ตรวจสอบว่ามีหลายบรรทัดหรือไม่
-                                if num_lines > 1:
-                                    line_ratio_end = min(line_start + num_lines, total_lines) / max(total_lines, 1)
-                                    y1 = top_margin + (line_ratio_end * content_height)
-                                    box_height = y1 - y0
-                                else:
-                                    y1 = y0 + box_height
-                                
-                                # คำนวณ X position จากตำแหน่งในบรรทัดแรก
-                                if line_start < len(ocr_lines):
-                                    line_text = ocr_lines[line_start]
-                                    # ลบ HTML tags จาก line_text เพื่อหา position ที่ถูกต้อง
-                                    line_text_clean = re.sub(r'<[^>]+>', '', line_text)
-                                    
-                                    # หาตำแหน่งของ match ในบรรทัด
-                                    match_in_line = found_match.group(0)
-                                    # ลองหาใน line_text (อาจมี HTML tags)
-                                    line_pos = line_text.find(match_in_line[:min(20, len(match_in_line))])
-                                    if line_pos == -1:
-                                        # ถ้าไม่เจอ ลองหาใน clean version
-                                        match_in_line_clean = re.sub(r'<[^>]+>', '', match_in_line)
-                                        line_pos = line_text_clean.find(match_in_line_clean[:min(20, len(match_in_line_clean))])
-                                    
-                                    if line_pos >= 0:
-                                        char_ratio = line_pos / max(len(line_text_clean), 1) if line_text_clean else 0.3
-                                    else:
-                                        char_ratio = 0.3
-                                else:
-                                    char_ratio = 0.3
-                                
-                                left_margin = 50
-                                right_margin = 50
-                                content_width = page_width - left_margin - right_margin
-                                
-                                x0 = left_margin + (char_ratio * content_width)
-                                
-                                # คำนวณความกว้างตามจำนวนตัวอักษร (ประมาณ 6-7 points ต่อตัวอักษรสำหรับ font ขนาดปกติ)
-                                # สำหรับข้อความยาวๆ ให้ใช้สัดส่วนของ content_width
-                                actual_search_text = search_clean_html if search_clean_html else search_for_matching
-                                text_length = len(actual_search_text)
-                                
-                                # ตรวจสอบว่าเป็น Description หรือไม่ (อยู่ใน table)
-                                is_description = 'รายการ' in actual_search_text or 'Promotion' in actual_search_text or line_start < len(ocr_lines) and '<table>' in '\n'.join(ocr_lines[max(0, line_start-5):line_start+1])
-                                
-                                # สำหรับ Description หรือข้อความยาวๆ (>30 ตัวอักษร)
-                                if is_description or text_length > 30:
-                                    # ใช้สัดส่วนที่ใหญ่ขึ้นเพื่อครอบคลุมข้อความทั้งหมด
-                                    # สำหรับ Description ใน table ให้ใช้ 65-75% ของ content width
-                                    if is_description:
-                                        # คำนวณความกว้างตามจำนวนตัวอักษร แต่ไม่เกิน 75% ของ content width
-                                        estimated_width = text_length * 6.5  # 6.5 points ต่อตัวอักษร
-                                        text_width = min(estimated_width, content_width * 0.75)
-                                        # จำกัดให้ไม่เกิน 75% และไม่น้อยกว่า 60%
-                                        text_width = max(content_width * 0.6, min(text_width, content_width * 0.75))
-                                    else:
-                                        # สำหรับข้อความยาวๆ ทั่วไป
-                                        text_width = min(content_width * 0.7, content_width - (char_ratio * content_width))
-                                else:
-                                    # สำหรับข้อความสั้นๆ ใช้การคำนวณตามจำนวนตัวอักษร
-                                    text_width = min(text_length * 7, content_width * 0.6)
-                                
-                                x1 = x0 + text_width
-                                
-                                # จำกัดให้อยู่ในขอบเขต
-                                x0 = max(left_margin, min(x0, page_width - right_margin - 50))
-                                x1 = max(x0 + 50, min(x1, page_width - right_margin))
-                                y0 = max(top_margin, min(y0, page_height - bottom_margin - box_height))
-                                y1 = max(y0 + 18, min(y1, page_height - bottom_margin))
-                                box_height = y1 - y0
-                                
-                                pos = {
-                                    'x0': float(x0),
-                                    'y0': float(y0),
-                                    'x1': float(x1),
-                                    'y1': float(y1),
-                                    'page': page_num,
-                                    'text': search_for_matching,
-                                    'method': 'ocr_txt_approximate',
-                                    'page_width': float(page_width),
-                                    'page_height': float(page_height)
-                                }
-                                
-                                # สำหรับ Description field: ขยาย bounding box
-                                if field_name and 'description' in str(field_name).lower():
-                                    new_x0 = 40.0  # x0 = 40 (คงที่)
-                                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                                    original_width_ratio = 0.60  # 70% - 10% = 60%
-                                    new_x1 = new_x0 + (page_width * original_width_ratio)
-                                    line_height = 20
-                                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
-                                    new_y0 = 290.0  # y0 = 290
-                                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                                    new_x0 = max(0, min(new_x0, page_width - 100))
-                                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-                                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-                                    pos['x0'] = float(new_x0)
-                                    pos['x1'] = float(new_x1)
-                                    pos['y0'] = float(new_y0)
-                                    pos['y1'] = float(new_y1)
-                                
-                                positions.append(pos)
-                            else:
-                                # Fallback: ใช้ตำแหน่งกลาง
-                                center_x = page_rect.width / 2
-                                center_y = page_rect.height / 2
-                                # สำหรับข้อความยาวๆ ให้ใช้ความกว้างที่เหมาะสม
-                                actual_search_text = search_clean_html if search_clean_html else search_for_matching
-                                highlight_width = min(page_rect.width * 0.6, len(actual_search_text) * 7)
-                                highlight_height = max(30, min(100, (actual_search_text.count(' ') + 1) * 18))
-                                
-                                pos = {
-                                    'x0': float(center_x - highlight_width / 2),
-                                    'y0': float(center_y - highlight_height / 2),
-                                    'x1': float(center_x + highlight_width / 2),
-                                    'y1': float(center_y + highlight_height / 2),
-                                    'page': page_num,
-                                    'text': search_for_matching,
-                                    'method': 'ocr_txt_center',
-                                    'page_width': float(page_rect.width),
-                                    'page_height': float(page_rect.height)
-                                }
-                                
-                                # สำหรับ Description field: ขยาย bounding box
-                                if field_name and 'description' in str(field_name).lower():
-                                    page_width = pos['page_width']
-                                    page_height = pos['page_height']
-                                    new_x0 = 40.0  # x0 = 40 (คงที่)
-                                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-                                    original_width_ratio = 0.60  # 70% - 10% = 60%
-                                    new_x1 = new_x0 + (page_width * original_width_ratio)
-                                    line_height = 20
-                                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
-                                    new_y0 = 290.0  # y0 = 290
-                                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
-                                    new_x0 = max(0, min(new_x0, page_width - 100))
-                                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-                                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-                                    pos['x0'] = float(new_x0)
-                                    pos['x1'] = float(new_x1)
-                                    pos['y0'] = float(new_y0)
-                                    pos['y1'] = float(new_y1)
-                                
-                                positions.append(pos)
-                            
-                        doc.close()
-                    except Exception as e:
-                        st.warning(f"⚠️ Could not get PDF dimensions: {e}")
-                else:
-                    # ถ้าไม่มี PyMuPDF ให้ใช้ default approximate position
-                    positions.append({
-                        'x0': 100.0,
-                        'y0': 100.0,
-                        'x1': 400.0,
-                        'y1': 150.0,
-                        'page': page_num,
-                        'text': clean_search,
-                        'method': 'ocr_txt_default'
-                    })
-        else:
-            # ไม่พบไฟล์ .txt
-            st.warning(f"⚠️ OCR text file not found: {txt_filename}. Please run OCR first.")
+    # ขนาดที่แสดง: 150 DPI x zoom
+    display_width = level_width * BASE_DPI * zoom_level / dpi
+    width_css = "100%" if zoom_level == 1.0 else f"{int(display_width)}px"
     
-    except Exception as e:
-        st.warning(f"⚠️ Error reading OCR text file: {e}")
+    tiles = []
+    for x, y, w, h, url in level['tiles']:
+        # tile ที่ไม่ชิดขอบขวา/ล่าง ขยายเกิน 1px กันรอยต่อจากการปัดเศษของ browser
+        extra_w = " + 1px" if x + w < level_width else ""
+        extra_h = " + 1px" if y + h < level_height else ""
+        tiles.append(
+            f'<img src="{url}" loading="lazy" alt="" style="position: absolute; '
+            f'left: {x / level_width * 100:.4f}%; top: {y / level_height * 100:.4f}%; '
+            f'width: calc({w / level_width * 100:.4f}%{extra_w}); height: calc({h / level_height * 100:.4f}%{extra_h});">'
+        )
+    overlay = highlight_overlay_svg(highlight_positions, page_num, level)
+    scroll_css = "overflow: auto; max-height: 85vh;" if zoom_level > 1.0 else ""
+    st.markdown(f"""
+    <div style="text-align: center; margin: 10px 0; {scroll_css}">
+        <div style="position: relative; display: inline-block; max-width: none; width: {width_css}; aspect-ratio: {level_width} / {level_height};" title="PDF Page {page_num}">{"".join(tiles)}{overlay}</div>
+        <p style="margin-top: 5px; color: #888;">📄 Page {page_num} (Zoom: {int(zoom_level * 100)}%)</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+def prefetch_neighbor_pages(df, row_idx, links, zoom_level=1.0):
+    """
+    เตรียมภาพหน้า PDF (และ word boxes ของ Tesseract) ของแถวก่อน/หลัง row_idx
+    OCR_PREFETCH_ROWS แถว ใน background - กด ⬆️/⬇️ แล้วไม่ต้องรอ render
+    """
+    if PREFETCH_ROWS <= 0 or df is None:
+        return
+    pages, seen = [], set()
+    for distance in range(1, PREFETCH_ROWS + 1):
+        for i in (row_idx + distance, row_idx - distance):
+            if 0 <= i < len(df):
+                fpath, pg = resolve_row_document(df, i, links)
+                if fpath and fpath.lower().endswith('.pdf') and os.path.exists(fpath) and (fpath, pg) not in seen:
+                    seen.add((fpath, pg))
+                    pages.append((fpath, pg, ocr_boxes_dir(fpath, pg)))
+    if not pages:
+        return
     
-    # Validate และ filter bounding boxes ที่ผิดปกติ
-    validated_positions = []
-    for pos in positions:
-        width = pos['x1'] - pos['x0']
-        height = pos['y1'] - pos['y0']
-        
-        # Get page dimensions for validation
-        page_width = pos.get('page_width', 595)  # A4 default width in points
-        page_height = pos.get('page_height', 842)  # A4 default height in points
-        
-        # สำหรับ Description field: ขยาย bounding box ให้ครอบคลุมข้อความทั้งหมด
-        # - ความกว้าง: x0 = 40 (คงที่), x1 ปรับตามสัดส่วน
-        # - ความสูง: เลื่อนขึ้นไปขอบกระดาษบน
-        if field_name and 'description' in str(field_name).lower():
-            # x0 = 40 (คงที่)
-            new_x0 = 40.0
-            # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
-            original_width_ratio = 0.60  # 70% - 10% = 60%
-            new_x1 = new_x0 + (page_width * original_width_ratio)
-            
-            # ขยายความสูง: ครอบคลุม 5.5 บรรทัด (ประมาณ 110 points)
-            # y0 = 290 (เลื่อนลงมา)
-            line_height = 20  # ความสูงต่อบรรทัด (ประมาณ)
-            new_y0 = 290.0  # y0 = 290
-            new_y1 = new_y0 + (line_height * 5.5)  # 5.5 บรรทัด
-            
-            # จำกัดให้อยู่ในขอบเขตของหน้า
-            new_x0 = max(0, min(new_x0, page_width - 100))
-            new_x1 = max(new_x0 + 100, min(new_x1, page_width))
-            new_y1 = max(new_y0 + 20, min(new_y1, page_height))
-            
-            # อัพเดท bounding box
-            pos['x0'] = float(new_x0)
-            pos['x1'] = float(new_x1)
-            pos['y0'] = float(new_y0)
-            pos['y1'] = float(new_y1)
-            
-            # Recalculate width and height
-            width = pos['x1'] - pos['x0']
-            height = pos['y1'] - pos['y0']
-        
-        # Filter out boxes ที่ผิดปกติ:
-        # - ต้องมี width และ height เป็นบวก
-        # - width ต้องไม่เกิน 90% ของหน้า (รองรับข้อความยาวๆ)
-        # - height ต้องไม่เกิน 50% ของหน้า (รองรับข้อความหลายบรรทัด)
-        # - ต้องอยู่ในขอบเขตของหน้า
-        max_width = page_width * 0.9
-        max_height = page_height * 0.5
-        
-        if (width > 0 and height > 0 and 
-            width <= max_width and height <= max_height and
-            pos['x0'] >= 0 and pos['y0'] >= 0 and
-            pos['x1'] <= page_width and pos['y1'] <= page_height):
-            validated_positions.append(pos)
-        else:
-            # Debug: แสดงเฉพาะใน console ไม่แสดงใน UI
-            print(f"[DEBUG] Filtered invalid bbox: width={width:.1f}, height={height:.1f}, "
-                  f"page_size=({page_width:.0f}x{page_height:.0f}), method={pos.get('method', 'unknown')}")
+    # word boxes ใช้ DPI เดียวกับ find_text_bbox_in_pdf (150) - เฉพาะเมื่อมี Tesseract
+    words_dpi = None
+    if HAS_PYTESSERACT and TESSERACT_PATH and os.path.exists(TESSERACT_PATH):
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+        words_dpi = 150
     
-    return validated_positions
+    get_page_prefetcher().prefetch(pages, pyramid_dpi(zoom_level), words_dpi, POPPLER_PATH)
+
+def find_text_bbox_in_pdf(pdf_path, search_text, page_num, field_name=None):
+    """
+    หา bounding box ของ text ใน PDF (Tesseract word boxes -> PDF text layer -> ประมาณจากไฟล์ .txt)
+    ตัวค้นหาอยู่ใน ocr_core.highlight.find_text_bbox (pure function ใช้ร่วมกับ background precompute)
+    Returns: list of dicts with 'x0', 'y0', 'x1', 'y1', 'page', 'text', 'method', 'page_width', 'page_height'
+    """
+    if not HAS_PYTESSERACT:
+        st.info("💡 Install Tesseract OCR for accurate text positioning: `pip install pytesseract` and install Tesseract binary")
+    elif TESSERACT_PATH and os.path.exists(TESSERACT_PATH):
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    return find_text_bbox(pdf_path, search_text, page_num, field_name, ocr_output_dirs(),
+                          TESSERACT_PATH, POPPLER_PATH, get_raster_cache())
 
 def render_pdf(file_path, page_num=1, highlight_positions=None, zoom_level=1.0):
     """
@@ -1760,33 +1048,16 @@ def render_pdf(file_path, page_num=1, highlight_positions=None, zoom_level=1.0):
         return
     
     try:
-        from pdf2image import convert_from_path
-        from PIL import Image, ImageDraw
-        
-        # Convert PDF page to image
-        # ใช้ DPI สูงขึ้นเมื่อ zoom in เพื่อความชัดเจน
-        base_dpi = 150
-        effective_dpi = int(base_dpi * max(1.0, zoom_level))
-        images = convert_from_path(
-            file_path,
-            first_page=page_num,
-            last_page=page_num,
-            dpi=effective_dpi,
-            poppler_path=POPPLER_PATH if POPPLER_PATH else None
-        )
-        
-        if not images:
-            st.error(f"Failed to render PDF page {page_num}")
+        if VIEWER_OVERLAY and static_serving_enabled():
+            render_pdf_overlay(file_path, page_num, highlight_positions, zoom_level)
             return
         
-        img = images[0]
+        from PIL import ImageDraw
         
-        # Apply zoom if needed
-        if zoom_level != 1.0:
-            original_size = img.size
-            new_size = (int(original_size[0] * zoom_level), int(original_size[1] * zoom_level))
-            # ใช้ LANCZOS resampling สำหรับคุณภาพที่ดี
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
+        # Convert PDF page to image (cache ตาม path/mtime/page/DPI - กลับมาหน้าเดิมไม่ต้อง render ใหม่)
+        # render ที่ level ของ pyramid ที่ใกล้ 150 DPI x zoom ที่สุด แล้วให้ browser ย่อ/ขยายเป็นขนาดที่แสดง
+        effective_dpi = pyramid_dpi(zoom_level)
+        img = get_raster_cache().get(file_path, page_num, effective_dpi, POPPLER_PATH)
         
         # Draw highlight boxes if provided
         if highlight_positions and len(highlight_positions) > 0:
@@ -1856,20 +1127,22 @@ def render_pdf(file_path, page_num=1, highlight_positions=None, zoom_level=1.0):
             
         # Display the rendered image
         # ใช้ HTML/CSS เพื่อบังคับขนาดจริงตาม zoom level
-        img_width, img_height = img.size
+        img_width = int(img.width * BASE_DPI * zoom_level / effective_dpi)
         
         if zoom_level != 1.0:
-            # แปลง PIL Image เป็น base64 เพื่อใช้ใน HTML
-            import io
-            img_buffer = io.BytesIO()
-            img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-            img_base64 = base64.b64encode(img_buffer.getvalue()).decode('utf-8')
+            if static_serving_enabled():
+                # ภาพเป็นไฟล์ใน static/pages ส่งไปแค่ URL (ภาพเดิมซ้ำ browser ใช้จาก cache)
+                img_src = get_page_assets().put_image(img)
+            else:
+                # แปลง PIL Image เป็น base64 เพื่อใช้ใน HTML
+                img_buffer = io.BytesIO()
+                img.save(img_buffer, format='PNG')
+                img_src = "data:image/png;base64," + base64.b64encode(img_buffer.getvalue()).decode('utf-8')
             
             # ใช้ HTML/CSS เพื่อบังคับขนาดจริง (ไม่ให้ Streamlit resize)
             zoom_html = f"""
             <div style="text-align: center; margin: 10px 0;">
-                <img src="data:image/png;base64,{img_base64}" 
+                <img src="{img_src}" 
                      style="max-width: none; width: {img_width}px; height: auto; display: block; margin: 0 auto;"
                      alt="PDF Page {page_num}">
                 <p style="margin-top: 5px; color: #888;">📄 Page {page_num} (Zoom: {int(zoom_level * 100)}%)</p>
@@ -1887,140 +1160,71 @@ def render_pdf(file_path, page_num=1, highlight_positions=None, zoom_level=1.0):
         st.error(f"Error rendering PDF: {e}")
         # Fallback to browser iframe mode (no highlight support)
         try:
-            with open(file_path, "rb") as f: 
-                pdf_data = f.read()
-            if pdf_data:
-                base64_pdf = base64.b64encode(pdf_data).decode('utf-8')
-                pdf_html = f'<iframe src="data:application/pdf;base64,{base64_pdf}#page={page_num}&toolbar=1" width="100%" height="800px" style="border: none;"></iframe>'
+            if static_serving_enabled():
+                pdf_src = get_file_assets().put_file(file_path)
+            else:
+                with open(file_path, "rb") as f: 
+                    pdf_data = f.read()
+                pdf_src = "data:application/pdf;base64," + base64.b64encode(pdf_data).decode('utf-8') if pdf_data else None
+            if pdf_src:
+                pdf_html = f'<iframe src="{pdf_src}#page={page_num}&toolbar=1" width="100%" height="800px" style="border: none;"></iframe>'
                 st.markdown(f"**Browser Mode (Page {page_num}) - No highlight support**")
                 st.markdown(pdf_html, unsafe_allow_html=True)
         except:
             st.error("Failed to render PDF in any mode")
 
-def extract_hyperlinks(source, sheet_name):
+@st.cache_resource
+def get_workbook_cache():
     """
-    Extract hyperlinks from Excel, returning both target path and display text
-    Returns: list of dicts with structure {column_name: {'target': path, 'display': text}}
+    Workbook ที่เปิดใน Document Editor: DataFrame + hyperlink ของทุกแถว อ่านครั้งเดียวต่อเวอร์ชันของไฟล์
+    (key = path/mtime/size หรือ id ของไฟล์ที่ upload) ใช้ร่วมกันทุก session
     """
-    try:
-        if hasattr(source, 'seek'): 
-            source.seek(0)
-        wb = openpyxl.load_workbook(source, data_only=False)
-        ws = wb[sheet_name]
-        link_data = []
-        for row in ws.iter_rows(min_row=2, values_only=False):
-            row_links = {}
-            for cell in row:
-                header_val = ws.cell(row=1, column=cell.column).value
-                target = None
-                display = None
-                
-                if cell.hyperlink: 
-                    target = cell.hyperlink.target
-                    display = cell.value if cell.value else target
-                elif isinstance(cell.value, str) and str(cell.value).strip().upper().startswith("=HYPERLINK"):
-                    # Parse HYPERLINK formula: =HYPERLINK("target", "display")
-                    formula = cell.value.strip()
-                    # Extract both target and display text
-                    matches = re.findall(r'["\']([^"\']+)["\']', formula)
-                    if len(matches) >= 1:
-                        target = matches[0]
-                        display = matches[1] if len(matches) >= 2 else target
-                    
-                if target: 
-                    row_links[header_val] = {
-                        'target': target,
-                        'display': display if display else target
-                    }
-            link_data.append(row_links)
-        wb.close()
-        return link_data
-    except Exception as e:
-        print(f"[DEBUG] Error extracting hyperlinks: {e}")
-        return []
+    return WorkbookCache()
 
-def get_sheet_names_fresh(file_source):
-    try:
-        if hasattr(file_source, 'seek'): 
-            file_source.seek(0)
-        wb = openpyxl.load_workbook(file_source, read_only=True, keep_links=False)
-        return wb.sheetnames
-    except: 
-        return []
+def load_workbook_sheet(source, sheet_name=None):
+    """
+    WorkbookSheet(df, links, sheet, sheet_names) ของ sheet (None = sheet แรก) - rerun ถัดไปไม่อ่าน Excel ซ้ำ
+    links: list of dicts {column_name: {'target': path, 'display': text}} ต่อแถว
+    df ใช้ร่วมกับ session อื่น ต้อง copy ก่อนแก้ไข (df.replace(...) คืน DataFrame ใหม่อยู่แล้ว)
+    """
+    return get_workbook_cache().get(source, sheet_name)
 
 # --- LOOKUP LOGIC ---
+@st.cache_resource
+def get_vendor_store():
+    """
+    Vendor Master + index ที่ใช้ร่วมกันทุก session ใน process (ไม่ copy ต่อ session)
+    มี background thread ตรวจ mtime ของไฟล์และสลับเป็นเวอร์ชันใหม่แบบ atomic
+    """
+    return VendorMasterStore(VENDOR_MASTER_PATH)
+
 def load_vendor_master(force_reload=False):
     """
-    โหลด Vendor Master จาก Vendor_branch.xlsx
-    force_reload: ถ้าเป็น True จะ reload ใหม่แม้จะมีข้อมูลใน session state แล้ว
+    คืน snapshot ของ Vendor Master จาก store กลางของ process (None ถ้าโหลดไม่ได้)
+    snapshot.df = DataFrame ที่ clean แล้ว (None เมื่อใช้ SQLite - OCR_VENDOR_DB), snapshot.index ใช้ lookup
+    force_reload: ถ้าเป็น True จะอ่านไฟล์ใหม่ทันที (ปุ่ม 🔄 Vendor)
     """
-    # ตรวจสอบว่าไฟล์มีอยู่หรือไม่
-    if not os.path.exists(VENDOR_MASTER_PATH):
+    store = get_vendor_store()
+    if force_reload:
+        store.reload(force=True)
+        if store.last_error:
+            st.toast(f"⚠️ อ่านไฟล์ Master Error: {store.last_error} (ใช้ข้อมูลเดิม)", icon="⚠️")
+    snapshot = store.snapshot
+    
+    # ไฟล์หาย/อ่านไม่ได้ watcher บันทึกไว้ใน snapshot แล้ว (ไม่ต้อง stat ไฟล์ทุกครั้งที่ lookup)
+    if snapshot.mtime is None:
         st.error(f"❌ ไม่พบไฟล์ Vendor Master ที่: {VENDOR_MASTER_PATH}")
-        st.session_state.vendor_master_df = None
+        return None
+    if snapshot.error:
+        st.toast(f"⚠️ อ่านไฟล์ Master Error: {snapshot.error}", icon="⚠️")
         return None
     
-    # ตรวจสอบว่าไฟล์ถูกแก้ไขหรือไม่ (โดยใช้ mtime)
-    file_mtime = os.path.getmtime(VENDOR_MASTER_PATH)
-    
-    # เก็บ mtime ไว้ใน session state เพื่อตรวจสอบการเปลี่ยนแปลง
-    if 'vendor_master_mtime' not in st.session_state:
-        st.session_state.vendor_master_mtime = 0
-    
-    # ถ้าไฟล์ถูกแก้ไข หรือ force_reload หรือยังไม่มีข้อมูลใน session state
-    need_reload = (
-        force_reload or 
-        st.session_state.vendor_master_mtime != file_mtime or
-        'vendor_master_df' not in st.session_state or 
-        st.session_state.vendor_master_df is None
-    )
+    # แจ้งเมื่อ session นี้เห็นเวอร์ชันใหม่ของ Master เป็นครั้งแรก
+    if st.session_state.get('vendor_master_version') != snapshot.version:
+        st.session_state.vendor_master_version = snapshot.version
+        st.toast(f"✅ โหลด Vendor Master สำเร็จ ({snapshot.rows} rows) จาก sheet: {snapshot.sheet}", icon="✅")
     
-    if need_reload:
-        try:
-            # ตรวจสอบ sheets ทั้งหมดและเลือก sheet ที่มีข้อมูลมากที่สุด
-            xl_file = pd.ExcelFile(VENDOR_MASTER_PATH)
-            
-            # ถ้ามีหลาย sheets ให้เลือก sheet แรก (หรือ sheet ที่มีข้อมูลมากที่สุด)
-            max_rows = 0
-            best_sheet = xl_file.sheet_names[0]
-            
-            for sheet_name in xl_file.sheet_names:
-                temp_df = pd.read_excel(VENDOR_MASTER_PATH, sheet_name=sheet_name, nrows=1)
-                if not temp_df.empty:
-                    full_df = pd.read_excel(VENDOR_MASTER_PATH, sheet_name=sheet_name)
-                    if len(full_df) > max_rows:
-                        max_rows = len(full_df)
-                        best_sheet = sheet_name
-            
-            df = pd.read_excel(VENDOR_MASTER_PATH, sheet_name=best_sheet, dtype=str)
-            df.columns = df.columns.str.strip()  # Clean column names
-            
-            # Clean Data: เลขผู้เสียภาษี (ลบขีด ลบวรรค) - เหมือน Extract_Inv.py
-            if 'เลขประจำตัวผู้เสียภาษี' in df.columns: 
-                df['เลขประจำตัวผู้เสียภาษี'] = df['เลขประจำตัวผู้เสียภาษี'].fillna('').str.replace(r'\D', '', regex=True)
-            
-            # Clean Data: สาขา (เติม 0 ให้ครบ 5 หลัก และแปลง "สำนักงานใหญ่" เป็น "00000") - เหมือน Extract_Inv.py
-            if 'สาขา' in df.columns: 
-                def clean_branch(x):
-                    x = str(x).strip()
-                    # แปลง "สำนักงานใหญ่" หรือ "Head Office" เป็น "00000"
-                    if re.search(r'(สำนักงานใหญ่|สนญ|Head\\s*Office|H\\.\\?O\\.\\?)', x, re.IGNORECASE):
-                        return "00000"
-                    # ถ้าเป็นตัวเลข ให้เติม 0 ให้ครบ 5 หลัก
-                    if x.isdigit():
-                        return x.zfill(5)
-                    return x
-                df['สาขา'] = df['สาขา'].fillna('').apply(clean_branch)
-            
-            st.session_state.vendor_master_df = df
-            st.session_state.vendor_master_mtime = file_mtime
-            st.toast(f"✅ โหลด Vendor Master สำเร็จ ({len(df)} rows) จาก sheet: {best_sheet}", icon="✅")
-        except Exception as e:
-            st.toast(f"⚠️ อ่านไฟล์ Master Error: {e}", icon="⚠️")
-            st.session_state.vendor_master_df = None
-            return None
-    
-    return st.session_state.vendor_master_df
+    return snapshot
 
 def lookup_vendor_info(vendor_id, branch, debug=False):
     """
@@ -2029,37 +1233,21 @@ def lookup_vendor_info(vendor_id, branch, debug=False):
     - branch (Branch_OCR) = สาขา
     Return: {'code': 'Vendor code SAP', 'name': 'ชื่อบริษัท'} หรือ None
     """
-    # Reload vendor master เพื่อให้ได้ข้อมูลล่าสุด (force_reload=False จะ reload เฉพาะเมื่อไฟล์ถูกแก้ไข)
-    master = load_vendor_master(force_reload=False)
-    if master is None:
+    # Vendor master จาก store กลาง (background watcher จะ reload เองเมื่อไฟล์ถูกแก้ไข)
+    # ใช้ snapshot เดียวกันทั้ง DataFrame และ index (กันกรณี watcher สลับเวอร์ชันระหว่างทาง)
+    snapshot = load_vendor_master(force_reload=False)
+    if snapshot is None:
         if debug:
-            st.error(f"DEBUG: ไม่สามารถโหลด Vendor Master ได้ - Path: {VENDOR_MASTER_PATH}")
-            if not os.path.exists(VENDOR_MASTER_PATH):
-                st.error(f"DEBUG: ไฟล์ไม่พบที่ path: {VENDOR_MASTER_PATH}")
+            st.error(f"DEBUG: ไม่สามารถโหลด Vendor Master ได้ - Path: {VENDOR_MASTER_PATH} "
+                     f"({get_vendor_store().snapshot.error})")
         return None
     
     try:
         # Clean input ให้เหมือนกับที่ clean ใน Master
-        # Clean vendor_id: ลบขีด ลบวรรค (เหมือนใน Extract_Inv.py)
         v_id_original = vendor_id
-        v_id = str(vendor_id).strip() if vendor_id and pd.notna(vendor_id) else ""
-        v_id = re.sub(r'\D', '', v_id)  # ลบทุกอย่างที่ไม่ใช่ตัวเลข
-        
-        # Clean branch: เติม 0 ให้ครบ 5 หลัก และแปลง "สำนักงานใหญ่" เป็น "00000" (เหมือนใน Extract_Inv.py)
-        def clean_branch_input(x):
-            if x is None or pd.isna(x):
-                return ""
-            x = str(x).strip()
-            # แปลง "สำนักงานใหญ่" หรือ "Head Office" เป็น "00000"
-            if re.search(r'(สำนักงานใหญ่|สนญ|Head\s*Office|H\.?O\.?)', x, re.IGNORECASE):
-                return "00000"
-            # ถ้าเป็นตัวเลข ให้เติม 0 ให้ครบ 5 หลัก
-            if x.isdigit():
-                return x.zfill(5)
-            return x
-        
+        v_id = clean_tax_id(vendor_id)
         br_original = branch
-        br = clean_branch_input(branch)
+        br = clean_branch(branch)
         
         if debug:
             st.info(f"DEBUG: Input - vendor_id='{v_id_original}' → cleaned='{v_id}', branch='{br_original}' → cleaned='{br}'")
@@ -2070,80 +1258,63 @@ def lookup_vendor_info(vendor_id, branch, debug=False):
                 st.warning(f"DEBUG: ข้อมูลไม่ครบ - v_id={v_id}, br={br}")
             return None
         
+        # master = None เมื่อใช้ SQLite (OCR_VENDOR_DB) - lookup ผ่าน index อย่างเดียว
+        master, index = snapshot.df, snapshot.index
+        
         # ตรวจสอบว่า Master มี column ที่ต้องการหรือไม่
-        if 'เลขประจำตัวผู้เสียภาษี' not in master.columns or 'สาขา' not in master.columns:
+        if master is not None and ('เลขประจำตัวผู้เสียภาษี' not in master.columns or 'สาขา' not in master.columns):
             if debug:
                 st.error(f"DEBUG: ขาด column ใน Master - columns={list(master.columns)}")
             return None
         
-        # หา column name ของ Vendor code (อาจเป็น "Vendor code SAP" หรือ "Vendor code SA")
-        vendor_code_col = None
-        for col in master.columns:
-            col_lower = str(col).lower()
-            if 'vendor' in col_lower and 'code' in col_lower:
-                vendor_code_col = col
-                break
+        vendor_code_col = index['code_col']
         
         if not vendor_code_col:
             if debug:
-                st.error(f"DEBUG: ไม่พบ Vendor code column ใน Master - columns={list(master.columns)}")
+                st.error("DEBUG: ไม่พบ Vendor code column ใน Master")
             return None
         
         if debug:
             st.info(f"DEBUG: Using vendor_code_col='{vendor_code_col}'")
-            st.info(f"DEBUG: Master has {len(master)} total rows")
+            st.info(f"DEBUG: Master has {snapshot.rows} total rows")
             st.info(f"DEBUG: Searching for v_id='{v_id}' AND br='{br}' in Master")
             
             # แสดงตัวอย่างข้อมูลใน Master
-            st.markdown("**📊 ตัวอย่างข้อมูลใน Master (5 rows แรก):**")
-            sample = master[['เลขประจำตัวผู้เสียภาษี', 'สาขา', vendor_code_col]].head(5)
-            st.dataframe(sample, use_container_width=True)
+            if master is not None:
+                st.markdown("**📊 ตัวอย่างข้อมูลใน Master (5 rows แรก):**")
+                sample = master[['เลขประจำตัวผู้เสียภาษี', 'สาขา', vendor_code_col]].head(5)
+                st.dataframe(sample, use_container_width=True)
             
-            # ค้นหาว่ามี vendor_id นี้ใน Master หรือไม่ (ไม่สนใจ branch)
-            vendor_matches = master[master['เลขประจำตัวผู้เสียภาษี'] == v_id]
-            if not vendor_matches.empty:
+            # ค้นหาว่ามี vendor_id นี้ใน Master หรือไม่ (ไม่สนใจ branch) - จาก index by_tax
+            vendor_matches = index['by_tax'].get(v_id, [])
+            if vendor_matches:
                 st.warning(f"DEBUG: พบ vendor_id='{v_id}' ใน Master ({len(vendor_matches)} rows) แต่ branch ไม่ตรง:")
-                vendor_sample = vendor_matches[['เลขประจำตัวผู้เสียภาษี', 'สาขา', vendor_code_col]].head(10)
+                vendor_sample = pd.DataFrame(
+                    [(v_id, b, c) for b, c, _ in vendor_matches[:10]],
+                    columns=['เลขประจำตัวผู้เสียภาษี', 'สาขา', vendor_code_col]
+                )
                 st.dataframe(vendor_sample, use_container_width=True)
-                st.info(f"💡 คุณกำลังหา branch='{br}' แต่ใน Master มี branch: {list(vendor_matches['สาขา'].unique())}")
+                st.info(f"💡 คุณกำลังหา branch='{br}' แต่ใน Master มี branch: {list(dict.fromkeys(b for b, _, _ in vendor_matches))}")
             else:
                 st.error(f"DEBUG: ไม่พบ vendor_id='{v_id}' ใน Master เลย")
                 # แสดง vendor_id ที่ใกล้เคียง (ขึ้นต้นเหมือนกัน)
                 prefix = v_id[:8] if len(v_id) >= 8 else v_id[:4]
-                similar = master[master['เลขประจำตัวผู้เสียภาษี'].str.startswith(prefix)]
+                similar = master[master['เลขประจำตัวผู้เสียภาษี'].str.startswith(prefix)] if master is not None else pd.DataFrame()
                 if not similar.empty:
                     st.info(f"💡 พบ vendor_id ที่ขึ้นต้นด้วย '{prefix}' ({len(similar)} rows):")
                     similar_sample = similar[['เลขประจำตัวผู้เสียภาษี', 'สาขา', vendor_code_col]].head(10)
                     st.dataframe(similar_sample, use_container_width=True)
         
-        # Search ใน Master - ใช้ exact match
-        res = master[(master['เลขประจำตัวผู้เสียภาษี'] == v_id) & (master['สาขา'] == br)]
+        # Search ใน index - exact match (O(1))
+        result = index['by_key'].get((v_id, br))
         
         if debug:
-            st.info(f"DEBUG: Found {len(res)} matching records")
-            if not res.empty:
-                st.dataframe(res, use_container_width=True)
-        
-        result = {}
-        if not res.empty:
-            # ดึง Vendor code SAP
-            vendor_code = str(res.iloc[0][vendor_code_col]).strip()
-            # ตรวจสอบว่าไม่ใช่ nan หรือ empty
-            if vendor_code and vendor_code.lower() != 'nan' and vendor_code != '':
-                result['code'] = vendor_code
-                if debug:
-                    st.success(f"DEBUG: Found Vendor code = '{vendor_code}'")
-            
-            # ดึงชื่อบริษัท (ถ้ามี)
-            if 'ชื่อบริษัท' in res.columns: 
-                vendor_name = str(res.iloc[0]['ชื่อบริษัท']).strip()
-                if vendor_name and vendor_name.lower() != 'nan' and vendor_name != '':
-                    result['name'] = vendor_name
-        else:
-            if debug:
+            if result is None:
                 st.warning("DEBUG: ไม่พบข้อมูลที่ตรงกัน")
+            elif 'code' in result:
+                st.success(f"DEBUG: Found Vendor code = '{result['code']}'")
         
-        return result if result else None
+        return dict(result) if result else None
     except Exception as e:
         if debug:
             st.error(f"DEBUG: Error in lookup_vendor_info: {e}")
@@ -2152,6 +1323,56 @@ def lookup_vendor_info(vendor_id, branch, debug=False):
             st.code(traceback.format_exc())
     return None
 
+def suggest_vendor_matches(vendor_id, branch, limit=5):
+    """
+    เสนอ Vendor ที่เลขผู้เสียภาษีต่างกัน 1 หลัก (OCR อ่านผิด/ตกหล่น 1 ตัว)
+    เรียงเลขที่ checksum ถูกต้องก่อน และสาขาเดียวกันก่อน
+    """
+    snapshot = get_vendor_store().snapshot
+    if snapshot.index is None:
+        return []
+    return vendor_suggestions(snapshot.index, clean_tax_id(vendor_id), clean_branch(branch), limit)
+
+def find_vendor_columns(df_cols):
+    """
+    หา column ของ VendorID / Branch / Vendor code / Vendor Name ในไฟล์ที่เปิด
+    Return: (col_vid, col_branch, col_vcode, col_vname)
+    """
+    # หา column name ที่ตรงกับ pattern (ลองหลาย pattern)
+    # VendorID_OCR อาจเป็น "VendorID_OCR" หรือ "Vendor_OCR" หรือ "VendorID"
+    col_vid = None
+    for pattern in [["vendor", "id"], ["vendorid"], ["vendor", "ocr"]]:
+        col_vid = find_column_name(df_cols, pattern)
+        if col_vid:
+            break
+    if not col_vid:
+        # ลองหาโดยตรง
+        for col in df_cols:
+            col_lower = str(col).lower()
+            if "vendorid" in col_lower or ("vendor" in col_lower and "id" in col_lower and "ocr" in col_lower):
+                col_vid = col
+                break
+    col_vid = col_vid or "VendorID_OCR"
+    
+    # Branch_OCR อาจเป็น "Branch_OCR" หรือ "BranchOCR"
+    col_branch = None
+    for pattern in [["branch"]]:
+        col_branch = find_column_name(df_cols, pattern)
+        if col_branch:
+            break
+    if not col_branch:
+        # ลองหาโดยตรง
+        for col in df_cols:
+            col_lower = str(col).lower()
+            if "branch" in col_lower and "ocr" in col_lower:
+                col_branch = col
+                break
+    col_branch = col_branch or ("Branch_OCR" if "Branch_OCR" in df_cols else "BranchOCR")
+    
+    col_vcode = find_column_name(df_cols, ["vendor", "code"]) or "Vendor code"
+    col_vname = find_column_name(df_cols, ["vendor", "name"]) or "Vendor Name"
+    return col_vid, col_branch, col_vcode, col_vname
+
 def find_column_name(columns, keywords):
     cols_lower = [str(c).lower() for c in columns]
     for col, col_lower in zip(columns, cols_lower):
@@ -2338,6 +1559,10 @@ def render_page_1():
         # แสดงข้อความตัวเลือก OCR ใต้ปุ่ม Settings
         if st.session_state.ocr_type == "API Typhoon":
             st.caption("🔵 API OCR")
+        elif st.session_state.ocr_type == "Tesseract (Offline)":
+            st.caption("🟠 Tesseract OCR")
+        elif st.session_state.ocr_type == "Tiered (Auto)":
+            st.caption("🟣 Tiered OCR")
         else:
             st.caption("🟢 Local OCR")
         
@@ -2366,10 +1591,11 @@ def render_page_1():
         
         with col_setting_left:
             st.markdown("### AI OCR Selection")
+            ocr_type_options = list(OCR_SCRIPTS.keys())
             ocr_type = st.radio(
                 "เลือก AI OCR:",
-                options=["API Typhoon", "Local Typhoon"],
-                index=0 if st.session_state.ocr_type == "API Typhoon" else 1,
+                options=ocr_type_options,
+                index=ocr_type_options.index(st.session_state.ocr_type) if st.session_state.ocr_type in ocr_type_options else 0,
                 key="ocr_type_selector",
                 help="เลือกประเภท AI OCR ที่ต้องการใช้งาน"
             )
@@ -2452,7 +1678,7 @@ def render_page_1():
                         else:
                             st.warning("⚠️ Please enter API_KEY")
                     else:
-                        # Local Typhoon - ไม่ต้องบันทึกอะไร แค่ปิด Settings
+                        # Local Typhoon / Tesseract - ไม่ต้องบันทึกอะไร แค่ปิด Settings
                         # บันทึกเฉพาะ Poppler Path (เก็บ API_KEY เดิมไว้)
                         if save_config(st.session_state.api_key, poppler_val):
                             st.session_state.poppler_path = poppler_val
@@ -2480,6 +1706,26 @@ def render_page_1():
                 - ต้องมี API_KEY เพื่อใช้งาน OCR
                 - สามารถหา API_KEY ได้ที่: [https://playground.opentyphoon.ai/ocr](https://playground.opentyphoon.ai/ocr)
             """)
+            elif st.session_state.ocr_type == "Tesseract (Offline)":
+                st.info("""
+                **Tesseract (Offline)** ใช้ Tesseract OCR (tha+eng) ในเครื่อง
+                
+                - ไม่ต้องใช้ API_KEY และไม่ต้องเชื่อมต่ออินเทอร์เน็ต
+                - ต้องติดตั้ง Tesseract และภาษาไทย (`tesseract-ocr-tha`)
+                - ประมวลผลหลายหน้าพร้อมกันตามจำนวน CPU (ตั้งค่าได้ด้วย `TESSERACT_WORKERS`)
+                - รันผ่าน `Extract_Inv_tesseract.py`
+                - เหมาะกับเอกสารสแกนที่ชัด ความแม่นยำต่ำกว่า Typhoon
+            """)
+            elif st.session_state.ocr_type == "Tiered (Auto)":
+                st.info("""
+                **Tiered (Auto)** อ่านด้วยวิธีที่ถูกก่อน แล้วส่งต่อเฉพาะหน้าที่ไม่ผ่าน
+                
+                - ค่าเริ่มต้น: PDF Text Layer → API Typhoon (ตั้งค่าได้ด้วย `OCR_TIERS` เช่น `tesseract,ollama`)
+                - ส่งต่อเมื่อไม่พบ field ที่ `required` หรือเลขผู้เสียภาษี/ยอดเงินไม่ถูกต้อง
+                - ใช้ API_KEY จาก `config.json` เมื่อส่งต่อไป API Typhoon
+                - คอลัมน์ `OCR Tier` ใน Excel บอกว่าแต่ละแถวมาจากวิธีใด
+                - รันผ่าน `Extract_Inv_tiered.py`
+            """)
             else:
                 st.info("""
                 **Local Typhoon** ใช้ Ollama ในเครื่อง
@@ -2652,8 +1898,8 @@ def render_page_1():
                             else:
                                 st.error(f"OCR script not found at: {python_script}")
                         else:
-                            # Local OCR - ใช้ sys.executable เพื่อให้ใช้ Python environment เดียวกับ Streamlit
-                            python_script = os.path.join(os.getcwd(), "Extract_Inv_local.py")
+                            # Local OCR / Tesseract - ใช้ sys.executable เพื่อให้ใช้ Python environment เดียวกับ Streamlit
+                            python_script = os.path.join(os.getcwd(), OCR_SCRIPTS[st.session_state.ocr_type])
                             
                             if os.path.exists(python_script):
                                 # ใช้ sys.executable เพื่อให้ใช้ Python ที่ติดตั้ง packages แล้ว
@@ -2663,7 +1909,7 @@ def render_page_1():
                                 # แสดง spinner และรัน process
                                 spinner_placeholder = st.empty()
                                 with spinner_placeholder.container():
-                                    with st.spinner("Running Local Typhoon OCR... This may take a while."):
+                                    with st.spinner(f"Running {st.session_state.ocr_type} OCR... This may take a while."):
                                         result = subprocess.run(
                                             cmd,
                                             cwd=os.getcwd(),
@@ -2905,6 +2151,188 @@ def render_page_1():
             st.warning(f"Output folder does not exist: {st.session_state.ocr_output_folder}")
 
 # --- PAGE 2: Document Editor (Existing Feature) ---
+def current_workbook_links():
+    """Hyperlink ของทุกแถวใน workbook/sheet ที่โหลดอยู่ (รองรับทั้ง uploaded file และ loaded from path)"""
+    file_source = st.session_state.uploaded_file_ref
+    if file_source is None:
+        file_source = st.session_state.get('loaded_file_path')
+    if file_source is not None and st.session_state.current_sheet is not None:
+        try:
+            return load_workbook_sheet(file_source, st.session_state.current_sheet).links
+        except Exception as e:
+            print(f"[DEBUG] Error extracting hyperlinks: {e}")
+    return []
+
+def detail_field_value(row, col, row_links):
+    """
+    ค่าของ field ที่แสดงใน Detail view: display text ของ hyperlink (ถ้ามี), format วันที่/ตัวเลข
+    (เป็นค่าที่ส่งให้ on_field_focus จึงใช้เป็น key ของ highlight cache ด้วย)
+    """
+    field_value = str(row[col])
+    
+    # ถ้า column นี้มี hyperlink ให้แสดง display text แทน
+    link_info = row_links.get(col)
+    if link_info and isinstance(link_info, dict):
+        field_value = link_info.get('display', field_value)
+    
+    # Format date for InvDateOCR columns
+    field_value = format_date_value(field_value, col)
+    # Format number for InvAmtOCR columns
+    field_value = format_number_value(field_value, col)
+    return field_value
+
+def resolve_row_document(df, row_idx, links):
+    """
+    หา path ของไฟล์ (PDF/รูป) และเลขหน้าของแถว row_idx
+    ลำดับ: hyperlink ใน Excel (links จาก load_workbook_sheet) -> column "Link PDF" -> column "filename"
+    Return: (fpath หรือ None, page)
+    """
+    fpath = None
+    pg = 1
+    row = df.iloc[row_idx]
+    
+    # Method 1: Try to extract from hyperlinks first
+    if row_idx < len(links):
+        for k, v in links[row_idx].items():
+            # v is now a dict with 'target' and 'display' keys
+            if v and isinstance(v, dict):
+                target = v.get('target', '')
+                if target and ('.pdf' in target.lower() or '.png' in target.lower() or '.jpg' in target.lower() or '.jpeg' in target.lower()): 
+                    candidate_path = target.strip()
+                    # Normalize path separators for Windows
+                    candidate_path = candidate_path.replace('/', os.sep).replace('\\', os.sep)
+                    # If relative path, try to resolve it
+                    if not os.path.isabs(candidate_path):
+                        base = st.session_state.get('base_folder_cache', os.getcwd())
+                        candidate_path = os.path.join(base, candidate_path)
+                    # Normalize the path (resolve .. and .)
+                    candidate_path = os.path.normpath(candidate_path)
+                    # Check if file exists
+                    if os.path.exists(candidate_path):
+                        fpath = candidate_path
+                        break
+                    else:
+                        # Try original path from hyperlink as-is (might be absolute)
+                        original_path = target.strip()
+                        if os.path.exists(original_path):
+                            fpath = original_path
+                            break
+
+    # Method 2: Read directly from "Link PDF" column (even if it's not a hyperlink)
+    if not fpath:
+        cols_lower = [str(c).lower() for c in df.columns]
+        
+        # Try "Link PDF" column first
+        link_pdf_col = None
+        for col in df.columns:
+            if "link" in str(col).lower() and "pdf" in str(col).lower():
+                link_pdf_col = col
+                break
+        
+        if link_pdf_col:
+            link_value = row[link_pdf_col]
+            if link_value and str(link_value).strip().lower() not in ['none', 'nan', '']:
+                # Extract path from HYPERLINK formula if present
+                link_str = str(link_value).strip()
+                
+                # Check if it's a HYPERLINK formula
+                if link_str.upper().startswith("=HYPERLINK"):
+                    # Parse HYPERLINK formula: =HYPERLINK("target", "display")
+                    matches = re.findall(r'["\']([^"\']+)["\']', link_str)
+                    if len(matches) >= 1:
+                        candidate_path = matches[0].strip()
+                    else:
+                        candidate_path = link_str
+                else:
+                    # Direct path value
+                    candidate_path = link_str
+                
+                # Normalize path
+                candidate_path = candidate_path.replace('/', os.sep).replace('\\', os.sep)
+                
+                # If relative path, try to resolve it
+                if not os.path.isabs(candidate_path):
+                    base = st.session_state.get('base_folder_cache', os.getcwd())
+                    candidate_path = os.path.join(base, candidate_path)
+                
+                candidate_path = os.path.normpath(candidate_path)
+                
+                # Check if file exists
+                if os.path.exists(candidate_path):
+                    fpath = candidate_path
+    
+    # Method 3: Try "filename" column as fallback
+    if not fpath:
+        cols_lower = [str(c).lower() for c in df.columns]
+        fname = ""
+        if "filename" in cols_lower: 
+            fname = str(row[df.columns[cols_lower.index("filename")]])
+        
+        if fname and str(fname).strip().lower() not in ['none', 'nan', '']:
+            clean_name = re.sub(r'[\r\n\t"]', '', fname.replace("เปิดไฟล์", "").strip())
+            if clean_name:
+                base = st.session_state.get('base_folder_cache', os.getcwd())
+                fpath = os.path.join(base, clean_name)
+                # Normalize the path
+                fpath = os.path.normpath(fpath)
+    
+    pg_cols = [c for c in df.columns if "page" in str(c).lower()]
+    if pg_cols:
+        try: 
+            pg = int(float(row[pg_cols[0]]))
+        except: 
+            pg = 1
+    
+    return fpath, pg
+
+@st.cache_resource
+def get_highlight_jobs():
+    """Highlight cache ต่อ workbook (ใช้ร่วมกันทุก session ใน process)"""
+    return HighlightJobs()
+
+def start_highlight_precompute(df, links):
+    """
+    เริ่มคำนวณตำแหน่ง highlight ของทุก (แถว, field) ของ workbook ที่โหลดอยู่ใน background
+    (process pool, OCR_HIGHLIGHT_WORKERS) - กด 🔍 แล้วเป็นแค่การเปิด dict
+    Return: HighlightPrecompute ของ workbook นี้ หรือ None ถ้าปิดไว้
+    """
+    if HIGHLIGHT_WORKERS <= 0 or df is None or df.empty:
+        return None
+    source = st.session_state.get('loaded_file_path') or st.session_state.uploaded_file_ref
+    if not source:
+        return None
+    # key ตามเวอร์ชันของไฟล์ (path/mtime/size) - รัน OCR ใหม่แล้วเปิด summary อีกครั้งจะคำนวณใหม่
+    try:
+        workbook_key = (source_identity(source), st.session_state.current_sheet)
+    except OSError:
+        return None
+    
+    def build():
+        tasks = {}
+        for i in range(len(df)):
+            fpath, pg = resolve_row_document(df, i, links)
+            if not fpath or not fpath.lower().endswith('.pdf') or not os.path.exists(fpath):
+                continue
+            row_links = links[i] if i < len(links) else {}
+            fields = tasks.setdefault((fpath, pg), [])
+            for col in df.columns:
+                col_lower = str(col).lower()
+                if col in HIGHLIGHT_SKIP_COLUMNS or ("link" in col_lower and "pdf" in col_lower):
+                    continue
+                value = detail_field_value(df.iloc[i], col, row_links)
+                if value and str(value).strip() and str(value).strip().lower() not in ['nan', 'none']:
+                    fields.append((col, str(value).strip()))
+        tesseract_path = TESSERACT_PATH if HAS_PYTESSERACT and TESSERACT_PATH and os.path.exists(TESSERACT_PATH) else None
+        return HighlightPrecompute(tasks, ocr_output_dirs(), tesseract_path, POPPLER_PATH)
+    
+    job = get_highlight_jobs().start(workbook_key, build)
+    st.session_state.highlight_job_key = workbook_key
+    return job
+
+def current_highlight_job():
+    key = st.session_state.get('highlight_job_key')
+    return get_highlight_jobs().get(key) if key else None
+
 def render_page_2():
     # Page selection at the top (compact)
     col_title, col_page = st.columns([0.75, 0.25])
@@ -2969,8 +2397,8 @@ def render_page_2():
                                 if st.button("Open", key=f"open_file_{idx}", use_container_width=True):
                                     # โหลดไฟล์โดยตรงจาก path
                                     try:
-                                        df = pd.read_excel(file_path, sheet_name=0, engine='openpyxl', dtype=str)
-                                        df = df.replace('nan', '')
+                                        workbook_sheet = load_workbook_sheet(file_path)
+                                        df = workbook_sheet.df.replace('nan', '')
                                         if "_chk" not in df.columns: 
                                             df.insert(0, "_chk", False)
                                         else: 
@@ -2986,7 +2414,7 @@ def render_page_2():
                                         st.session_state.df_data = df
                                         st.session_state.base_folder_cache = base_folder
                                         st.session_state.loaded_file_path = file_path
-                                        st.session_state.current_sheet = pd.ExcelFile(file_path).sheet_names[0]
+                                        st.session_state.current_sheet = workbook_sheet.sheet
                                         st.session_state.data_version = 0
                                         load_vendor_master()
                                         st.success(f"✅ Loaded: {file_name}")
@@ -3016,10 +2444,9 @@ def render_page_2():
             
             if uploaded_file:
                 st.session_state.uploaded_file_ref = uploaded_file
-                st.session_state.current_sheet = get_sheet_names_fresh(uploaded_file)[0]
-                uploaded_file.seek(0)
-                df = pd.read_excel(uploaded_file, sheet_name=st.session_state.current_sheet, engine='openpyxl', dtype=str)
-                df = df.replace('nan', '')
+                workbook_sheet = load_workbook_sheet(uploaded_file)
+                st.session_state.current_sheet = workbook_sheet.sheet
+                df = workbook_sheet.df.replace('nan', '')
                 if "_chk" not in df.columns: 
                     df.insert(0, "_chk", False)
                 else: 
@@ -3038,8 +2465,8 @@ def render_page_2():
                 st.rerun()
 
         else:
-            # Toolbar [Sheet] [Gen SAP] [Detail+Nav] [Reset] [Save] [Reload Vendor]
-            c_sheet, c_gen, c_detail, c_reset, c_save, c_reload = st.columns([0.20, 0.15, 0.20, 0.12, 0.12, 0.12])
+            # Toolbar [Sheet] [Gen SAP] [Detail+Nav] [Reset] [Save] [Reload Vendor] [Remap Vendor]
+            c_sheet, c_gen, c_detail, c_reset, c_save, c_reload, c_remap = st.columns([0.18, 0.13, 0.20, 0.10, 0.11, 0.11, 0.11])
             with c_sheet:
                 # รองรับทั้ง uploaded file และ loaded from path
                 file_ref = st.session_state.uploaded_file_ref
@@ -3047,9 +2474,9 @@ def render_page_2():
                 
                 # ดึงรายชื่อ sheet
                 if file_ref:
-                    sheet_names = get_sheet_names_fresh(file_ref)
+                    sheet_names = load_workbook_sheet(file_ref, st.session_state.current_sheet).sheet_names
                 elif file_path and os.path.exists(file_path):
-                    sheet_names = pd.ExcelFile(file_path).sheet_names
+                    sheet_names = load_workbook_sheet(file_path, st.session_state.current_sheet).sheet_names
                 else:
                     sheet_names = [st.session_state.current_sheet] if st.session_state.current_sheet else ["Sheet1"]
                 
@@ -3060,10 +2487,9 @@ def render_page_2():
                     st.session_state.current_sheet = new_sheet
                     # อ่านจาก file_ref หรือ file_path
                     if file_ref:
-                        file_ref.seek(0)
-                        df = pd.read_excel(file_ref, sheet_name=new_sheet, engine='openpyxl', dtype=str)
+                        df = load_workbook_sheet(file_ref, new_sheet).df
                     elif file_path and os.path.exists(file_path):
-                        df = pd.read_excel(file_path, sheet_name=new_sheet, engine='openpyxl', dtype=str)
+                        df = load_workbook_sheet(file_path, new_sheet).df
                     else:
                         st.error("ไม่พบไฟล์ที่จะอ่าน")
                         df = st.session_state.df_data
@@ -3156,46 +2582,29 @@ def render_page_2():
                 if st.button("🔄 Vendor", help="Reload Vendor Master", use_container_width=True):
                     master = load_vendor_master(force_reload=True)
                     if master is not None:
-                        st.toast(f"✅ Reload Vendor Master สำเร็จ ({len(master)} rows)", icon="✅")
+                        st.toast(f"✅ Reload Vendor Master สำเร็จ ({master.rows} rows)", icon="✅")
                     else:
                         st.error(f"❌ ไม่สามารถโหลด Vendor Master ได้ - Path: {VENDOR_MASTER_PATH}")
 
+            with c_remap:
+                if st.button("🔁 Remap", help="Map Vendor code / ชื่อ ใหม่ทุกแถวจาก Vendor Master (เช่น หลังอัปเดต Master)", use_container_width=True):
+                    snapshot = load_vendor_master()
+                    if snapshot is not None:
+                        col_vid, col_branch, col_vcode, col_vname = find_vendor_columns(st.session_state.df_data.columns)
+                        if col_vid in st.session_state.df_data.columns and col_branch in st.session_state.df_data.columns:
+                            # normalize + lookup ทั้งตารางในครั้งเดียว (ไม่วนทีละแถว)
+                            changed, matched = remap_vendor_codes(
+                                st.session_state.df_data, snapshot.index, col_vid, col_branch, col_vcode, col_vname
+                            )
+                            st.session_state.data_version += 1
+                            st.toast(f"✅ Remap Vendor: เปลี่ยน {changed} แถว (พบใน Master {matched}/{len(st.session_state.df_data)} แถว)", icon="✅")
+                        else:
+                            st.error(f"❌ ไม่พบ column VendorID/Branch ({col_vid}, {col_branch})")
+
             # --- Content ---
             if st.session_state.view_mode == 'list':
                 df_cols = st.session_state.df_data.columns
-                # หา column name ที่ตรงกับ pattern (ลองหลาย pattern)
-                # VendorID_OCR อาจเป็น "VendorID_OCR" หรือ "Vendor_OCR" หรือ "VendorID"
-                col_vid = None
-                for pattern in [["vendor", "id"], ["vendorid"], ["vendor", "ocr"]]:
-                    col_vid = find_column_name(df_cols, pattern)
-                    if col_vid:
-                        break
-                if not col_vid:
-                    # ลองหาโดยตรง
-                    for col in df_cols:
-                        col_lower = str(col).lower()
-                        if "vendorid" in col_lower or ("vendor" in col_lower and "id" in col_lower and "ocr" in col_lower):
-                            col_vid = col
-                            break
-                col_vid = col_vid or "VendorID_OCR"
-                
-                # Branch_OCR อาจเป็น "Branch_OCR" หรือ "BranchOCR"
-                col_branch = None
-                for pattern in [["branch"]]:
-                    col_branch = find_column_name(df_cols, pattern)
-                    if col_branch:
-                        break
-                if not col_branch:
-                    # ลองหาโดยตรง
-                    for col in df_cols:
-                        col_lower = str(col).lower()
-                        if "branch" in col_lower and "ocr" in col_lower:
-                            col_branch = col
-                            break
-                col_branch = col_branch or ("Branch_OCR" if "Branch_OCR" in df_cols else "BranchOCR")
-                
-                col_vcode = find_column_name(df_cols, ["vendor", "code"]) or "Vendor code"
-                col_vname = find_column_name(df_cols, ["vendor", "name"]) or "Vendor Name"
+                col_vid, col_branch, col_vcode, col_vname = find_vendor_columns(df_cols)
                 
                 def on_editor_change():
                     current_key = f"main_editor_{st.session_state.data_version}"
@@ -3350,6 +2759,33 @@ def render_page_2():
                                     # (ไม่ต้อง rerun เพราะ Streamlit จะ rerun อัตโนมัติหลัง callback)
                                     st.session_state.data_version += 1
                     
+                    # ไม่พบ Vendor code: เสนอเลขผู้เสียภาษีที่ใกล้เคียง (ต่างกัน 1 หลัก) ให้เลือกใช้
+                    def apply_vendor_suggestion(idx, suggestion):
+                        st.session_state.df_data.at[idx, col_vid] = suggestion['tax_id']
+                        if col_branch in df_cols:
+                            st.session_state.df_data.at[idx, col_branch] = suggestion['branch']
+                        if col_vcode in df_cols:
+                            st.session_state.df_data.at[idx, col_vcode] = suggestion['code']
+                        if col_vname in df_cols and suggestion['name']:
+                            st.session_state.df_data.at[idx, col_vname] = suggestion['name']
+                        st.session_state.data_version += 1
+                    
+                    cur_vid = str(row_data.get(col_vid, "")).strip() if pd.notna(row_data.get(col_vid, "")) else ""
+                    cur_br = str(row_data.get(col_branch, "")).strip() if pd.notna(row_data.get(col_branch, "")) else ""
+                    if cur_vid and cur_br and load_vendor_master() is not None and not lookup_vendor_info(cur_vid, cur_br):
+                        suggestions = suggest_vendor_matches(cur_vid, cur_br)
+                        if suggestions:
+                            with st.expander(f"💡 ไม่พบ Vendor ของเลข {cur_vid} - เลขใกล้เคียง {len(suggestions)} รายการ", expanded=True):
+                                for n, sug in enumerate(suggestions):
+                                    mark = "✅" if sug['checksum_ok'] else "⚠️"
+                                    st.button(
+                                        f"{mark} {sug['tax_id']} / {sug['branch']} → {sug['code']} {sug['name']}",
+                                        key=f"vsug_{n}_{st.session_state.data_version}",
+                                        on_click=apply_vendor_suggestion,
+                                        args=(current_idx, sug),
+                                        help="ใช้เลขผู้เสียภาษี/สาขา/Vendor code นี้กับแถวปัจจุบัน (✅ = checksum ถูกต้อง)"
+                                    )
+                    
                     # ฟังก์ชันสำหรับ field focus และ highlight
                     def on_field_focus(col_name, field_value, idx, pdf_path, page_num):
                         """เมื่อ field ถูก focus ให้ค้นหาและ highlight ใน PDF"""
@@ -3364,7 +2800,13 @@ def render_page_2():
                             
                             # ค้นหาตำแหน่งใน PDF
                             if os.path.splitext(pdf_path)[1].lower() == '.pdf':
-                                positions = find_text_bbox_in_pdf(pdf_path, clean_value, page_num, field_name=col_name)
+                                # ใช้ผลที่คำนวณไว้ล่วงหน้าถ้ามี (background precompute) ไม่งั้นค้นหาตอนนี้แล้วเก็บไว้
+                                job = current_highlight_job()
+                                positions = job.get(pdf_path, page_num, col_name, clean_value) if job else None
+                                if positions is None:
+                                    positions = find_text_bbox_in_pdf(pdf_path, clean_value, page_num, field_name=col_name)
+                                    if job:
+                                        job.put(pdf_path, page_num, col_name, clean_value, positions)
                                 st.session_state.pdf_highlight_positions = positions
                                 st.session_state.data_version += 1  # Force refresh
                                 
@@ -3392,52 +2834,14 @@ def render_page_2():
                     # ให้เราย้ายการหา fpath มาด้านบน
                     temp_fpath = None
                     temp_pg = 1
+                    temp_links = []
                     if st.session_state.selected_row_idx is not None and st.session_state.df_data is not None:
-                        temp_row = st.session_state.df_data.iloc[st.session_state.selected_row_idx]
-                        temp_links = []
-                        # รองรับทั้ง uploaded file และ loaded from path
-                        temp_file_source = st.session_state.uploaded_file_ref
-                        if temp_file_source is None:
-                            temp_file_source = st.session_state.get('loaded_file_path')
-                        if temp_file_source is not None and st.session_state.current_sheet is not None:
-                            temp_links = extract_hyperlinks(temp_file_source, st.session_state.current_sheet)
-                        if st.session_state.selected_row_idx < len(temp_links):
-                            for k, v in temp_links[st.session_state.selected_row_idx].items():
-                                # v is now a dict with 'target' and 'display' keys
-                                if v and isinstance(v, dict):
-                                    target = v.get('target', '')
-                                    if target and ('.pdf' in target.lower() or '.png' in target.lower() or '.jpg' in target.lower() or '.jpeg' in target.lower()): 
-                                        candidate_path = target.strip().replace('/', os.sep).replace('\\', os.sep)
-                                        if not os.path.isabs(candidate_path):
-                                            base = st.session_state.get('base_folder_cache', os.getcwd())
-                                            candidate_path = os.path.join(base, candidate_path)
-                                        candidate_path = os.path.normpath(candidate_path)
-                                        if os.path.exists(candidate_path):
-                                            temp_fpath = candidate_path
-                                            break
-                                        else:
-                                            original_path = target.strip()
-                                            if os.path.exists(original_path):
-                                                temp_fpath = original_path
-                                                break
-                        
-                        if not temp_fpath:
-                            cols_lower = [str(c).lower() for c in st.session_state.df_data.columns]
-                            fname = ""
-                            if "filename" in cols_lower: 
-                                fname = str(temp_row[st.session_state.df_data.columns[cols_lower.index("filename")]])
-                            clean_name = re.sub(r'[\r\n\t"]', '', fname.replace("เปิดไฟล์", "").strip())
-                            if clean_name:
-                                base = st.session_state.get('base_folder_cache', os.getcwd())
-                                temp_fpath = os.path.join(base, clean_name)
-                                temp_fpath = os.path.normpath(temp_fpath)
-                        
-                        pg_cols = [c for c in st.session_state.df_data.columns if "page" in str(c).lower()]
-                        if pg_cols:
-                            try: 
-                                temp_pg = int(float(temp_row[pg_cols[0]]))
-                            except: 
-                                temp_pg = 1
+                        temp_links = current_workbook_links()
+                        temp_fpath, temp_pg = resolve_row_document(st.session_state.df_data, st.session_state.selected_row_idx, temp_links)
+
+                    temp_row_links = {}
+                    if st.session_state.selected_row_idx is not None and st.session_state.selected_row_idx < len(temp_links):
+                        temp_row_links = temp_links[st.session_state.selected_row_idx]
 
                     for i in range(0, len(cols), 2):
                         c1, c2 = st.columns(2)
@@ -3447,18 +2851,7 @@ def render_page_2():
                             field_col, btn_col = st.columns([0.85, 0.15])
                             
                             with field_col:
-                                field_value = str(row_data[col1])
-                                
-                                # ถ้า column นี้มี hyperlink ให้แสดง display text แทน
-                                if st.session_state.selected_row_idx < len(temp_links):
-                                    link_info = temp_links[st.session_state.selected_row_idx].get(col1)
-                                    if link_info and isinstance(link_info, dict):
-                                        field_value = link_info.get('display', field_value)
-                                
-                                # Format date for InvDateOCR columns
-                                field_value = format_date_value(field_value, col1)
-                                # Format number for InvAmtOCR columns
-                                field_value = format_number_value(field_value, col1)
+                                field_value = detail_field_value(row_data, col1, temp_row_links)
                                 
                                 input_key = f"det_{col1}_{st.session_state.data_version}"
                                 
@@ -3494,18 +2887,7 @@ def render_page_2():
                                 field_col2, btn_col2 = st.columns([0.85, 0.15])
                                 
                                 with field_col2:
-                                    field_value2 = str(row_data[col2])
-                                    
-                                    # ถ้า column นี้มี hyperlink ให้แสดง display text แทน
-                                    if st.session_state.selected_row_idx < len(temp_links):
-                                        link_info2 = temp_links[st.session_state.selected_row_idx].get(col2)
-                                        if link_info2 and isinstance(link_info2, dict):
-                                            field_value2 = link_info2.get('display', field_value2)
-                                    
-                                    # Format date for InvDateOCR columns
-                                    field_value2 = format_date_value(field_value2, col2)
-                                    # Format number for InvAmtOCR columns
-                                    field_value2 = format_number_value(field_value2, col2)
+                                    field_value2 = detail_field_value(row_data, col2, temp_row_links)
                                     
                                     input_key2 = f"det_{col2}_{st.session_state.data_version}"
                                     
@@ -3537,110 +2919,18 @@ def render_page_2():
     fpath = None
     pg = 1
     if st.session_state.selected_row_idx is not None and st.session_state.df_data is not None:
-        row = st.session_state.df_data.iloc[st.session_state.selected_row_idx]
-        
-        # Method 1: Try to extract from hyperlinks first
-        links = []
-        # รองรับทั้ง uploaded file และ loaded from path
-        file_source = st.session_state.uploaded_file_ref
-        if file_source is None:
-            file_source = st.session_state.get('loaded_file_path')
-        
-        if file_source is not None and st.session_state.current_sheet is not None:
-            links = extract_hyperlinks(file_source, st.session_state.current_sheet)
-            if st.session_state.selected_row_idx < len(links):
-                for k, v in links[st.session_state.selected_row_idx].items():
-                    # v is now a dict with 'target' and 'display' keys
-                    if v and isinstance(v, dict):
-                        target = v.get('target', '')
-                        if target and ('.pdf' in target.lower() or '.png' in target.lower() or '.jpg' in target.lower() or '.jpeg' in target.lower()): 
-                            candidate_path = target.strip()
-                            # Normalize path separators for Windows
-                            candidate_path = candidate_path.replace('/', os.sep).replace('\\', os.sep)
-                            # If relative path, try to resolve it
-                            if not os.path.isabs(candidate_path):
-                                base = st.session_state.get('base_folder_cache', os.getcwd())
-                                candidate_path = os.path.join(base, candidate_path)
-                            # Normalize the path (resolve .. and .)
-                            candidate_path = os.path.normpath(candidate_path)
-                            # Check if file exists
-                            if os.path.exists(candidate_path):
-                                fpath = candidate_path
-                                break
-                            else:
-                                # Try original path from hyperlink as-is (might be absolute)
-                                original_path = target.strip()
-                                if os.path.exists(original_path):
-                                    fpath = original_path
-                                    break
-        
-        # Method 2: Read directly from "Link PDF" column (even if it's not a hyperlink)
-        if not fpath:
-            cols_lower = [str(c).lower() for c in st.session_state.df_data.columns]
-            
-            # Try "Link PDF" column first
-            link_pdf_col = None
-            for col in st.session_state.df_data.columns:
-                if "link" in str(col).lower() and "pdf" in str(col).lower():
-                    link_pdf_col = col
-                    break
-            
-            if link_pdf_col:
-                link_value = row[link_pdf_col]
-                if link_value and str(link_value).strip().lower() not in ['none', 'nan', '']:
-                    # Extract path from HYPERLINK formula if present
-                    link_str = str(link_value).strip()
-                    
-                    # Check if it's a HYPERLINK formula
-                    if link_str.upper().startswith("=HYPERLINK"):
-                        # Parse HYPERLINK formula: =HYPERLINK("target", "display")
-                        matches = re.findall(r'["\']([^"\']+)["\']', link_str)
-                        if len(matches) >= 1:
-                            candidate_path = matches[0].strip()
-                        else:
-                            candidate_path = link_str
-                    else:
-                        # Direct path value
-                        candidate_path = link_str
-                    
-                    # Normalize path
-                    candidate_path = candidate_path.replace('/', os.sep).replace('\\', os.sep)
-                    
-                    # If relative path, try to resolve it
-                    if not os.path.isabs(candidate_path):
-                        base = st.session_state.get('base_folder_cache', os.getcwd())
-                        candidate_path = os.path.join(base, candidate_path)
-                    
-                    candidate_path = os.path.normpath(candidate_path)
-                    
-                    # Check if file exists
-                    if os.path.exists(candidate_path):
-                        fpath = candidate_path
-        
-        # Method 3: Try "filename" column as fallback
-        if not fpath:
-            cols_lower = [str(c).lower() for c in st.session_state.df_data.columns]
-            fname = ""
-            if "filename" in cols_lower: 
-                fname = str(row[st.session_state.df_data.columns[cols_lower.index("filename")]])
-            
-            if fname and str(fname).strip().lower() not in ['none', 'nan', '']:
-                clean_name = re.sub(r'[\r\n\t"]', '', fname.replace("เปิดไฟล์", "").strip())
-                if clean_name:
-                    base = st.session_state.get('base_folder_cache', os.getcwd())
-                    fpath = os.path.join(base, clean_name)
-                    # Normalize the path
-                    fpath = os.path.normpath(fpath)
-        
-        pg_cols = [c for c in st.session_state.df_data.columns if "page" in str(c).lower()]
-        if pg_cols:
-            try: 
-                pg = int(float(row[pg_cols[0]]))
-            except: 
-                pg = 1
-
+        links = current_workbook_links()
+        fpath, pg = resolve_row_document(st.session_state.df_data, st.session_state.selected_row_idx, links)
+        start_highlight_precompute(st.session_state.df_data, links)
+        prefetch_neighbor_pages(st.session_state.df_data, st.session_state.selected_row_idx, links,
+                                st.session_state.get('pdf_zoom_level', 1.0))
+    
     with col_viewer:
         st.markdown('<div class="css-card" style="height: 100%;">', unsafe_allow_html=True) 
+        highlight_job = current_highlight_job()
+        if highlight_job is not None and highlight_job.running:
+            st.progress(highlight_job.done / highlight_job.total,
+                        text=f"🔍 กำลังเตรียมตำแหน่ง highlight ล่วงหน้า {highlight_job.done}/{highlight_job.total} field")
         if fpath:
             if os.path.exists(fpath):
                 c_v_head, c_v_btn = st.columns([0.8, 0.2])
@@ -3715,21 +3005,8 @@ def render_page_2():
                             if highlight_pos and highlight_pos[0].get('method') != 'pdf_text_layer':
                                 # สำหรับ scan PDF แสดง text context
                                 try:
-                                    pdf_dir = os.path.dirname(fpath)
-                                    pdf_basename = os.path.splitext(os.path.basename(fpath))[0]
-                                    txt_filename = f"{pdf_basename}_page{pg}.txt"
-                                    
-                                    possible_txt_paths = [
-                                        os.path.join(pdf_dir, txt_filename),
-                                        os.path.join(st.session_state.get('ocr_output_folder', DEFAULT_OUTPUT_PATH), txt_filename),
-                                        os.path.join(DEFAULT_OUTPUT_PATH, txt_filename),
-                                    ]
-                                    
-                                    txt_path = None
-                                    for path in possible_txt_paths:
-                                        if os.path.exists(path):
-                                            txt_path = path
-                                            break
+                                    txt_filename = f"{os.path.splitext(os.path.basename(fpath))[0]}_page{pg}.txt"
+                                    txt_path = find_ocr_txt_path(fpath, pg)
                                     
                                     if txt_path:
                                         with open(txt_path, 'r', encoding='utf-8') as f:
@@ -3737,9 +3014,15 @@ def render_page_2():
                                         
                                         search_value = st.session_state.highlighted_field.get('field_value', '')
                                         if search_value:
-                                            # หา text context รอบๆ text ที่พบ
-                                            pattern = re.escape(search_value)
-                                            matches = list(re.finditer(pattern, ocr_text, re.IGNORECASE))
+                                            # หา text context รอบๆ text ที่พบ (ใช้ span จาก .fields.json ถ้ามี)
+                                            known_span = load_field_span(txt_path, st.session_state.highlighted_field.get('field_name'), search_value)
+                                            if known_span and known_span['end'] <= len(ocr_text):
+                                                st.caption(f"Pattern: `{known_span.get('pattern_id', '')}`")
+                                                span_text = ocr_text[known_span['start']:known_span['end']]
+                                                matches = [re.compile(re.escape(span_text)).match(ocr_text, known_span['start'])]
+                                            else:
+                                                pattern = re.escape(search_value)
+                                                matches = list(re.finditer(pattern, ocr_text, re.IGNORECASE))
                                             
                                             if matches:
                                                 st.write("**Text Context from OCR:**")
@@ -3791,7 +3074,7 @@ def render_page_2():
                     if debug_file_source is None:
                         debug_file_source = st.session_state.get('loaded_file_path')
                     if debug_file_source is not None:
-                        links = extract_hyperlinks(debug_file_source, st.session_state.current_sheet)
+                        links = current_workbook_links()
                         if st.session_state.selected_row_idx < len(links):
                             st.write("Hyperlinks found:", links[st.session_state.selected_row_idx])
                         else:
@@ -0,0 +1,13 @@
+"""
+Shared extraction core used by Extract_Inv*.py
+
+- templates / parser: document templates, regex guard, field parsing
+- vendor: Vendor_branch.xlsx loading and Vendor code mapping
+- output: _pageN.txt, _pageN.fields.json and summary Excel
+- backends: OCR engines (Typhoon API, Ollama, PDF text layer, Tesseract)
+- runner: run_extraction(backend, source_dir, output_dir, page_config, doc_type)
+"""
+from .backends import BACKENDS, get_backend
+from .runner import run_extraction, main
+
+__all__ = ["BACKENDS", "get_backend", "run_extraction", "main"]
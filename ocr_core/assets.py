@@ -0,0 +1,118 @@
+"""
+Content-addressed files under Streamlit's static folder (<app dir>/static, served at
+app/static/... when server.enableStaticServing is on): the browser caches them, and
+reruns send only the URL instead of base64 data
+"""
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .config import SCRIPT_DIR, STATIC_CACHE_MB
+
+STATIC_ROOT = os.path.join(SCRIPT_DIR, "static")
+STATIC_URL = "app/static"
+
+# Source files whose URL is remembered (not hashed again on every rerun)
+FILE_MEMO_ENTRIES = 1024
+
+# Pruning frees space down to this fraction of max_bytes
+PRUNE_TO = 0.8
+
+
+class StaticAssets:
+    """
+    Files named by the hash of their content in STATIC_ROOT/<subdir>, so a URL never
+    changes meaning and can be cached by the browser. Beyond max_bytes the least
+    recently written files are removed.
+    """
+
+    def __init__(self, subdir="pages", max_bytes=STATIC_CACHE_MB * 1024 * 1024, root=STATIC_ROOT):
+        self.subdir = subdir
+        self.folder = os.path.join(root, subdir)
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # (path, mtime, size) -> URL of files already copied
+        self._lock = threading.Lock()
+        self._size = None  # bytes in the folder, scanned on the first write then kept up to date
+        os.makedirs(self.folder, exist_ok=True)
+
+    def url(self, name):
+        return f"{STATIC_URL}/{self.subdir}/{name}"
+
+    def put_bytes(self, data, ext):
+        """Write data (once) and return its URL"""
+        name = hashlib.sha1(data).hexdigest()[:24] + ext
+        path = os.path.join(self.folder, name)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            with self._lock:
+                if self._size is None:
+                    self._size = self._folder_size()
+                else:
+                    self._size += len(data)
+                over = self._size > self.max_bytes
+            if over:
+                self.prune(keep=path)
+        return self.url(name)
+
+    def put_file(self, path):
+        """Copy a file (once per path/mtime/size) and return its URL"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size)
+        with self._lock:
+            url = self._files.get(key)
+        if url is not None and self.exists(url):
+            return url
+        with open(path, 'rb') as f:
+            url = self.put_bytes(f.read(), os.path.splitext(path)[1].lower())
+        with self._lock:
+            self._files[key] = url
+            while len(self._files) > FILE_MEMO_ENTRIES:
+                self._files.popitem(last=False)
+        return url
+
+    def put_image(self, image, format='PNG'):
+        buffer = io.BytesIO()
+        image.save(buffer, format=format)
+        return self.put_bytes(buffer.getvalue(), '.' + format.lower())
+
+    def exists(self, url):
+        """File of a URL from this store is still there (not pruned)"""
+        return os.path.exists(os.path.join(self.folder, url.rsplit('/', 1)[-1]))
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _folder_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def prune(self, keep=None):
+        """
+        Remove the oldest files (except keep) down to PRUNE_TO of max_bytes, so the folder
+        is scanned once per that much new data rather than on every write once full
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes * PRUNE_TO:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._size = total
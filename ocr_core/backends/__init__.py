@@ -0,0 +1,26 @@
+"""OCR backends: name -> class"""
+from .base import OCRBackend
+from .typhoon_api import TyphoonAPIBackend
+from .ollama import OllamaBackend
+from .text_layer import TextLayerBackend
+from .tesseract import TesseractBackend
+
+BACKENDS = {
+    TyphoonAPIBackend.name: TyphoonAPIBackend,
+    OllamaBackend.name: OllamaBackend,
+    TextLayerBackend.name: TextLayerBackend,
+    TesseractBackend.name: TesseractBackend,
+}
+
+
+def get_backend(name, **kwargs):
+    """Create a backend by name ("typhoon", "ollama", "text", "tesseract")"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name} (available: {list(BACKENDS)})")
+    return BACKENDS[name](**kwargs)
+
+
+__all__ = [
+    "OCRBackend", "TyphoonAPIBackend", "OllamaBackend", "TextLayerBackend", "TesseractBackend",
+    "BACKENDS", "get_backend",
+]
@@ -0,0 +1,29 @@
+"""OCR backend interface"""
+
+
+class OCRBackend:
+    """
+    One OCR engine. The runner splits the target pages of every PDF into batches of
+    at most `max_pages_per_request` pages and keeps up to `max_workers` batches in
+    flight (threads, or processes when `uses_processes` is set).
+    """
+    name = ""
+    label = ""
+    summary_file = "summary_ocr.xlsx"
+    
+    # Concurrency / batching limits of the engine
+    max_workers = 1
+    max_pages_per_request = 1
+    uses_processes = False
+    
+    def check(self):
+        """Ready to run? Returns (ok, message)"""
+        return True, ""
+    
+    def escalated(self):
+        """Same engine with higher-fidelity (slower) settings for re-OCR of failing pages, or None"""
+        return None
+    
+    def ocr_pages(self, file_path, pages):
+        """OCR the given 1-based pages of a PDF, returns [(page_num, text), ...] for pages that succeeded"""
+        raise NotImplementedError
@@ -0,0 +1,120 @@
+"""Local Ollama (typhoon-ocr) backend"""
+import os
+import io
+import gc
+import re
+import base64
+
+import requests
+from pdf2image import convert_from_path
+from PIL import Image, ImageEnhance
+
+from ..config import get_poppler_path
+from .base import OCRBackend
+
+
+def preprocess_image(image, max_size=1280, contrast=1.8):
+    """Preprocess image for better OCR results"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if contrast:
+        image = ImageEnhance.Contrast(image).enhance(contrast)
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return image
+
+
+def clean_ocr_text(text):
+    """Clean OCR extracted text"""
+    if not text:
+        return ""
+    text = re.sub(r'<[^>]+>', ' ', text)
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    return text.strip()
+
+
+class OllamaBackend(OCRBackend):
+    name = "ollama"
+    label = "Local Ollama"
+    summary_file = "summary_ocr_local.xlsx"
+    
+    # One page at a time: the local model is GPU/RAM bound
+    max_workers = 1
+    max_pages_per_request = 1
+    
+    def __init__(self, dpi=300, max_size=1280, contrast=1.8, num_predict=1024):
+        self.api_url = os.environ.get("OLLAMA_API_URL", "http://localhost:11434/api/generate")
+        self.model_name = os.environ.get("OCR_MODEL_NAME", "scb10x/typhoon-ocr1.5-3b:latest")
+        self.poppler_path = get_poppler_path()
+        self.dpi = dpi
+        self.max_size = max_size
+        self.contrast = contrast
+        self.num_predict = num_predict
+    
+    def escalated(self):
+        """Higher DPI / image size, no contrast boost, longer output"""
+        retry = OllamaBackend(dpi=400, max_size=1800, contrast=None, num_predict=2048)
+        retry.label = f"{self.label} (retry)"
+        return retry
+    
+    def check(self):
+        """Check if Ollama is running and accessible"""
+        try:
+            response = requests.get(self.api_url.replace("/api/generate", "/api/tags"), timeout=5)
+            if response.status_code == 200:
+                return True, ""
+        except Exception:
+            pass
+        return False, "Cannot connect to Ollama. Please ensure Ollama is running."
+    
+    def ocr_pages(self, file_path, pages):
+        """Extract text from PDF pages using Ollama OCR"""
+        extracted_pages = []
+        
+        for page_num in pages:
+            try:
+                print(f"   [Step 1] Rendering Page {page_num}...")
+                images = convert_from_path(
+                    file_path,
+                    first_page=page_num,
+                    last_page=page_num,
+                    poppler_path=self.poppler_path,
+                    dpi=self.dpi
+                )
+                if not images:
+                    continue
+                
+                img = preprocess_image(images[0], self.max_size, self.contrast)
+                buffered = io.BytesIO()
+                img.save(buffered, format="PNG")
+                img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+                
+                print("   [Step 2] Sending to AI...")
+                payload = {
+                    "model": self.model_name,
+                    "prompt": "Extract text from image. Return clean Markdown only.",
+                    "images": [img_str],
+                    "stream": False,
+                    "options": {
+                        "temperature": 0,
+                        "num_ctx": 4096,
+                        "num_predict": self.num_predict
+                    }
+                }
+                response = requests.post(self.api_url, json=payload, timeout=300)
+                
+                if response.status_code == 200:
+                    raw_content = response.json().get("response", "").strip()
+                    if "Instructions:" in raw_content:
+                        raw_content = raw_content.split("Instructions:")[-1]
+                    extracted_pages.append((page_num, clean_ocr_text(raw_content)))
+                    print(f"   [Step 3] Page {page_num} Processed.")
+                
+                del img, img_str, buffered, images
+                gc.collect()
+                
+            except Exception as e:
+                print(f"   [Error] Page {page_num}: {e}")
+        
+        return extracted_pages
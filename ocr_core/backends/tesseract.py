@@ -0,0 +1,66 @@
+"""Offline Tesseract (tha+eng) backend"""
+import os
+
+from pdf2image import convert_from_path
+
+from ..config import get_poppler_path, get_tesseract_path
+from .base import OCRBackend
+
+try:
+    import pytesseract
+    HAS_TESSERACT = True
+except ImportError:
+    HAS_TESSERACT = False
+
+TESSERACT_LANG = "tha+eng"
+
+
+class TesseractBackend(OCRBackend):
+    name = "tesseract"
+    label = "Tesseract (Offline)"
+    summary_file = "summary_ocr_tesseract.xlsx"
+    
+    # CPU bound: one page per task, one process per core
+    max_pages_per_request = 1
+    uses_processes = True
+    
+    def __init__(self, dpi=300):
+        self.poppler_path = get_poppler_path()
+        self.tesseract_path = get_tesseract_path()
+        self.max_workers = max(1, int(os.environ.get("TESSERACT_WORKERS", "0")) or os.cpu_count() or 1)
+        self.dpi = dpi
+    
+    def escalated(self):
+        """Render at 400 DPI"""
+        retry = TesseractBackend(dpi=400)
+        retry.label = f"{self.label} (retry)"
+        return retry
+    
+    def check(self):
+        if not HAS_TESSERACT:
+            return False, "pytesseract not installed (pip install pytesseract)"
+        if not self.tesseract_path:
+            return False, "Tesseract not found. Install tesseract-ocr or set TESSERACT_PATH"
+        return True, ""
+    
+    def ocr_pages(self, file_path, pages):
+        """Render each page (300 DPI by default) and run Tesseract tha+eng (runs in a worker process)"""
+        pytesseract.pytesseract.tesseract_cmd = self.tesseract_path
+        # Parallelism comes from the process pool; keep each tesseract single-threaded
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+        extracted_pages = []
+        for page_num in pages:
+            try:
+                images = convert_from_path(
+                    file_path,
+                    first_page=page_num,
+                    last_page=page_num,
+                    poppler_path=self.poppler_path,
+                    dpi=self.dpi
+                )
+                if images:
+                    text = pytesseract.image_to_string(images[0], lang=TESSERACT_LANG)
+                    extracted_pages.append((page_num, text.strip()))
+            except Exception as e:
+                print(f"   [Error] Page {page_num}: {e}")
+        return extracted_pages
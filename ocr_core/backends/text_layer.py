@@ -0,0 +1,36 @@
+"""Embedded PDF text layer backend (no OCR, digital PDFs only)"""
+from .base import OCRBackend
+
+try:
+    import fitz  # PyMuPDF
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+
+class TextLayerBackend(OCRBackend):
+    name = "text"
+    label = "PDF Text Layer"
+    summary_file = "summary_ocr_text.xlsx"
+    
+    # Local and cheap: a whole file per call
+    max_workers = 4
+    max_pages_per_request = 1000
+    
+    def check(self):
+        if not HAS_PYMUPDF:
+            return False, "PyMuPDF not installed (pip install PyMuPDF)"
+        return True, ""
+    
+    def ocr_pages(self, file_path, pages):
+        """Read the text layer of the given pages; pages without text (scans) are skipped"""
+        extracted_pages = []
+        try:
+            with fitz.open(file_path) as doc:
+                for page_num in pages:
+                    text = doc[page_num - 1].get_text().strip()
+                    if text:
+                        extracted_pages.append((page_num, text))
+        except Exception as e:
+            print(f"   [Error] {file_path}: {e}")
+        return extracted_pages
@@ -0,0 +1,64 @@
+"""Typhoon OCR API backend"""
+import os
+import json
+
+import requests
+
+from ..config import load_api_key
+from .base import OCRBackend
+
+TYPHOON_API_URL = "https://api.opentyphoon.ai/v1/ocr"
+
+
+class TyphoonAPIBackend(OCRBackend):
+    name = "typhoon"
+    label = "API Typhoon"
+    summary_file = "summary_ocr.xlsx"
+    
+    def __init__(self, api_key=None):
+        self.api_key = api_key if api_key is not None else load_api_key()
+        # Requests in flight / pages per request (the API accepts a list of pages)
+        self.max_workers = max(1, int(os.environ.get("TYPHOON_MAX_WORKERS", "2")))
+        self.max_pages_per_request = max(1, int(os.environ.get("TYPHOON_PAGES_PER_REQUEST", "1")))
+        self.session = requests.Session()
+    
+    def check(self):
+        if not self.api_key:
+            return False, "API Key not set. Please set TYPHOON_API_KEY environment variable or update config.json"
+        return True, ""
+    
+    def ocr_pages(self, file_path, pages):
+        """Extract text from PDF pages using Typhoon OCR API"""
+        data = {
+            'model': 'typhoon-ocr',
+            'task_type': 'default',
+            'max_tokens': '16000',
+            'temperature': '0.1',
+            'top_p': '0.6',
+            'repetition_penalty': '1.1',
+            'pages': json.dumps(list(pages))
+        }
+        headers = {'Authorization': f'Bearer {self.api_key}'}
+        
+        try:
+            with open(file_path, 'rb') as file:
+                response = self.session.post(TYPHOON_API_URL, files={'file': file}, data=data, headers=headers)
+            
+            if response.status_code != 200:
+                print(f"Error API: {response.status_code} - {response.text}")
+                return []
+            
+            # Results come back in the order of the requested pages
+            extracted_pages = []
+            for page_num, page_result in zip(pages, response.json().get('results', [])):
+                if page_result.get('success'):
+                    content = page_result['message']['choices'][0]['message']['content']
+                    try:
+                        text = json.loads(content).get('natural_text', content)
+                    except json.JSONDecodeError:
+                        text = content
+                    extracted_pages.append((page_num, text))
+            return extracted_pages
+        except Exception as e:
+            print(f"Error processing file: {e}")
+            return []
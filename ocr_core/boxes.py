@@ -0,0 +1,163 @@
+"""Tesseract word boxes of a page (<name>_pageN.boxes.json next to the page text) and their token index"""
+import os
+import re
+import json
+
+BOXES_VERSION = 1
+
+# Columns kept from pytesseract.image_to_data() (words with text only)
+BOX_COLUMNS = ["text", "left", "top", "width", "height", "conf", "block_num", "par_num", "line_num"]
+
+
+def page_boxes_path(folder, pdf_path, page_num):
+    """<folder>/<pdf name>_pageN.boxes.json (same naming as page_text_path)"""
+    return os.path.join(folder, f"{os.path.splitext(os.path.basename(pdf_path))[0]}_page{page_num}.boxes.json")
+
+
+def source_stamp(pdf_path):
+    """mtime/size of the PDF, stored in the sidecar to detect a replaced file"""
+    stat = os.stat(pdf_path)
+    return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def compact_words(ocr_data):
+    """image_to_data() dict -> same dict restricted to BOX_COLUMNS and non-empty words"""
+    keep = [i for i, text in enumerate(ocr_data["text"]) if str(text).strip()]
+    words = {}
+    for column in BOX_COLUMNS:
+        values = ocr_data.get(column, [0] * len(ocr_data["text"]))
+        if column == "text":
+            words[column] = [str(values[i]).strip() for i in keep]
+        elif column == "conf":
+            words[column] = [float(values[i]) for i in keep]
+        else:
+            words[column] = [int(values[i]) for i in keep]
+    return words
+
+
+def save_page_boxes(path, pdf_path, page_num, dpi, lang, size, words):
+    """Write the sidecar atomically; size = (width, height) of the image the boxes refer to"""
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": BOXES_VERSION,
+                "source": source_stamp(pdf_path),
+                "page": page_num,
+                "dpi": dpi,
+                "lang": lang,
+                "width": size[0],
+                "height": size[1],
+                "words": words
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not save word boxes: {e}")
+
+
+def load_page_boxes(path, pdf_path, dpi, lang):
+    """Sidecar contents if it exists and matches the current PDF, DPI and language, else None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        if (data.get("version") != BOXES_VERSION or data.get("dpi") != dpi or data.get("lang") != lang
+                or data.get("source") != source_stamp(pdf_path)):
+            return None
+    except OSError:
+        return None
+    return data
+
+
+# --- Token index (highlight search) ---
+def normalize_token(text):
+    """Digit/dash tokens -> digits only ("0-1055-5" -> "010555"), others stripped as is"""
+    text = text.strip()
+    if text.isdigit() or re.match(r'^[\d\-\s]+$', text):
+        return re.sub(r'\D', '', text)
+    return text
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def phrase_word_match(search_word, box_text):
+    """Multi-word search rule: either contains the other, or same first 3 characters"""
+    s, t = search_word.lower(), box_text.lower()
+    return s in t or t in s or (len(s) >= 3 and len(t) >= 3 and s[:3] == t[:3])
+
+
+class PageTokenIndex:
+    """
+    Inverted index over the words of one page (ids = positions in the words columns):
+    - exact: normalized token -> ids, lower: lowercased text -> ids
+    - prefix: first 3 lowercased characters -> ids
+    - trigram: every 3-character piece of the lowercased text / normalized token -> ids
+    Candidate lookups return a superset in page order; callers apply their own scoring.
+    """
+    
+    def __init__(self, words, min_conf=30):
+        self.texts = words["text"]
+        self.norms = [normalize_token(t) for t in self.texts]
+        self.lowers = [t.lower() for t in self.texts]
+        self.exact, self.lower, self.prefix, self.trigram = {}, {}, {}, {}
+        for i, (norm, low) in enumerate(zip(self.norms, self.lowers)):
+            self.exact.setdefault(norm, []).append(i)
+            self.lower.setdefault(low, []).append(i)
+            self.prefix.setdefault(low[:3], []).append(i)
+            for gram in trigrams(low) | trigrams(norm.lower()):
+                self.trigram.setdefault(gram, []).append(i)
+        
+        # Reading order of confident words, for the adjacency walk of multi-word phrases
+        self.confident = [i for i, conf in enumerate(words["conf"]) if conf >= min_conf]
+        self.next_confident = {a: b for a, b in zip(self.confident, self.confident[1:])}
+    
+    def containing(self, text):
+        """ids whose lowercased text or normalized token may contain text"""
+        text = text.lower()
+        if len(text) < 3:
+            return range(len(self.texts))
+        return self.trigram.get(text[:3], [])
+    
+    def within(self, text, table):
+        """ids whose key in table (exact / lower) is a substring of text"""
+        found = set()
+        for start in range(len(text)):
+            for end in range(start + 1, len(text) + 1):
+                found.update(table.get(text[start:end], ()))
+        return found
+    
+    def token_candidates(self, search):
+        """ids whose normalized token equals, contains or is contained in search"""
+        ids = set(self.within(search, self.exact))
+        ids.update(i for i in self.containing(search) if search in self.norms[i])
+        return sorted(ids)
+    
+    def phrase(self, search_words):
+        """
+        First run of consecutive confident words matching search_words in order
+        (phrase_word_match): anchors for the first word come from the index, the rest
+        is an adjacency walk. Returns the list of ids or None.
+        """
+        first = search_words[0].lower()
+        anchors = set(self.within(first, self.lower))
+        anchors.update(self.containing(first))
+        if len(first) >= 3:
+            anchors.update(self.prefix.get(first[:3], ()))
+        
+        confident = set(self.confident)
+        for anchor in sorted(anchors):
+            if anchor not in confident or not phrase_word_match(search_words[0], self.texts[anchor]):
+                continue
+            run = [anchor]
+            for word in search_words[1:]:
+                following = self.next_confident.get(run[-1])
+                if following is None or not phrase_word_match(word, self.texts[following]):
+                    break
+                run.append(following)
+            if len(run) == len(search_words):
+                return run
+        return None
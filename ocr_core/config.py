@@ -0,0 +1,139 @@
+"""Shared configuration for the OCR extraction scripts (paths, environment variables)"""
+import os
+import json
+import shutil
+import platform
+
+# Project root (folder of app.py / Extract_Inv*.py) - data files are resolved relative to it
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VENDOR_MASTER_FILE = "Vendor_branch.xlsx"
+TEMPLATES_FILE = "document_templates.json"
+PATTERN_STATS_FILE = "pattern_stats.json"
+CONFIG_FILE = "config.json"
+
+
+def env_flag(name, default="false"):
+    """Read a boolean environment variable (1/true/yes)"""
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+# Adaptive mode: try the historically winning pattern of each field first
+ADAPTIVE_PATTERNS = env_flag("OCR_ADAPTIVE_PATTERNS")
+
+# Regex guard: per-pattern time budget, risky/slow patterns are skipped
+REGEX_GUARD = env_flag("OCR_REGEX_GUARD")
+REGEX_TIMEOUT = float(os.environ.get("OCR_REGEX_TIMEOUT", "0.5"))
+
+# Compiled vendor master cache (.Vendor_branch.xlsx.pkl), shared by the scripts and app.py
+VENDOR_CACHE = env_flag("OCR_VENDOR_CACHE", "true")
+
+# app.py: seconds between vendor master file checks of the shared store (0 = no watcher)
+VENDOR_WATCH_INTERVAL = float(os.environ.get("OCR_VENDOR_WATCH_INTERVAL", "5"))
+
+# SQLite vendor master (path to a .db file; empty = load the whole master into pandas)
+VENDOR_DB = os.environ.get("OCR_VENDOR_DB", "")
+
+# Re-OCR pages that fail validation with higher-fidelity settings (or OCR_RETRY_BACKEND)
+RETRY_FAILED = env_flag("OCR_RETRY_FAILED")
+RETRY_BACKEND = os.environ.get("OCR_RETRY_BACKEND", "").strip()
+
+# app.py: rendered PDF pages kept in memory (MB of decoded pixels) and optionally as PNGs on disk
+RASTER_CACHE_MB = float(os.environ.get("OCR_RASTER_CACHE_MB", "256"))
+RASTER_CACHE_DIR = os.environ.get("OCR_RASTER_CACHE_DIR", "")
+
+# app.py: rows before/after the current one whose pages are rendered in the background (0 = off)
+PREFETCH_ROWS = int(os.environ.get("OCR_PREFETCH_ROWS", "2"))
+
+# app.py: processes computing the highlight boxes of a loaded workbook in the background (0 = off)
+HIGHLIGHT_WORKERS = int(os.environ.get("OCR_HIGHLIGHT_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# app.py: show the page bitmap once (static URL) and draw highlights as an SVG overlay on top of it
+VIEWER_OVERLAY = env_flag("OCR_VIEWER_OVERLAY", "true")
+
+# app.py: pages are shown as tiles of this many pixels (rendered once per zoom level, 0 = one image per page)
+TILE_SIZE = int(os.environ.get("OCR_TILE_SIZE", "512"))
+
+# app.py: files served by Streamlit from static/ (rendered pages), oldest removed beyond this size (MB)
+STATIC_CACHE_MB = float(os.environ.get("OCR_STATIC_CACHE_MB", "512"))
+
+# Upsert into the existing summary workbook (keyed on file path, page, file hash) instead of overwriting it
+SUMMARY_MERGE = env_flag("OCR_SUMMARY_MERGE")
+
+
+# --- Cross-platform Configuration ---
+def get_default_source_dir():
+    """Get default source directory based on OS"""
+    if platform.system() == 'Windows':
+        return r"d:\Project\ocr\source"
+    else:
+        return os.path.expanduser("~/ocr/source")
+
+
+def get_default_output_dir():
+    """Get default output directory based on OS"""
+    if platform.system() == 'Windows':
+        return r"d:\Project\ocr\output"
+    else:
+        return os.path.expanduser("~/ocr/output")
+
+
+def get_default_poppler_path():
+    """Get Poppler path based on operating system (None = use system PATH)"""
+    if platform.system() == 'Windows':
+        # Common Windows install locations
+        possible_paths = [
+            r"C:\poppler\Library\bin",
+            r"C:\poppler\bin",
+            r"C:\Program Files\poppler\bin",
+            os.path.expanduser(r"~\poppler\bin"),
+        ]
+        for path in possible_paths:
+            if os.path.exists(path):
+                return path
+    # macOS (Homebrew) / Linux (poppler-utils): pdftoppm is expected on the system PATH
+    return None
+
+
+def get_poppler_path():
+    """POPPLER_PATH from environment / auto-detect, only if the folder exists"""
+    path = os.environ.get("POPPLER_PATH") or get_default_poppler_path()
+    return path if path and os.path.exists(path) else None
+
+
+def get_default_tesseract_path():
+    """Get Tesseract path based on operating system"""
+    if platform.system() == 'Windows':
+        possible_paths = [
+            r"C:\Program Files\Tesseract-OCR\tesseract.exe",
+            r"C:\Program Files (x86)\Tesseract-OCR\tesseract.exe",
+        ]
+        for path in possible_paths:
+            if os.path.exists(path):
+                return path
+        return None
+    # Linux/macOS: use system PATH (tesseract should be in PATH)
+    return shutil.which("tesseract")
+
+
+def get_tesseract_path():
+    """TESSERACT_PATH from environment or auto-detect"""
+    return os.environ.get("TESSERACT_PATH") or get_default_tesseract_path()
+
+
+def load_api_key():
+    """Typhoon API key from TYPHOON_API_KEY (recommended) or config.json"""
+    api_key = os.environ.get("TYPHOON_API_KEY", "")
+    if api_key:
+        return api_key
+    
+    config_path = os.path.join(SCRIPT_DIR, CONFIG_FILE)
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            if isinstance(config, str):  # old format: the key itself
+                return config
+            return config.get('API_KEY', '') or ''
+        except Exception:
+            pass
+    return ""
@@ -0,0 +1,118 @@
+"""Open PyMuPDF documents shared across calls: (path, mtime) -> fitz.Document (+ page sizes and text-layer words)"""
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    import fitz  # PyMuPDF
+    HAS_PYMUPDF = True
+except ImportError:
+    HAS_PYMUPDF = False
+
+# Documents kept open / pages whose size and words are kept
+OPEN_DOCUMENTS = 16
+PAGE_INFO_PAGES = 512
+
+
+class PDFDocumentCache:
+    """
+    Thread-safe LRU of open fitz.Document handles; the evicted one is closed. The key
+    includes the file mtime, so an edited PDF is opened again. MuPDF documents are not
+    safe to share between threads, so every page access runs under the cache lock.
+    """
+
+    def __init__(self, max_documents=OPEN_DOCUMENTS, max_pages=PAGE_INFO_PAGES):
+        self.max_documents = max_documents
+        self.max_pages = max_pages
+        self._lock = threading.RLock()
+        self._docs = OrderedDict()
+        self._pages = OrderedDict()  # (key, page) -> {'size': (w, h) | None, 'words': [...]}
+
+    @staticmethod
+    def key(pdf_path):
+        path = os.path.abspath(pdf_path)
+        return (path, os.path.getmtime(path))
+
+    def _document(self, key):
+        """Open handle for key (caller holds the lock)"""
+        doc = self._docs.get(key)
+        if doc is not None:
+            self._docs.move_to_end(key)
+            return doc
+        for old_key in [k for k in self._docs if k[0] == key[0]]:
+            self._docs.pop(old_key).close()  # older version of the same file
+        doc = fitz.open(key[0])
+        self._docs[key] = doc
+        while len(self._docs) > self.max_documents:
+            _, evicted = self._docs.popitem(last=False)
+            evicted.close()
+        return doc
+
+    def _page_info(self, pdf_path, page_num):
+        key = self.key(pdf_path)
+        page_key = (key, int(page_num))
+        with self._lock:
+            info = self._pages.get(page_key)
+            if info is not None:
+                self._pages.move_to_end(page_key)
+                return info
+            doc = self._document(key)
+            if 0 < page_num <= len(doc):
+                page = doc[page_num - 1]
+                info = {
+                    'size': (float(page.rect.width), float(page.rect.height)),
+                    'words': [tuple(w[:5]) for w in page.get_text("words")],
+                }
+            else:
+                info = {'size': None, 'words': []}
+            self._pages[page_key] = info
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+            return info
+
+    def page_size(self, pdf_path, page_num):
+        """(width, height) of a page in points, None if the page does not exist"""
+        return self._page_info(pdf_path, page_num)['size']
+
+    def words(self, pdf_path, page_num):
+        """Text-layer words of a page: [(x0, y0, x1, y1, text), ...] (empty for scans)"""
+        return self._page_info(pdf_path, page_num)['words']
+
+    def search(self, pdf_path, page_num, text):
+        """page.search_for(text); pages without a text layer are answered from the memo"""
+        if not self.words(pdf_path, page_num):
+            return []
+        with self._lock:
+            doc = self._document(self.key(pdf_path))
+            return doc[page_num - 1].search_for(text)
+
+    def close(self):
+        with self._lock:
+            for doc in self._docs.values():
+                doc.close()
+            self._docs.clear()
+            self._pages.clear()
+
+
+_documents = None
+_documents_lock = threading.Lock()
+
+
+def shared_documents():
+    """PDFDocumentCache of this process"""
+    global _documents
+    with _documents_lock:
+        if _documents is None:
+            _documents = PDFDocumentCache()
+        return _documents
+
+
+def _forget_documents():
+    # Forked worker: the parent's handles (and a lock possibly held at fork) are not ours
+    global _documents, _documents_lock
+    _documents = None
+    _documents_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_documents)
@@ -0,0 +1,58 @@
+"""Edit-distance-1 lookup of tax IDs (OCR misreads / drops / adds one digit)"""
+from .validation import tax_id_checksum_ok
+
+
+def deletions(value):
+    """value with each single character removed"""
+    return {value[:i] + value[i + 1:] for i in range(len(value))}
+
+
+def within_one_edit(a, b):
+    """Levenshtein distance <= 1 (one substitution, insertion or deletion)"""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) == len(b):
+        return sum(x != y for x, y in zip(a, b)) == 1
+    if len(a) > len(b):
+        a, b = b, a
+    # b is one longer: skip one char of b
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i:] == b[i + 1:]
+
+
+def rank_candidates(tax_id, found):
+    """IDs of found within one edit of tax_id (not tax_id itself), checksum-valid first, then in ID order"""
+    matches = [t for t in set(found) if t != tax_id and within_one_edit(tax_id, t)]
+    return sorted(matches, key=lambda t: (not tax_id_checksum_ok(t), t))
+
+
+class FuzzyTaxIndex:
+    """
+    Deletion-neighborhood index: every ID is stored under itself and its one-char
+    deletions. Two IDs within one edit share at least one key, so a query only
+    checks the few IDs under its own keys (no scan of the master).
+    """
+    
+    def __init__(self, tax_ids):
+        self.keys = {}
+        for tax_id in tax_ids:
+            if not tax_id:
+                continue
+            for key in deletions(tax_id) | {tax_id}:
+                self.keys.setdefault(key, set()).add(tax_id)
+    
+    def candidates(self, tax_id):
+        """
+        IDs within edit distance 1 of tax_id (excluding tax_id itself),
+        checksum-valid ones first, then in ID order
+        """
+        if not tax_id:
+            return []
+        found = set()
+        for key in deletions(tax_id) | {tax_id}:
+            found |= self.keys.get(key, set())
+        return rank_candidates(tax_id, found)
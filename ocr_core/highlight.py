@@ -0,0 +1,1035 @@
+"""
+Highlight search for the Document Editor: where a field value sits on a PDF page
+(Tesseract word boxes -> PDF text layer -> position estimated from the OCR .txt),
+plus a background precompute of every (row, field) of a workbook in a process pool
+"""
+import os
+import re
+import json
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .config import HIGHLIGHT_WORKERS
+from .raster import PageRasterCache
+from .documents import HAS_PYMUPDF, shared_documents
+
+# Summary columns that are not printed on the document (not precomputed)
+HIGHLIGHT_SKIP_COLUMNS = {"_chk", "Page", "Document Type", "OCR Tier", "Vendor code", "Vendor Suggestion"}
+
+_default_cache = None
+
+
+def default_raster_cache():
+    """PageRasterCache of this process (worker processes of the precompute have their own)"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = PageRasterCache()
+    return _default_cache
+
+
+def find_ocr_txt_path(pdf_path, page_num, output_dirs=()):
+    """<pdf name>_pageN.txt next to the PDF or in one of output_dirs (None if not found)"""
+    txt_filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_page{page_num}.txt"
+    for folder in [os.path.dirname(pdf_path)] + [d for d in output_dirs if d]:
+        path = os.path.join(folder, txt_filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def ocr_boxes_dir(pdf_path, page_num, output_dirs=()):
+    """Folder of the _pageN.boxes.json sidecar: next to the page text if any, else the first output dir"""
+    txt_path = find_ocr_txt_path(pdf_path, page_num, output_dirs)
+    if txt_path:
+        return os.path.dirname(txt_path)
+    return next((d for d in output_dirs if d), None)
+
+
+def load_field_span(txt_path, field_name, field_value):
+    """
+    Span of a field from the <pdf name>_pageN.fields.json sidecar written by the extraction:
+    by column name first, then by equal value (column renamed). None if there is no
+    sidecar or the value was edited since.
+    """
+    if not txt_path:
+        return None
+    sidecar_path = os.path.splitext(txt_path)[0] + ".fields.json"
+    if not os.path.exists(sidecar_path):
+        return None
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            fields = json.load(f).get('fields', {})
+    except Exception:
+        return None
+    
+    def normalize(v):
+        return re.sub(r'[\s,]', '', str(v)).lower()
+    
+    wanted = normalize(field_value)
+    if not wanted:
+        return None
+    candidates = [fields[field_name]] if field_name in fields else []
+    candidates += [span for name, span in fields.items() if name != field_name]
+    for span in candidates:
+        if normalize(span.get('value', '')) == wanted:
+            return span
+    return None
+
+
+def find_text_bbox(pdf_path, search_text, page_num, field_name=None, output_dirs=(), tesseract_path=None,
+                   poppler_path=None, raster_cache=None):
+    """
+    หา bounding box ของ text ใน PDF ด้วย Tesseract OCR
+    Args:
+        pdf_path: path to PDF file
+        search_text: text to search for
+        page_num: page number (1-indexed)
+        field_name: name of the field (e.g., "Description") - used to adjust bounding box size
+        output_dirs: โฟลเดอร์ที่อาจมี _pageN.txt / .fields.json / .boxes.json (นอกจากโฟลเดอร์ของ PDF)
+        raster_cache: PageRasterCache ที่ใช้ (None = cache ของ process นี้)
+    Returns: list of dicts with 'x0', 'y0', 'x1', 'y1', 'page', 'text', 'method', 'page_width', 'page_height'
+    
+    Pure function (ไม่ใช้ Streamlit) - เรียกได้จาก worker process ของ highlight precompute
+    """
+    positions = []
+    raster_cache = raster_cache or default_raster_cache()
+    
+    if not search_text or not str(search_text).strip():
+        return positions
+    
+    # Clean search text
+    search_str = str(search_text).strip()
+    if search_str.isdigit() or re.match(r'^[\d\-\s]+$', search_str):
+        clean_search = re.sub(r'\D', '', search_str)
+    else:
+        clean_search = search_str
+    
+    if not clean_search:
+        return positions
+    
+    # สำหรับ Description field: ใช้ bounding box ที่กำหนดไว้เลย (ไม่ต้องรัน OCR)
+    if field_name and 'description' in str(field_name).lower():
+        # หา page dimensions จาก PDF
+        if HAS_PYMUPDF:
+            try:
+                page_size = shared_documents().page_size(pdf_path, page_num)
+                if page_size:
+                    page_width, page_height = page_size
+                    
+                    # กำหนด bounding box สำหรับ Description
+                    new_x0 = 40.0
+                    original_width_ratio = 0.60  # 60% ของความกว้างหน้า
+                    new_x1 = new_x0 + (page_width * original_width_ratio)
+                    new_y0 = 290.0
+                    line_height = 20
+                    new_y1 = new_y0 + (line_height * 5.5)  # 110 points
+                    
+                    # จำกัดให้อยู่ในขอบเขตของหน้า
+                    new_x0 = max(0, min(new_x0, page_width - 100))
+                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+                    
+                    positions.append({
+                        'x0': float(new_x0),
+                        'y0': float(new_y0),
+                        'x1': float(new_x1),
+                        'y1': float(new_y1),
+                        'page': page_num,
+                        'text': search_str,
+                        'method': 'description_fixed',
+                        'page_width': float(page_width),
+                        'page_height': float(page_height)
+                    })
+                    return positions
+            except Exception as e:
+                print(f"[DEBUG] Error getting page dimensions for Description: {e}")
+                # Fall through to OCR methods if error
+    
+    # สำหรับ Sales Promotion field: ใช้ bounding box ที่กำหนดไว้เลย (ไม่ต้องรัน OCR)
+    if field_name and ('sales' in str(field_name).lower() and 'promotion' in str(field_name).lower()):
+        # หา page dimensions จาก PDF
+        if HAS_PYMUPDF:
+            try:
+                page_size = shared_documents().page_size(pdf_path, page_num)
+                if page_size:
+                    page_width, page_height = page_size
+                    
+                    # กำหนด bounding box สำหรับ Sales Promotion
+                    # คำนวณขนาดเดิม (หลังจากลด 50% แล้ว)
+                    base_width = 156.0  # width หลังจากลด 50%
+                    base_height = 50.0  # height หลังจากลด 50%
+                    
+                    # ขยายขนาดขึ้น 30%
+                    new_width = base_width * 1.3  # 156 * 1.3 = 202.8
+                    new_height = base_height * 1.3  # 50 * 1.3 = 65
+                    
+                    # x0 = 20 (เลื่อนมาทางซ้าย)
+                    new_x0 = 20.0
+                    new_x1 = new_x0 + new_width  # 20 + 202.8 = 222.8
+                    
+                    # y0 = 510 (คงเดิม)
+                    new_y0 = 510.0
+                    new_y1 = new_y0 + new_height  # 510 + 65 = 575
+                    
+                    # จำกัดให้อยู่ในขอบเขตของหน้า
+                    new_x0 = max(0, min(new_x0, page_width - 10))
+                    new_x1 = max(new_x0 + 10, min(new_x1, page_width))
+                    new_y0 = max(0, min(new_y0, page_height - 10))
+                    new_y1 = max(new_y0 + 10, min(new_y1, page_height))
+                    
+                    positions.append({
+                        'x0': float(new_x0),
+                        'y0': float(new_y0),
+                        'x1': float(new_x1),
+                        'y1': float(new_y1),
+                        'page': page_num,
+                        'text': search_str,
+                        'method': 'sales_promotion_fixed',
+                        'page_width': float(page_width),
+                        'page_height': float(page_height)
+                    })
+                    return positions
+            except Exception as e:
+                print(f"[DEBUG] Error getting page dimensions for Sales Promotion: {e}")
+                # Fall through to OCR methods if error
+    
+    # วิธีที่ 1: ใช้ Tesseract OCR เพื่อหา bounding box ที่แม่นยำ
+    try:
+        import pytesseract
+        
+        # Set Tesseract path
+        if tesseract_path and os.path.exists(tesseract_path):
+            pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        
+        # Word boxes ของ Tesseract (tha+eng, 150 DPI) - OCR ครั้งเดียวต่อหน้า แล้วเก็บใน memory
+        # และ sidecar <ชื่อ PDF>_pageN.boxes.json (ครั้งต่อไปไม่ต้อง render/OCR ใหม่ - prefetcher อาจเตรียมไว้ให้แล้ว)
+        # columns: text, left, top, width, height, conf, block_num, par_num, line_num (พิกัดเป็น pixel ของภาพ 150 DPI)
+        page_boxes = raster_cache.words(pdf_path, page_num, 150, 'tha+eng', poppler_path,
+                                              boxes_dir=ocr_boxes_dir(pdf_path, page_num, output_dirs))
+        img_width, img_height = page_boxes['width'], page_boxes['height']
+        ocr_data = page_boxes['words']
+        
+        # สำหรับข้อความยาวๆ (multi-word) ใช้วิธีค้นหาคำหลายคำและรวม bounding boxes
+        # แต่สำหรับคำเดียวหรือข้อความสั้นๆ ใช้วิธีเดิม
+        search_words = clean_search.split()
+        is_multi_word = len(search_words) > 1
+        
+        token_index = page_boxes['index']
+        
+        if is_multi_word and len(clean_search) > 10:
+            # Multi-word search: หาคำแรกจาก token index แล้วเดินต่อคำถัดไปที่ติดกัน (เฉพาะคำที่ conf >= 30)
+            # เงื่อนไขเทียบคำ: มีคำหนึ่งอยู่ในอีกคำ หรือ 3 ตัวอักษรแรกตรงกัน
+            run = token_index.phrase(search_words)
+            if run:
+                matched_words = [{
+                    'x': ocr_data['left'][i],
+                    'y': ocr_data['top'][i],
+                    'w': ocr_data['width'][i],
+                    'h': ocr_data['height'][i],
+                    'conf': ocr_data['conf'][i]
+                } for i in run]
+                
+                # คำนวณ bounding box รวม
+                min_x = min(w['x'] for w in matched_words)
+                min_y = min(w['y'] for w in matched_words)
+                max_x = max(w['x'] + w['w'] for w in matched_words)
+                max_y = max(w['y'] + w['h'] for w in matched_words)
+                avg_conf = sum(w['conf'] for w in matched_words) / len(matched_words)
+                
+                best_match = {
+                    'x0': float(min_x),
+                    'y0': float(min_y),
+                    'x1': float(max_x),
+                    'y1': float(max_y),
+                    'page': page_num,
+                    'text': clean_search,
+                    'method': 'tesseract_ocr_multiword',
+                    'confidence': float(avg_conf),
+                    'match_score': 100,
+                    'page_width': float(img_width),
+                    'page_height': float(img_height)
+                }
+                
+                # สำหรับ Description field: ขยาย bounding box
+                if field_name and 'description' in str(field_name).lower():
+                    new_x0 = 40.0  # x0 = 40 (คงที่)
+                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                    original_width_ratio = 0.60  # 70% - 10% = 60%
+                    new_x1 = new_x0 + (img_width * original_width_ratio)
+                    line_height = 20
+                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
+                    new_y0 = 290.0  # y0 = 290
+                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                    new_x0 = max(0, min(new_x0, img_width - 100))
+                    new_x1 = max(new_x0 + 100, min(new_x1, img_width))
+                    new_y1 = max(new_y0 + 20, min(new_y1, img_height))
+                    best_match['x0'] = float(new_x0)
+                    best_match['x1'] = float(new_x1)
+                    best_match['y0'] = float(new_y0)
+                    best_match['y1'] = float(new_y1)
+                
+                positions.append(best_match)
+        
+        else:
+            # Single word หรือ short text search: เฉพาะ token ที่ index บอกว่าเท่ากับ/มี/อยู่ใน search text
+            for i in token_index.token_candidates(clean_search):
+                text = ocr_data['text'][i]
+                
+                # Clean OCR text for comparison (normalize ไว้แล้วตอนสร้าง index)
+                ocr_text_clean = token_index.norms[i]
+                
+                # Skip if too short
+                if len(ocr_text_clean) < 3:
+                    continue
+                
+                # Check if match - ใช้ exact match หรือ high similarity
+                is_match = False
+                match_score = 0
+                
+                # Exact match (best)
+                if clean_search == ocr_text_clean:
+                    is_match = True
+                    match_score = 100
+                # Full search text found in OCR text (good for long strings)
+                elif len(clean_search) >= 8 and clean_search in ocr_text_clean:
+                    is_match = True
+                    match_score = 90
+                # OCR text is complete substring of search (good)
+                elif len(ocr_text_clean) >= 8 and ocr_text_clean in clean_search:
+                    is_match = True
+                    match_score = 85
+                # High overlap for shorter strings (>70% match)
+                elif len(clean_search) >= 5 and len(ocr_text_clean) >= 5:
+                    # Calculate overlap ratio
+                    if clean_search in ocr_text_clean or ocr_text_clean in clean_search:
+                        overlap = min(len(clean_search), len(ocr_text_clean))
+                        ratio = overlap / max(len(clean_search), len(ocr_text_clean))
+                        if ratio >= 0.7:
+                            is_match = True
+                            match_score = int(ratio * 80)
+                
+                if not is_match:
+                    continue
+                
+                # Get bounding box from Tesseract
+                x = ocr_data['left'][i]
+                y = ocr_data['top'][i]
+                w = ocr_data['width'][i]
+                h = ocr_data['height'][i]
+                conf = ocr_data['conf'][i]
+                
+                # Skip low confidence results
+                if conf < 30:
+                    continue
+                
+                # Convert image coordinates to PDF coordinates (same scale for pdf2image)
+                pos = {
+                    'x0': float(x),
+                    'y0': float(y),
+                    'x1': float(x + w),
+                    'y1': float(y + h),
+                    'page': page_num,
+                    'text': text.strip(),
+                    'method': 'tesseract_ocr',
+                    'confidence': float(conf),
+                    'match_score': match_score,
+                    'page_width': float(img_width),
+                    'page_height': float(img_height)
+                }
+                
+                # สำหรับ Description field: ขยาย bounding box
+                if field_name and 'description' in str(field_name).lower():
+                    new_x0 = 40.0  # x0 = 40 (คงที่)
+                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                    original_width_ratio = 0.60  # 70% - 10% = 60%
+                    new_x1 = new_x0 + (img_width * original_width_ratio)
+                    line_height = 20
+                    # y0 = 290 (เลื่อนลงมา)
+                    new_y0 = 290.0  # y0 = 290
+                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                    new_x0 = max(0, min(new_x0, img_width - 100))
+                    new_x1 = max(new_x0 + 100, min(new_x1, img_width))
+                    new_y1 = max(new_y0 + 20, min(new_y1, img_height))
+                    pos['x0'] = float(new_x0)
+                    pos['x1'] = float(new_x1)
+                    pos['y0'] = float(new_y0)
+                    pos['y1'] = float(new_y1)
+                
+                positions.append(pos)
+        
+        # ถ้าเจอแล้ว filter และเลือก best matches
+        if positions:
+            # Debug: แสดงข้อมูล matches ทั้งหมด
+            print(f"\n[DEBUG] Tesseract found {len(positions)} potential matches for '{clean_search}':")
+            for idx, p in enumerate(positions):
+                print(f"  {idx+1}. Text='{p.get('text')}' | Match={p.get('match_score')}% | Conf={p.get('confidence'):.0f}% | Pos=({p.get('x0'):.0f},{p.get('y0'):.0f})")
+            
+            # Sort by match_score (descending) then confidence (descending)
+            positions.sort(key=lambda p: (p.get('match_score', 0), p.get('confidence', 0)), reverse=True)
+            
+            # เอาแค่ top 3 matches หรือ matches ที่มี score เท่ากับ max score
+            if len(positions) > 0:
+                max_score = positions[0].get('match_score', 0)
+                # เอา matches ที่มี score ใกล้เคียง max (ต่างกันไม่เกิน 10)
+                filtered = [p for p in positions if p.get('match_score', 0) >= max_score - 10]
+                # จำกัดไม่เกิน 3 boxes
+                positions = filtered[:3]
+                print(f"[DEBUG] Selected top {len(positions)} match(es) with max_score={max_score}")
+                
+                # สำหรับ Description field: ขยาย bounding box ก่อน return
+                if field_name and 'description' in str(field_name).lower():
+                    for pos in positions:
+                        page_width = pos.get('page_width', 595)
+                        page_height = pos.get('page_height', 842)
+                        new_x0 = 40.0  # x0 = 40 (คงที่)
+                        # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                        original_width_ratio = 0.60  # 70% - 10% = 60%
+                        new_x1 = new_x0 + (page_width * original_width_ratio)
+                        line_height = 20
+                        # y0 = 290 (เลื่อนลงมา)
+                        new_y0 = 290.0  # y0 = 290
+                        new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                        new_x0 = max(0, min(new_x0, page_width - 100))
+                        new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+                        new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+                        pos['x0'] = float(new_x0)
+                        pos['x1'] = float(new_x1)
+                        pos['y0'] = float(new_y0)
+                        pos['y1'] = float(new_y1)
+            
+            return positions
+            
+    except ImportError:
+        print("[DEBUG] pytesseract not installed, skipping Tesseract positioning")
+    except Exception as e:
+        print(f"[DEBUG] Tesseract OCR failed: {e}")
+        # Fall through to other methods
+    
+    # วิธีที่ 1: ลองค้นหาใน PDF text layer ก่อน (สำหรับ PDF ที่มี text)
+    if HAS_PYMUPDF:
+        try:
+            documents = shared_documents()
+            page_size = documents.page_size(pdf_path, page_num)
+            if page_size:
+                # ค้นหา text instances ใน PDF
+                text_instances = documents.search(pdf_path, page_num, clean_search)
+                
+                # ถ้าไม่เจอ ลองค้นหาแบบ partial
+                if not text_instances and len(clean_search) > 3:
+                    parts = re.findall(r'\d+', clean_search)
+                    if parts:
+                        for part in parts:
+                            if len(part) >= 4:
+                                partial_instances = documents.search(pdf_path, page_num, part)
+                                text_instances.extend(partial_instances)
+                
+                if text_instances:
+                    # Get page dimensions
+                    page_width, page_height = page_size
+                    
+                    for inst in text_instances:
+                        pos = {
+                            'x0': float(inst.x0),
+                            'y0': float(inst.y0),
+                            'x1': float(inst.x1),
+                            'y1': float(inst.y1),
+                            'page': page_num,
+                            'text': clean_search,
+                            'method': 'pdf_text_layer',
+                            'page_width': float(page_width),
+                            'page_height': float(page_height)
+                        }
+                        
+                        # สำหรับ Description field: ขยาย bounding box ให้ครอบคลุมข้อความทั้งหมด
+                        if field_name and 'description' in str(field_name).lower():
+                            # x0 = 40 (คงที่)
+                            new_x0 = 40.0
+                            # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                            original_width_ratio = 0.60  # 70% - 10% = 60%
+                            new_x1 = new_x0 + (page_width * original_width_ratio)
+                            
+                            # ขยายความสูง: ครอบคลุม 5.5 บรรทัด (ประมาณ 110 points)
+                            # y0 = 290 (เลื่อนลงมา)
+                            line_height = 20
+                            new_y0 = 290.0  # y0 = 290
+                            new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                            
+                            # จำกัดให้อยู่ในขอบเขตของหน้า
+                            new_x0 = max(0, min(new_x0, page_width - 100))
+                            new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+                            new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+                            
+                            # อัพเดท bounding box
+                            pos['x0'] = float(new_x0)
+                            pos['x1'] = float(new_x1)
+                            pos['y0'] = float(new_y0)
+                            pos['y1'] = float(new_y1)
+                        
+                        positions.append(pos)
+            
+            # ถ้าเจอแล้ว return
+            if positions:
+                return positions
+        except Exception as e:
+            # ถ้า error ในการอ่าน PDF text layer ให้ลองวิธีอื่น
+            pass
+    
+    # วิธีที่ 2: สำหรับ PDF แบบ scan - อ่านจากไฟล์ .txt ที่ OCR สร้างไว้
+    try:
+        # หาไฟล์ .txt ที่เกี่ยวข้อง
+        txt_filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_page{page_num}.txt"
+        txt_path = find_ocr_txt_path(pdf_path, page_num, output_dirs)
+        
+        if txt_path and os.path.exists(txt_path):
+            # อ่านไฟล์ .txt
+            with open(txt_path, 'r', encoding='utf-8') as f:
+                ocr_text = f.read()
+            
+            # ทำความสะอาด search_text เพื่อเปรียบเทียบกับ OCR text (ลบ HTML tags)
+            # แต่เก็บ original search_text ไว้สำหรับ highlight
+            search_for_matching = clean_search
+            # ลบ HTML tags จาก search text (ถ้ามี) เพื่อให้ match ได้ดีขึ้น
+            search_clean_html = re.sub(r'<[^>]+>', ' ', search_for_matching)
+            search_clean_html = re.sub(r'\s+', ' ', search_clean_html).strip()
+            
+            # สร้าง clean version ของ OCR text เพื่อค้นหา
+            ocr_text_clean = re.sub(r'<br/?>', ' ', ocr_text)
+            ocr_text_clean = re.sub(r'<[^>]+>', '', ocr_text_clean)
+            ocr_text_clean = re.sub(r'\s+', ' ', ocr_text_clean)
+            
+            # ค้นหาโดยใช้ลำดับความสำคัญ:
+            # 1. Exact match ใน clean text (ดีที่สุด)
+            # 2. Exact match ใน original text
+            # 3. Partial match ที่ครอบคลุมมากที่สุด (สำหรับข้อความยาวๆ)
+            found_match = None
+            used_pattern = None
+            match_quality = 0  # 0=not found, 1=partial, 2=exact clean, 3=exact original
+            
+            # สำหรับ Sales Promotion - ตรวจสอบ keyword เพื่อหาเฉพาะบรรทัดที่ถูกต้อง
+            is_sales_promotion = 'ค่าส่งเสริมการขาย' in search_clean_html or 'Sales Promotion' in search_for_matching
+            
+            # วิธีที่ 0: ใช้ span ที่บันทึกไว้ตอน OCR (.fields.json) - ไม่ต้องค้นหาใหม่
+            known_span = load_field_span(txt_path, field_name, search_str)
+            if known_span and known_span['end'] <= len(ocr_text):
+                span_start, span_end = known_span['start'], known_span['end']
+                from collections import namedtuple
+                MatchObj = namedtuple('MatchObj', ['start', 'end', 'group'])
+                found_match = MatchObj(
+                    start=lambda: span_start,
+                    end=lambda: span_end,
+                    group=lambda *args: ocr_text[span_start:span_end]
+                )
+                match_quality = 3
+            
+            # วิธีที่ 1: Exact match ใน clean text (ดีที่สุด - ไม่มี HTML tags)
+            if not found_match and search_clean_html:
+                # สำหรับ Sales Promotion ให้หาเฉพาะบรรทัดที่มี "ค่าส่งเสริมการขาย" โดยไม่รวม "หมายเหตุ"
+                if is_sales_promotion:
+                    # แบ่งเป็นบรรทัดทั้ง clean และ original
+                    ocr_lines_clean = ocr_text_clean.split('\n')
+                    ocr_lines_orig = ocr_text.split('\n')
+                    
+                    for line_idx, line_clean in enumerate(ocr_lines_clean):
+                        # ตรวจสอบว่าเป็นบรรทัดที่มี "ค่าส่งเสริมการขาย" และไม่มี "หมายเหตุ"
+                        if 'ค่าส่งเสริมการขาย' in line_clean and 'หมายเหตุ' not in line_clean:
+                            # ตรวจสอบว่า search text อยู่ในบรรทัดนี้
+                            if search_clean_html in line_clean:
+                                # หาในบรรทัดนี้
+                                line_match = re.search(re.escape(search_clean_html), line_clean, re.IGNORECASE)
+                                if line_match:
+                                    # หาบรรทัดที่ตรงกันใน original text
+                                    if line_idx < len(ocr_lines_orig):
+                                        line_orig = ocr_lines_orig[line_idx]
+                                        # ลบ HTML tags จาก original line เพื่อหา position
+                                        line_orig_clean = re.sub(r'<[^>]+>', '', line_orig)
+                                        line_orig_clean = re.sub(r'\s+', ' ', line_orig_clean)
+                                        
+                                        # หา position ใน original line
+                                        orig_line_match = re.search(re.escape(search_clean_html), line_orig_clean, re.IGNORECASE)
+                                        if orig_line_match:
+                                            # คำนวณตำแหน่งใน original full text
+                                            chars_before_line = sum(len(l) + 1 for l in ocr_lines_orig[:line_idx])
+                                            match_start = chars_before_line + orig_line_match.start()
+                                            match_end = chars_before_line + orig_line_match.end()
+                                            
+                                            from collections import namedtuple
+                                            MatchObj = namedtuple('MatchObj', ['start', 'end', 'group'])
+                                            found_match = MatchObj(
+                                                start=match_start, 
+                                                end=match_end, 
+                                                group=lambda: search_clean_html
+                                            )
+                                            match_quality = 3
+                                            break
+                else:
+                    # สำหรับ fields อื่นๆ ใช้วิธีเดิม
+                    exact_match_clean = re.search(re.escape(search_clean_html), ocr_text_clean, re.IGNORECASE)
+                    if exact_match_clean:
+                        found_match = exact_match_clean
+                        match_quality = 3
+                        # แปลงตำแหน่งกลับไปหาใน original text
+                        # หาโดยนับจำนวนตัวอักษรที่ผ่านมา
+                        char_count_before_match = len(ocr_text_clean[:exact_match_clean.start()])
+                        # ค้นหาใน original text โดยใช้ char count ที่ประมาณ
+                        approx_start = 0
+                        clean_idx = 0
+                        for orig_idx, char in enumerate(ocr_text):
+                            if clean_idx >= char_count_before_match:
+                                approx_start = orig_idx
+                                break
+                            if char not in ['<', '>'] and not (orig_idx > 0 and ocr_text[orig_idx-1:orig_idx+1] == '</'):
+                                clean_idx += 1
+                        # สร้าง match object ใหม่ที่มีตำแหน่งใน original text
+                        match_end = approx_start + len(search_clean_html)
+                        # ใช้ original text สำหรับการคำนวณตำแหน่ง
+                        from collections import namedtuple
+                        MatchObj = namedtuple('MatchObj', ['start', 'end', 'group'])
+                        found_match = MatchObj(start=approx_start, end=match_end, group=lambda: search_clean_html)
+            
+            # วิธีที่ 2: Exact match ใน original text (ถ้ายังไม่เจอ)
+            if not found_match or match_quality < 2:
+                exact_match_orig = re.search(re.escape(search_for_matching), ocr_text, re.IGNORECASE)
+                if exact_match_orig:
+                    found_match = exact_match_orig
+                    match_quality = 2
+            
+            # วิธีที่ 3: Partial match ที่ครอบคลุมมากที่สุด (สำหรับข้อความยาวๆ หรือเมื่อ exact ไม่เจอ)
+            if not found_match or (match_quality == 0 and len(search_clean_html) > 30):
+                # สำหรับข้อความยาวๆ ให้หา pattern ที่ครอบคลุมมากที่สุด
+                # ใช้คำสำคัญหลายคำเพื่อหา pattern ที่ถูกต้อง
+                words = search_clean_html.split()
+                if len(words) >= 3:
+                    # ลองหลายแบบ: 3 คำแรก, 5 คำแรก, หรือคำสำคัญ
+                    for num_words in [min(10, len(words)), min(7, len(words)), min(5, len(words)), min(3, len(words))]:
+                        key_phrase = ' '.join(words[:num_words])
+                        pattern = re.escape(key_phrase)
+                        partial_match = re.search(pattern, ocr_text_clean, re.IGNORECASE)
+                        if partial_match:
+                            found_match = partial_match
+                            match_quality = 1
+                            break
+            
+            # ถ้ายังไม่เจอ ให้ลองหาใน original text (ไม่ clean)
+            if not found_match:
+                if search_clean_html:
+                    final_match = re.search(re.escape(search_clean_html[:min(50, len(search_clean_html))]), ocr_text, re.IGNORECASE)
+                    if final_match:
+                        found_match = final_match
+                        match_quality = 1
+            
+            if found_match:
+                # สำหรับ scan PDF เราไม่สามารถหา exact position ได้
+                # แต่เราสามารถสร้าง approximate positions โดยแบ่ง PDF เป็น grid
+                # หรือแสดง highlight แบบ overlay ที่ประมาณตำแหน่ง
+                
+                # ใช้ PyMuPDF เพื่อหา page dimensions
+                if HAS_PYMUPDF:
+                    try:
+                        page_size = shared_documents().page_size(pdf_path, page_num)
+                        if page_size:
+                            page_width, page_height = page_size
+                            
+                            # ใช้ text position ใน OCR text เพื่อประมาณตำแหน่งใน PDF
+                            # แบ่ง OCR text เป็น lines และหา line ที่มี text
+                            ocr_lines = ocr_text.split('\n')
+                            
+                            # หา line number ของ match ใน original text
+                            match_start = found_match.start()
+                            line_start = ocr_text[:match_start].count('\n')
+                            match_end = found_match.end()
+                            
+                            # หา line ที่ครอบคลุม match (อาจมีหลายบรรทัด)
+                            end_line = ocr_text[:match_end].count('\n')
+                            num_lines = max(1, end_line - line_start + 1)
+                            
+                            # สำหรับ Sales Promotion - ตรวจสอบว่าต้องไม่ match กับ "หมายเหตุ..."
+                            # ถ้า match กับ line ที่มี "หมายเหตุ" ให้ข้ามไปหา line ถัดไป
+                            if line_start < len(ocr_lines):
+                                current_line = ocr_lines[line_start]
+                                if 'หมายเหตุ' in current_line and 'ค่าส่งเสริมการขาย' in search_clean_html:
+                                    # ถ้า match กับ line ที่มี "หมายเหตุ" ให้หา line ถัดไปที่มี "ค่าส่งเสริมการขาย"
+                                    for next_line_idx in range(line_start + 1, min(line_start + 3, len(ocr_lines))):
+                                        if 'ค่าส่งเสริมการขาย' in ocr_lines[next_line_idx]:
+                                            line_start = next_line_idx
+                                            # ปรับ match_end ให้ครอบคลุมทั้งบรรทัด
+                                            match_text = found_match.group(0) if hasattr(found_match, 'group') else search_clean_html
+                                            num_lines = 1
+                                            break
+                            
+                            # นับจำนวนบรรทัดที่มีข้อความจริงๆ (non-empty lines)
+                            total_lines = len([l for l in ocr_lines if l.strip()])
+                            if total_lines > 0:
+                                # คำนวณ Y position (จากบนลงล่าง)
+                                top_margin = 50
+                                bottom_margin = 50
+                                content_height = page_height - top_margin - bottom_margin
+                                
+                                # คำนวณ Y position จากบรรทัดแรกของ match
+                                line_ratio_start = line_start / max(total_lines, 1)
+                                y0 = top_margin + (line_ratio_start * content_height)
+                                
+                                # คำนวณความสูงของ box ตามจำนวนบรรทัด (ประมาณ 18 points ต่อบรรทัด)
+                                box_height = max(18, num_lines * 18)
+                                
+                                # ตรวจสอบว่ามีหลายบรรทัดหรือไม่
+                                if num_lines > 1:
+                                    line_ratio_end = min(line_start + num_lines, total_lines) / max(total_lines, 1)
+                                    y1 = top_margin + (line_ratio_end * content_height)
+                                    box_height = y1 - y0
+                                else:
+                                    y1 = y0 + box_height
+                                
+                                # คำนวณ X position จากตำแหน่งในบรรทัดแรก
+                                if line_start < len(ocr_lines):
+                                    line_text = ocr_lines[line_start]
+                                    # ลบ HTML tags จาก line_text เพื่อหา position ที่ถูกต้อง
+                                    line_text_clean = re.sub(r'<[^>]+>', '', line_text)
+                                    
+                                    # หาตำแหน่งของ match ในบรรทัด
+                                    match_in_line = found_match.group(0)
+                                    # ลองหาใน line_text (อาจมี HTML tags)
+                                    line_pos = line_text.find(match_in_line[:min(20, len(match_in_line))])
+                                    if line_pos == -1:
+                                        # ถ้าไม่เจอ ลองหาใน clean version
+                                        match_in_line_clean = re.sub(r'<[^>]+>', '', match_in_line)
+                                        line_pos = line_text_clean.find(match_in_line_clean[:min(20, len(match_in_line_clean))])
+                                    
+                                    if line_pos >= 0:
+                                        char_ratio = line_pos / max(len(line_text_clean), 1) if line_text_clean else 0.3
+                                    else:
+                                        char_ratio = 0.3
+                                else:
+                                    char_ratio = 0.3
+                                
+                                left_margin = 50
+                                right_margin = 50
+                                content_width = page_width - left_margin - right_margin
+                                
+                                x0 = left_margin + (char_ratio * content_width)
+                                
+                                # คำนวณความกว้างตามจำนวนตัวอักษร (ประมาณ 6-7 points ต่อตัวอักษรสำหรับ font ขนาดปกติ)
+                                # สำหรับข้อความยาวๆ ให้ใช้สัดส่วนของ content_width
+                                actual_search_text = search_clean_html if search_clean_html else search_for_matching
+                                text_length = len(actual_search_text)
+                                
+                                # ตรวจสอบว่าเป็น Description หรือไม่ (อยู่ใน table)
+                                is_description = 'รายการ' in actual_search_text or 'Promotion' in actual_search_text or line_start < len(ocr_lines) and '<table>' in '\n'.join(ocr_lines[max(0, line_start-5):line_start+1])
+                                
+                                # สำหรับ Description หรือข้อความยาวๆ (>30 ตัวอักษร)
+                                if is_description or text_length > 30:
+                                    # ใช้สัดส่วนที่ใหญ่ขึ้นเพื่อครอบคลุมข้อความทั้งหมด
+                                    # สำหรับ Description ใน table ให้ใช้ 65-75% ของ content width
+                                    if is_description:
+                                        # คำนวณความกว้างตามจำนวนตัวอักษร แต่ไม่เกิน 75% ของ content width
+                                        estimated_width = text_length * 6.5  # 6.5 points ต่อตัวอักษร
+                                        text_width = min(estimated_width, content_width * 0.75)
+                                        # จำกัดให้ไม่เกิน 75% และไม่น้อยกว่า 60%
+                                        text_width = max(content_width * 0.6, min(text_width, content_width * 0.75))
+                                    else:
+                                        # สำหรับข้อความยาวๆ ทั่วไป
+                                        text_width = min(content_width * 0.7, content_width - (char_ratio * content_width))
+                                else:
+                                    # สำหรับข้อความสั้นๆ ใช้การคำนวณตามจำนวนตัวอักษร
+                                    text_width = min(text_length * 7, content_width * 0.6)
+                                
+                                x1 = x0 + text_width
+                                
+                                # จำกัดให้อยู่ในขอบเขต
+                                x0 = max(left_margin, min(x0, page_width - right_margin - 50))
+                                x1 = max(x0 + 50, min(x1, page_width - right_margin))
+                                y0 = max(top_margin, min(y0, page_height - bottom_margin - box_height))
+                                y1 = max(y0 + 18, min(y1, page_height - bottom_margin))
+                                box_height = y1 - y0
+                                
+                                pos = {
+                                    'x0': float(x0),
+                                    'y0': float(y0),
+                                    'x1': float(x1),
+                                    'y1': float(y1),
+                                    'page': page_num,
+                                    'text': search_for_matching,
+                                    'method': 'ocr_txt_approximate',
+                                    'page_width': float(page_width),
+                                    'page_height': float(page_height)
+                                }
+                                
+                                # สำหรับ Description field: ขยาย bounding box
+                                if field_name and 'description' in str(field_name).lower():
+                                    new_x0 = 40.0  # x0 = 40 (คงที่)
+                                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                                    original_width_ratio = 0.60  # 70% - 10% = 60%
+                                    new_x1 = new_x0 + (page_width * original_width_ratio)
+                                    line_height = 20
+                                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
+                                    new_y0 = 290.0  # y0 = 290
+                                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                                    new_x0 = max(0, min(new_x0, page_width - 100))
+                                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+                                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+                                    pos['x0'] = float(new_x0)
+                                    pos['x1'] = float(new_x1)
+                                    pos['y0'] = float(new_y0)
+                                    pos['y1'] = float(new_y1)
+                                
+                                positions.append(pos)
+                            else:
+                                # Fallback: ใช้ตำแหน่งกลาง
+                                center_x = page_width / 2
+                                center_y = page_height / 2
+                                # สำหรับข้อความยาวๆ ให้ใช้ความกว้างที่เหมาะสม
+                                actual_search_text = search_clean_html if search_clean_html else search_for_matching
+                                highlight_width = min(page_width * 0.6, len(actual_search_text) * 7)
+                                highlight_height = max(30, min(100, (actual_search_text.count(' ') + 1) * 18))
+                                
+                                pos = {
+                                    'x0': float(center_x - highlight_width / 2),
+                                    'y0': float(center_y - highlight_height / 2),
+                                    'x1': float(center_x + highlight_width / 2),
+                                    'y1': float(center_y + highlight_height / 2),
+                                    'page': page_num,
+                                    'text': search_for_matching,
+                                    'method': 'ocr_txt_center',
+                                    'page_width': float(page_width),
+                                    'page_height': float(page_height)
+                                }
+                                
+                                # สำหรับ Description field: ขยาย bounding box
+                                if field_name and 'description' in str(field_name).lower():
+                                    page_width = pos['page_width']
+                                    page_height = pos['page_height']
+                                    new_x0 = 40.0  # x0 = 40 (คงที่)
+                                    # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+                                    original_width_ratio = 0.60  # 70% - 10% = 60%
+                                    new_x1 = new_x0 + (page_width * original_width_ratio)
+                                    line_height = 20
+                                    # เลื่อนขึ้นไปขอบกระดาษบน (y0 = 0 หรือใกล้ 0)
+                                    new_y0 = 290.0  # y0 = 290
+                                    new_y1 = new_y0 + (line_height * 5.5)  # สูงขึ้นเล็กน้อย
+                                    new_x0 = max(0, min(new_x0, page_width - 100))
+                                    new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+                                    new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+                                    pos['x0'] = float(new_x0)
+                                    pos['x1'] = float(new_x1)
+                                    pos['y0'] = float(new_y0)
+                                    pos['y1'] = float(new_y1)
+                                
+                                positions.append(pos)
+                    except Exception as e:
+                        print(f"[DEBUG] Could not get PDF dimensions: {e}")
+                else:
+                    # ถ้าไม่มี PyMuPDF ให้ใช้ default approximate position
+                    positions.append({
+                        'x0': 100.0,
+                        'y0': 100.0,
+                        'x1': 400.0,
+                        'y1': 150.0,
+                        'page': page_num,
+                        'text': clean_search,
+                        'method': 'ocr_txt_default'
+                    })
+        else:
+            # ไม่พบไฟล์ .txt
+            print(f"[DEBUG] OCR text file not found: {txt_filename}")
+    
+    except Exception as e:
+        print(f"[DEBUG] Error reading OCR text file: {e}")
+    
+    # Validate และ filter bounding boxes ที่ผิดปกติ
+    validated_positions = []
+    for pos in positions:
+        width = pos['x1'] - pos['x0']
+        height = pos['y1'] - pos['y0']
+        
+        # Get page dimensions for validation
+        page_width = pos.get('page_width', 595)  # A4 default width in points
+        page_height = pos.get('page_height', 842)  # A4 default height in points
+        
+        # สำหรับ Description field: ขยาย bounding box ให้ครอบคลุมข้อความทั้งหมด
+        # - ความกว้าง: x0 = 40 (คงที่), x1 ปรับตามสัดส่วน
+        # - ความสูง: เลื่อนขึ้นไปขอบกระดาษบน
+        if field_name and 'description' in str(field_name).lower():
+            # x0 = 40 (คงที่)
+            new_x0 = 40.0
+            # คำนวณ x1 ตามสัดส่วนเดิม (จาก 0.10 ถึง 0.70 = 60% ของความกว้าง)
+            original_width_ratio = 0.60  # 70% - 10% = 60%
+            new_x1 = new_x0 + (page_width * original_width_ratio)
+            
+            # ขยายความสูง: ครอบคลุม 5.5 บรรทัด (ประมาณ 110 points)
+            # y0 = 290 (เลื่อนลงมา)
+            line_height = 20  # ความสูงต่อบรรทัด (ประมาณ)
+            new_y0 = 290.0  # y0 = 290
+            new_y1 = new_y0 + (line_height * 5.5)  # 5.5 บรรทัด
+            
+            # จำกัดให้อยู่ในขอบเขตของหน้า
+            new_x0 = max(0, min(new_x0, page_width - 100))
+            new_x1 = max(new_x0 + 100, min(new_x1, page_width))
+            new_y1 = max(new_y0 + 20, min(new_y1, page_height))
+            
+            # อัพเดท bounding box
+            pos['x0'] = float(new_x0)
+            pos['x1'] = float(new_x1)
+            pos['y0'] = float(new_y0)
+            pos['y1'] = float(new_y1)
+            
+            # Recalculate width and height
+            width = pos['x1'] - pos['x0']
+            height = pos['y1'] - pos['y0']
+        
+        # Filter out boxes ที่ผิดปกติ:
+        # - ต้องมี width และ height เป็นบวก
+        # - width ต้องไม่เกิน 90% ของหน้า (รองรับข้อความยาวๆ)
+        # - height ต้องไม่เกิน 50% ของหน้า (รองรับข้อความหลายบรรทัด)
+        # - ต้องอยู่ในขอบเขตของหน้า
+        max_width = page_width * 0.9
+        max_height = page_height * 0.5
+        
+        if (width > 0 and height > 0 and 
+            width <= max_width and height <= max_height and
+            pos['x0'] >= 0 and pos['y0'] >= 0 and
+            pos['x1'] <= page_width and pos['y1'] <= page_height):
+            validated_positions.append(pos)
+        else:
+            # Debug: แสดงเฉพาะใน console ไม่แสดงใน UI
+            print(f"[DEBUG] Filtered invalid bbox: width={width:.1f}, height={height:.1f}, "
+                  f"page_size=({page_width:.0f}x{page_height:.0f}), method={pos.get('method', 'unknown')}")
+    
+    return validated_positions
+
+
+# --- Background precompute ---
+def highlight_key(pdf_path, page_num, field_name, value):
+    return (os.path.normcase(os.path.abspath(pdf_path)), int(page_num), str(field_name), str(value).strip())
+
+
+def page_highlights(pdf_path, page_num, fields, output_dirs=(), tesseract_path=None, poppler_path=None):
+    """Worker task: [(field_name, value, positions), ...] for the fields of one page"""
+    if tesseract_path:
+        try:
+            import pytesseract
+            pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        except ImportError:
+            pass
+    results = []
+    for field_name, value in fields:
+        try:
+            positions = find_text_bbox(pdf_path, value, page_num, field_name, output_dirs, tesseract_path, poppler_path)
+        except Exception as e:
+            print(f"[DEBUG] Highlight precompute failed for {field_name}: {e}")
+            positions = []
+        results.append((field_name, value, positions))
+    return results
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def shared_pool(max_workers=HIGHLIGHT_WORKERS):
+    """
+    One process pool for all precompute jobs of this process, started with "spawn":
+    forking the multi-threaded Streamlit server could copy locks held by other threads
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or getattr(_pool, "_broken", False):
+            _pool = ProcessPoolExecutor(max_workers=max(1, max_workers),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+class HighlightPrecompute:
+    """
+    Highlight positions of every (row, field) of one workbook, computed page by page in a
+    process pool (one task per PDF page, so a page is rendered / OCRed once) from a
+    background thread. get() is a dictionary lookup; None = not computed (yet). All jobs
+    share shared_pool(), so running several never takes more than OCR_HIGHLIGHT_WORKERS processes.
+    """
+    
+    def __init__(self, tasks, output_dirs=(), tesseract_path=None, poppler_path=None, pool=None):
+        # tasks: {(pdf_path, page_num): [(field_name, value), ...]}
+        self.tasks = tasks
+        self.output_dirs = tuple(output_dirs)
+        self.tesseract_path = tesseract_path
+        self.poppler_path = poppler_path
+        self.pool = pool
+        self.total = sum(len(fields) for fields in tasks.values())
+        self.done = 0
+        self.results = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self.finished = threading.Event()
+        if self.total:
+            threading.Thread(target=self._run, name="highlight-precompute", daemon=True).start()
+        else:
+            self.finished.set()
+    
+    @property
+    def running(self):
+        return not self.finished.is_set()
+    
+    def get(self, pdf_path, page_num, field_name, value):
+        with self._lock:
+            return self.results.get(highlight_key(pdf_path, page_num, field_name, value))
+    
+    def put(self, pdf_path, page_num, field_name, value, positions):
+        with self._lock:
+            self.results[highlight_key(pdf_path, page_num, field_name, value)] = positions
+    
+    def cancel(self):
+        self._cancelled.set()
+    
+    def _run(self):
+        executor = self.pool or shared_pool()
+        futures = {}
+        try:
+            futures = {
+                executor.submit(page_highlights, pdf_path, page_num, fields, self.output_dirs,
+                                self.tesseract_path, self.poppler_path): (pdf_path, page_num, len(fields))
+                for (pdf_path, page_num), fields in self.tasks.items()
+            }
+            for future in as_completed(futures):
+                pdf_path, page_num, count = futures[future]
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    print(f"[DEBUG] Highlight precompute failed for {os.path.basename(pdf_path)} page {page_num}: {e}")
+                    rows = []
+                with self._lock:
+                    for field_name, value, positions in rows:
+                        self.results.setdefault(highlight_key(pdf_path, page_num, field_name, value), positions)
+                    self.done += count
+                if self._cancelled.is_set():
+                    break
+        finally:
+            # the pool is shared: drop only this job's pages that have not started
+            for future in futures:
+                future.cancel()
+            self.finished.set()
+
+
+class HighlightJobs:
+    """Precompute jobs by workbook key, the oldest cancelled beyond max_jobs"""
+    
+    def __init__(self, max_jobs=4):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+    
+    def start(self, key, build):
+        """Job of key, created with build() (-> HighlightPrecompute) if there is none"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+                return job
+            job = self._jobs[key] = build()
+            while len(self._jobs) > self.max_jobs:
+                _, old = self._jobs.popitem(last=False)
+                old.cancel()
+            return job
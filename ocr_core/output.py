@@ -0,0 +1,234 @@
+"""Per-page outputs (_pageN.txt, _pageN.fields.json) and the summary workbook"""
+import os
+import re
+import json
+
+import openpyxl
+import pandas as pd
+
+# Summary column names of the fixed (non-extra) parsed fields
+SUMMARY_FIELD_COLUMNS = {
+    "document_no": "Document No",
+    "date": "Date",
+    "amount": "Amount",
+    "tax_id": "VendorID_OCR",
+    "branch": "Branch_OCR",
+}
+
+# Columns that always come first in the summary workbook
+PRIORITY_COLUMNS = [
+    "Link PDF", "Page", "Document Type", "OCR Tier",
+    "VendorID_OCR", "Branch_OCR", "Vendor code", "ชื่อบริษัท", "Vendor Suggestion",
+    "Document No", "Date", "Amount"
+]
+
+
+def page_text_path(output_dir, filename, page_num):
+    """<output_dir>/<pdf name>_pageN.txt"""
+    return os.path.join(output_dir, f"{os.path.splitext(filename)[0]}_page{page_num}.txt")
+
+
+def save_page_text(txt_path, text):
+    """Save raw OCR text of one page"""
+    with open(txt_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def field_column_label(field_name):
+    """Summary column name for a parsed field (extra fields: "withholding_tax" -> "Withholding Tax")"""
+    return SUMMARY_FIELD_COLUMNS.get(field_name, field_name.replace("_", " ").title())
+
+
+def save_field_spans(txt_path, page_num, parsed):
+    """
+    Save <name>_pageN.fields.json next to the page text: for each summary column,
+    the extracted value, its character offsets in the .txt and the pattern id.
+    The Document Editor uses it to highlight a field without searching again.
+    """
+    fields = {}
+    for field_name, span in parsed.get("spans", {}).items():
+        value = parsed.get(field_name, parsed.get("extra_fields", {}).get(field_name, ""))
+        fields[field_column_label(field_name)] = dict(span, field=field_name, value=value)
+    
+    sidecar_path = os.path.splitext(txt_path)[0] + ".fields.json"
+    try:
+        with open(sidecar_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "page": page_num,
+                "document_type": parsed.get("document_type", ""),
+                "fields": fields
+            }, f, ensure_ascii=False, indent=1)
+    except Exception as e:
+        print(f"      Warning: Could not save field spans: {e}")
+
+
+def page_key(file_path, page_num):
+    """Key of a summary row across runs: <normalized absolute path>|<page>"""
+    return f"{os.path.normcase(os.path.abspath(file_path))}|{int(page_num)}"
+
+
+def build_summary_row(file_path, page_num, parsed):
+    """One summary row (before vendor mapping) for a parsed page"""
+    filename = os.path.basename(file_path)
+    row_data = {
+        "Link PDF": f'=HYPERLINK("{file_path}", "{filename} (Page {page_num})")',
+        "Page": page_num,
+        "Document Type": parsed["document_type_name"],
+        "VendorID_OCR": parsed["tax_id"],
+        "Branch_OCR": parsed["branch"],
+        "Document No": parsed["document_no"],
+        "Date": parsed["date"],
+        "Amount": parsed["amount"],
+    }
+    
+    # Add extra fields from template
+    for field_name, value in parsed.get("extra_fields", {}).items():
+        row_data[field_column_label(field_name)] = value
+    
+    return row_data
+
+
+def order_summary_columns(df):
+    """Put the important columns first, keep the rest in their current order"""
+    all_cols = df.columns.tolist()
+    final_cols = [col for col in PRIORITY_COLUMNS if col in all_cols]
+    final_cols += [col for col in all_cols if col not in final_cols]
+    return df[final_cols]
+
+
+def write_summary_excel(df, output_excel_path):
+    """Write the summary workbook; returns True on success"""
+    try:
+        with pd.ExcelWriter(output_excel_path, engine='openpyxl') as writer:
+            df.to_excel(writer, index=False, sheet_name='Sheet1')
+        return True
+    except Exception as e:
+        print(f"Error saving Excel: {e}")
+        return False
+
+
+# --- Incremental summary (OCR_SUMMARY_MERGE) ---
+def summary_manifest_path(output_excel_path):
+    """summary_ocr.xlsx -> .summary_ocr.xlsx.manifest.json (next to the workbook)"""
+    folder, name = os.path.split(output_excel_path)
+    return os.path.join(folder, f".{name}.manifest.json")
+
+
+def load_summary_manifest(output_excel_path):
+    """{page_key: sha256 of the PDF when the row was extracted} ({} if missing/unreadable)"""
+    try:
+        with open(summary_manifest_path(output_excel_path), 'r', encoding='utf-8') as f:
+            return json.load(f).get("pages", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_summary_manifest(output_excel_path, pages):
+    """Write the manifest atomically (tmp file + rename)"""
+    path = summary_manifest_path(output_excel_path)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"pages": pages}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not save summary manifest: {e}")
+
+
+def link_target(value):
+    """PDF path of a Link PDF value (=HYPERLINK("path", "text") formula), None otherwise"""
+    if isinstance(value, str) and value.strip().upper().startswith("=HYPERLINK"):
+        match = re.search(r'["\']([^"\']+)["\']', value)
+        if match:
+            return match.group(1)
+    return None
+
+
+def read_summary_rows(output_excel_path):
+    """
+    Rows of an existing summary workbook as a DataFrame, formulas kept as written
+    (Link PDF cells saved as hyperlink objects by the Document Editor become
+    HYPERLINK formulas again). None if there is no readable workbook.
+    """
+    if not os.path.exists(output_excel_path):
+        return None
+    try:
+        wb = openpyxl.load_workbook(output_excel_path, data_only=False)
+    except Exception as e:
+        print(f"Warning: Could not read previous summary ({e}), it will be replaced")
+        return None
+    try:
+        rows = wb.worksheets[0].iter_rows()
+        header = [cell.value for cell in next(rows, [])]
+        data = []
+        for row in rows:
+            values = {}
+            for name, cell in zip(header, row):
+                if name is None:
+                    continue
+                value = cell.value
+                if cell.hyperlink is not None and cell.hyperlink.target and not link_target(value):
+                    value = f'=HYPERLINK("{cell.hyperlink.target}", "{value or cell.hyperlink.target}")'
+                values[str(name)] = value
+            if any(v not in (None, "") for v in values.values()):
+                data.append(values)
+        return pd.DataFrame(data, columns=[str(h) for h in header if h is not None])
+    finally:
+        wb.close()
+
+
+def summary_row_keys(df):
+    """page_key of every summary row (None when Link PDF / Page cannot be read)"""
+    keys = []
+    for link, page in zip(df.get("Link PDF", pd.Series(index=df.index, dtype=object)),
+                          df.get("Page", pd.Series(index=df.index, dtype=object))):
+        target = link_target(link)
+        try:
+            keys.append(page_key(target, int(float(page))) if target else None)
+        except (TypeError, ValueError):
+            keys.append(None)
+    return keys
+
+
+def drop_stale_summary_rows(previous, source_dir):
+    """
+    Previous summary rows without those whose PDF was deleted or is not in source_dir
+    (rows without a readable Link PDF are kept); returns (rows, number dropped)
+    """
+    if previous is None or previous.empty:
+        return previous, 0
+    folder = os.path.normcase(os.path.abspath(source_dir))
+    keep = []
+    for link in previous.get("Link PDF", pd.Series(index=previous.index, dtype=object)):
+        target = link_target(link)
+        keep.append(not target or (
+            os.path.isfile(target) and os.path.normcase(os.path.dirname(os.path.abspath(target))) == folder
+        ))
+    kept = previous[keep].reset_index(drop=True)
+    return kept, len(previous) - len(kept)
+
+
+def upsert_summary_rows(previous, new_rows):
+    """
+    Previous summary rows with re-extracted pages replaced in place (same key) and
+    new pages appended; rows of unchanged pages are kept as they are, operator edits included
+    """
+    if previous is None or previous.empty:
+        return new_rows
+    new_keys = summary_row_keys(new_rows)
+    position = {key: i for i, key in enumerate(new_keys) if key}
+    
+    merged, used = [], set()
+    for row, key in zip(previous.to_dict('records'), summary_row_keys(previous)):
+        if key in position:
+            if key not in used:
+                merged.append(new_rows.iloc[position[key]].to_dict())
+                used.add(key)
+            continue
+        merged.append(row)
+    for i, key in enumerate(new_keys):
+        if key not in used:
+            merged.append(new_rows.iloc[i].to_dict())
+    
+    columns = list(previous.columns) + [c for c in new_rows.columns if c not in previous.columns]
+    return pd.DataFrame(merged, columns=columns)
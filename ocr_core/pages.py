@@ -0,0 +1,30 @@
+"""Page selection helpers"""
+from pypdf import PdfReader
+
+
+def count_pdf_pages(file_path):
+    """Number of pages in a PDF"""
+    return len(PdfReader(file_path).pages)
+
+
+def get_target_pages(selection_str, total_pages):
+    """
+    Parse page selection string and return list of pages to process
+    e.g. "All", "2", "1,3", "2-5", "3-N"
+    """
+    selection_str = str(selection_str).lower().replace(" ", "")
+    if selection_str == 'all':
+        return list(range(1, total_pages + 1))
+    
+    pages = set()
+    for part in selection_str.split(','):
+        if '-' in part:
+            try:
+                start_s, end_s = part.split('-')
+                end = total_pages if end_s == 'n' else int(end_s)
+                pages.update(range(int(start_s), end + 1))
+            except ValueError:
+                pass
+        elif part.isdigit():
+            pages.add(int(part))
+    return sorted(p for p in pages if 1 <= p <= total_pages)
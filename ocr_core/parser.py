@@ -0,0 +1,221 @@
+"""Parse OCR page text into document fields using the templates"""
+import re
+
+from .templates import load_templates, detect_document_type, match_field_patterns, \
+    order_patterns, record_pattern_hit
+from .validation import tax_id_checksum_ok
+
+
+def extract_common_fields(text, common_fields_config):
+    """
+    Extract common fields (tax_id, branch) that apply to all document types
+    result["spans"] holds {field: {"start", "end", "pattern_id"}} for the values found
+    (pattern_id "builtin.*" = a regex of this function, "common_fields.<field>[i]" = template pattern i)
+    """
+    result = {"tax_id": "", "branch": "", "spans": {}}
+    
+    if not text or not common_fields_config:
+        return result
+    
+    # Extract Tax ID
+    tax_config = common_fields_config.get("tax_id", {})
+    tax_patterns = tax_config.get("patterns", [])
+    
+    # 13-digit numbers, then the dashed form; the first one passing the Thai tax ID
+    # checksum wins (a misread digit / phone / account number is skipped), else the first found
+    candidates = [
+        (m.group(1), m.span(1), "builtin.tax_id_13")
+        for m in re.finditer(r"\b(\d{13})\b", text)
+    ] + [
+        (re.sub(r"\D", "", m.group(0)), m.span(0), "builtin.tax_id_dashed")
+        for m in re.finditer(r"\b\d{1}-\d{4}-\d{5}-\d{2}-\d{1}\b", text)
+    ]
+    if candidates:
+        value, span, pattern_id = next((c for c in candidates if tax_id_checksum_ok(c[0])), candidates[0])
+        result["tax_id"] = value
+        result["spans"]["tax_id"] = make_span(span, pattern_id)
+    else:
+        # Try keyword-based extraction
+        for idx, pattern in enumerate(tax_patterns):
+            value, _, span = match_field_patterns(text, [pattern], {"clean_non_digits": True, "length": 13})
+            if value and len(value) >= 10:
+                result["tax_id"] = value
+                result["spans"]["tax_id"] = make_span(span, f"common_fields.tax_id[{idx}]")
+                break
+    
+    # Extract Branch
+    branch_config = common_fields_config.get("branch", {})
+    default_hq = branch_config.get("default_hq", "00000")
+    pad_zeros = branch_config.get("pad_zeros", 5)
+    
+    # Check for Head Office keywords first
+    ho_match = re.search(r"(?:สำนักงานใหญ่|สนญ\.?|Head\s*Office|H\.?O\.?)", text, re.IGNORECASE)
+    if ho_match:
+        result["branch"] = default_hq
+        result["spans"]["branch"] = make_span(ho_match.span(0), "builtin.branch_head_office")
+    else:
+        # Try to find branch number
+        branch_match = re.search(r"(?:สาขา(?:ที่)?|Branch(?:\s*No\.?)?)\s*[:\.]?\s*(\d{1,5})", text, re.IGNORECASE)
+        if branch_match:
+            result["branch"] = branch_match.group(1).zfill(pad_zeros)
+            result["spans"]["branch"] = make_span(branch_match.span(1), "builtin.branch_number")
+    
+    return result
+
+
+def make_span(span, pattern_id):
+    """Character offsets of an extracted value in the page text + the pattern that matched"""
+    return {"start": span[0], "end": span[1], "pattern_id": pattern_id}
+
+
+def parse_ocr_data_with_template(text, templates, doc_type="auto", pattern_stats=None, record_hits=True):
+    """
+    Parse OCR text using document template patterns
+    pattern_stats: optional hit statistics (adaptive mode) - patterns are tried in
+    order of past wins for this vendor; the stats are updated in place unless
+    record_hits is False (the caller records the parse it keeps with record_parse_hits)
+    """
+    result = {
+        "document_type": "",
+        "document_type_name": "",
+        "document_no": "",
+        "date": "",
+        "amount": "",
+        "tax_id": "",
+        "branch": "",
+        "extra_fields": {},
+        "spans": {}
+    }
+    
+    if not text:
+        return result
+    
+    # Load templates if not provided
+    if not templates:
+        templates = load_templates()
+    
+    if not templates:
+        # Fallback to basic extraction
+        return parse_ocr_data_basic(text)
+    
+    # Detect or use specified document type
+    if doc_type == "auto":
+        detected_type = detect_document_type(text, templates)
+    else:
+        detected_type = doc_type if doc_type in templates.get("templates", {}) else "invoice"
+    
+    result["document_type"] = detected_type
+    
+    # Get template for this document type
+    template = templates.get("templates", {}).get(detected_type, {})
+    result["document_type_name"] = template.get("name", detected_type)
+    
+    # Extract common fields (tax_id, branch) - always extracted for Vendor lookup
+    common_fields = templates.get("common_fields", {})
+    common_result = extract_common_fields(text, common_fields)
+    result["tax_id"] = common_result["tax_id"]
+    result["branch"] = common_result["branch"]
+    result["spans"].update(common_result["spans"])
+    
+    # Extract template-specific fields
+    fields_config = template.get("fields", {})
+    
+    for field_name, field_config in fields_config.items():
+        patterns = field_config.get("patterns", [])
+        options = {
+            "clean_html": field_config.get("clean_html", False),
+            "clean_non_digits": field_config.get("clean_non_digits", False),
+            "length": field_config.get("length")
+        }
+        
+        if pattern_stats is not None:
+            order = order_patterns(patterns, pattern_stats, result["tax_id"], detected_type, field_name)
+            value, pattern_index, span = match_field_patterns(text, patterns, options, order)
+            if pattern_index is not None and record_hits:
+                record_pattern_hit(pattern_stats, result["tax_id"], detected_type, field_name, patterns[pattern_index])
+        else:
+            value, pattern_index, span = match_field_patterns(text, patterns, options)
+        
+        if pattern_index is not None:
+            result["spans"][field_name] = make_span(span, f"templates.{detected_type}.{field_name}[{pattern_index}]")
+        
+        # Handle fallback for amount fields
+        if not value and field_config.get("fallback") == "last_amount":
+            amounts = list(re.finditer(r"([\d,]+\.\d{2})", text))
+            value = amounts[-1].group(1) if amounts else ""
+            if amounts:
+                result["spans"][field_name] = make_span(amounts[-1].span(1), "fallback.last_amount")
+        
+        # Store in appropriate location
+        if field_name in ["document_no", "date", "amount"]:
+            result[field_name] = value
+        else:
+            result["extra_fields"][field_name] = value
+    
+    return result
+
+
+def record_parse_hits(pattern_stats, parsed, templates):
+    """Count the template patterns that produced the fields of a kept parse (adaptive mode)"""
+    doc_type = parsed.get("document_type")
+    template = (templates or {}).get("templates", {}).get(doc_type, {})
+    for field_name, field_config in template.get("fields", {}).items():
+        span = parsed.get("spans", {}).get(field_name)
+        prefix = f"templates.{doc_type}.{field_name}["
+        if span and span["pattern_id"].startswith(prefix):
+            pattern = field_config.get("patterns", [])[int(span["pattern_id"][len(prefix):-1])]
+            record_pattern_hit(pattern_stats, parsed["tax_id"], doc_type, field_name, pattern)
+
+
+def parse_ocr_data_basic(text):
+    """Basic OCR parsing without templates (fallback)"""
+    result = {
+        "document_type": "invoice",
+        "document_type_name": "ใบกำกับภาษี/Invoice",
+        "document_no": "",
+        "date": "",
+        "amount": "",
+        "tax_id": "",
+        "branch": "",
+        "extra_fields": {},
+        "spans": {}
+    }
+    
+    if not text:
+        return result
+    
+    # Document number
+    inv_match = re.search(r"เลขที่\s*[:\.]?\s*([A-Za-z0-9\-\/]{3,})", text)
+    result["document_no"] = inv_match.group(1) if inv_match else ""
+    
+    # Date
+    date_match = re.search(r"วันที่\s*[:\.]?\s*(\d{1,2}\s+[^\s]+\s+\d{4}|\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})", text)
+    result["date"] = date_match.group(1) if date_match else ""
+    
+    # Amount
+    amount_match = re.search(r"(?:จำนวนเงินรวมทั้งสิ้น|รวมเงินทั้งสิ้น|GRAND TOTAL)\s*[:\.]?\s*([\d,]+\.\d{2})", text, re.IGNORECASE)
+    if amount_match:
+        result["amount"] = amount_match.group(1)
+    else:
+        amounts = re.findall(r"([\d,]+\.\d{2})", text)
+        result["amount"] = amounts[-1] if amounts else ""
+    
+    # Tax ID
+    all_tax_ids = re.findall(r"\b(\d{13})\b", text)
+    if all_tax_ids:
+        result["tax_id"] = next((t for t in all_tax_ids if tax_id_checksum_ok(t)), all_tax_ids[0])
+    else:
+        tax_pattern_match = re.search(r"\b\d{1}-\d{4}-\d{5}-\d{2}-\d{1}\b", text)
+        if tax_pattern_match:
+            result["tax_id"] = re.sub(r"\D", "", tax_pattern_match.group(0))
+    
+    # Branch
+    ho_match = re.search(r"(?:สำนักงานใหญ่|สนญ\.?|Head\s*Office|H\.?O\.?)", text, re.IGNORECASE)
+    if ho_match:
+        result["branch"] = "00000"
+    else:
+        branch_match = re.search(r"(?:สาขา(?:ที่)?|Branch(?:\s*No\.?)?)\s*[:\.]?\s*(\d{1,5})", text, re.IGNORECASE)
+        if branch_match:
+            result["branch"] = branch_match.group(1).zfill(5)
+    
+    return result
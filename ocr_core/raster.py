@@ -0,0 +1,195 @@
+"""Page raster cache for the Document Editor: (path, mtime, page, DPI) -> PIL image (+ Tesseract words)"""
+import os
+import queue
+import hashlib
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+from .config import RASTER_CACHE_MB, RASTER_CACHE_DIR
+from .boxes import page_boxes_path, compact_words, save_page_boxes, load_page_boxes, PageTokenIndex
+
+# Pages whose Tesseract word boxes are kept in memory
+WORD_CACHE_PAGES = 256
+
+
+def render_page(pdf_path, page_num, dpi, poppler_path=None):
+    """Rasterize one PDF page (1-indexed) with poppler"""
+    from pdf2image import convert_from_path
+    images = convert_from_path(
+        pdf_path,
+        first_page=page_num,
+        last_page=page_num,
+        dpi=dpi,
+        poppler_path=poppler_path or None
+    )
+    if not images:
+        raise RuntimeError(f"Failed to render PDF page {page_num}")
+    return images[0]
+
+
+def image_bytes(image):
+    """Approximate memory of a decoded image"""
+    return image.width * image.height * len(image.getbands())
+
+
+class PageRasterCache:
+    """
+    Thread-safe LRU of rendered pages bounded by decoded size (max_bytes), with an
+    optional PNG tier on disk (disk_dir) that survives restarts. The key includes the
+    file mtime, so an edited PDF is rendered again. get() returns a copy, callers may draw on it.
+    """
+    
+    def __init__(self, max_bytes=RASTER_CACHE_MB * 1024 * 1024, disk_dir=RASTER_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.size = 0
+        self._images = OrderedDict()
+        self._words = OrderedDict()
+        self._rendering = {}  # key -> Event while one thread renders it (others wait instead of rendering too)
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+    
+    @staticmethod
+    def key(pdf_path, page_num, dpi):
+        path = os.path.abspath(pdf_path)
+        return (path, os.path.getmtime(path), int(page_num), int(dpi))
+    
+    def disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{digest}.png")
+    
+    def get(self, pdf_path, page_num, dpi, poppler_path=None):
+        """Rendered page as a new PIL image (memory -> disk -> poppler)"""
+        return self.get_cached(pdf_path, page_num, dpi, poppler_path).copy()
+    
+    def get_cached(self, pdf_path, page_num, dpi, poppler_path=None):
+        """The cached image itself (read-only for callers)"""
+        key = self.key(pdf_path, page_num, dpi)
+        while True:
+            with self._lock:
+                image = self._images.get(key)
+                if image is not None:
+                    self._images.move_to_end(key)
+                    return image
+                event = self._rendering.get(key)
+                if event is None:
+                    self._rendering[key] = threading.Event()
+                    break
+            event.wait()
+        
+        try:
+            image = self._load_disk(key)
+            if image is None:
+                image = render_page(key[0], key[2], key[3], poppler_path)
+                self._save_disk(key, image)
+            self._put(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._rendering.pop(key).set()
+    
+    def words(self, pdf_path, page_num, dpi, lang='tha+eng', poppler_path=None, boxes_dir=None):
+        """
+        Tesseract word boxes of the page as {'width', 'height', 'words', 'index'} (words: image_to_data()
+        columns, non-empty words only; coordinates in pixels of the page rendered at dpi;
+        index: PageTokenIndex over the words):
+        memory -> <boxes_dir>/<name>_pageN.boxes.json -> Tesseract (then saved to the sidecar)
+        """
+        key = self.key(pdf_path, page_num, dpi) + (lang,)
+        with self._lock:
+            data = self._words.get(key)
+            if data is not None:
+                self._words.move_to_end(key)
+                return data
+        
+        sidecar = page_boxes_path(boxes_dir, pdf_path, page_num) if boxes_dir else None
+        stored = load_page_boxes(sidecar, pdf_path, dpi, lang) if sidecar else None
+        if stored is not None:
+            data = {'width': stored["width"], 'height': stored["height"], 'words': stored["words"]}
+        else:
+            import pytesseract
+            image = self.get_cached(pdf_path, page_num, dpi, poppler_path)
+            words = compact_words(pytesseract.image_to_data(image, lang=lang, output_type=pytesseract.Output.DICT))
+            data = {'width': image.width, 'height': image.height, 'words': words}
+            if sidecar:
+                save_page_boxes(sidecar, pdf_path, page_num, dpi, lang, image.size, words)
+        
+        data['index'] = PageTokenIndex(data['words'])
+        with self._lock:
+            self._words[key] = data
+            while len(self._words) > WORD_CACHE_PAGES:
+                self._words.popitem(last=False)
+        return data
+    
+    def _put(self, key, image):
+        with self._lock:
+            if key in self._images:
+                return
+            self._images[key] = image
+            self.size += image_bytes(image)
+            while self.size > self.max_bytes and len(self._images) > 1:
+                _, evicted = self._images.popitem(last=False)
+                self.size -= image_bytes(evicted)
+    
+    def _load_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self.disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with Image.open(path) as image:
+                image.load()
+                return image.copy()
+        except Exception:
+            return None
+    
+    def _save_disk(self, key, image):
+        if not self.disk_dir:
+            return
+        path = self.disk_path(key)
+        tmp_path = path + ".tmp"
+        try:
+            image.save(tmp_path, format='PNG')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Warning: Could not save page raster cache: {e}")
+
+
+class PagePrefetcher:
+    """
+    Background worker that warms a PageRasterCache (and optionally Tesseract words and the
+    viewer's tile level, tiles: tiles.PageTiles) for pages the user is likely to open next.
+    A new request replaces the pages still waiting, so fast navigation does not queue up
+    renders the user has already skipped.
+    """
+    
+    def __init__(self, cache, tiles=None):
+        self.cache = cache
+        self.tiles = tiles
+        self._jobs = queue.Queue()
+        self._generation = 0
+        threading.Thread(target=self._run, name="page-prefetch", daemon=True).start()
+    
+    def prefetch(self, pages, dpi, words_dpi=None, poppler_path=None):
+        """pages: [(pdf_path, page_num, boxes_dir), ...] nearest first"""
+        self._generation += 1
+        for pdf_path, page_num, boxes_dir in pages:
+            self._jobs.put((self._generation, pdf_path, page_num, boxes_dir, dpi, words_dpi, poppler_path))
+    
+    def _run(self):
+        while True:
+            generation, pdf_path, page_num, boxes_dir, dpi, words_dpi, poppler_path = self._jobs.get()
+            if generation != self._generation:
+                continue  # superseded by a newer request
+            try:
+                self.cache.get_cached(pdf_path, page_num, dpi, poppler_path)
+                if self.tiles is not None:
+                    self.tiles.level(pdf_path, page_num, dpi, poppler_path)
+                if words_dpi:
+                    self.cache.words(pdf_path, page_num, words_dpi, poppler_path=poppler_path, boxes_dir=boxes_dir)
+            except Exception as e:
+                print(f"[DEBUG] Prefetch {os.path.basename(pdf_path)} page {page_num} failed: {e}")
@@ -0,0 +1,352 @@
+"""Batch extraction: OCR every PDF of a folder (one backend or escalation tiers), parse, write the summary"""
+import os
+import sys
+import platform
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pandas as pd
+
+from .config import ADAPTIVE_PATTERNS, RETRY_FAILED, RETRY_BACKEND, SUMMARY_MERGE, get_default_source_dir, \
+    get_default_output_dir
+from .templates import load_templates, load_pattern_stats, save_pattern_stats, REGEX_QUARANTINE
+from .parser import parse_ocr_data_with_template, record_parse_hits
+from .validation import validate_parsed
+from .pages import count_pdf_pages, get_target_pages
+from .vendor import load_vendor_master, merge_vendor_codes, file_sha256
+from .backends import get_backend
+from .output import page_text_path, save_page_text, save_field_spans, page_key, build_summary_row, \
+    order_summary_columns, write_summary_excel, read_summary_rows, summary_row_keys, upsert_summary_rows, \
+    drop_stale_summary_rows, load_summary_manifest, save_summary_manifest
+
+# Tiered mode: OCR_TIERS="text,typhoon" = text layer first, Typhoon API for pages that fail validation
+DEFAULT_TIERS = "text,typhoon"
+TIERED_SUMMARY_FILE = "summary_ocr_tiered.xlsx"
+
+
+def split_batches(pages, size):
+    """[1,2,3,4,5], 2 -> [[1,2], [3,4], [5]]"""
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def collect_target_pages(source_dir, files, page_config):
+    """{filename: [page, ...]} for every readable PDF"""
+    targets = {}
+    for filename in files:
+        try:
+            total_pages = count_pdf_pages(os.path.join(source_dir, filename))
+        except Exception as e:
+            print(f"   Error reading PDF file {filename}: {e}")
+            continue
+        targets[filename] = get_target_pages(page_config, total_pages)
+        print(f"   -> {filename}: Total Pages: {total_pages}, Target: {targets[filename]}")
+    return targets
+
+
+def ocr_pass(backend, source_dir, targets):
+    """
+    OCR {filename: [pages]} with one backend, honouring its batching and concurrency limits.
+    Yields (filename, page_num, text) in file/page order so the summary is deterministic.
+    """
+    print(f"\n[{backend.label}] Workers: {backend.max_workers} "
+          f"({'processes' if backend.uses_processes else 'threads'}), "
+          f"pages per request: {backend.max_pages_per_request}")
+    
+    executor_class = ProcessPoolExecutor if backend.uses_processes else ThreadPoolExecutor
+    with executor_class(max_workers=backend.max_workers) as executor:
+        jobs = []
+        for filename, pages in targets.items():
+            file_path = os.path.join(source_dir, filename)
+            for batch in split_batches(pages, backend.max_pages_per_request):
+                jobs.append((filename, executor.submit(backend.ocr_pages, file_path, batch)))
+        
+        for filename, future in jobs:
+            try:
+                ocr_results = future.result()
+            except Exception as e:
+                print(f"   [Error] {filename}: {e}")
+                continue
+            for page_num, page_text in ocr_results:
+                yield filename, page_num, page_text
+
+
+def retry_failed_pages(tiers, source_dir, targets, results, templates, doc_type, pattern_stats):
+    """
+    Re-OCR only the pages that still fail validation, with the escalated settings of the
+    engine that produced them (or OCR_RETRY_BACKEND); keep whichever result has fewer problems
+    (pattern hits are recorded later, for the result that is kept)
+    """
+    retry_backends = {}  # producing tier label -> retry backend (None = no retry possible)
+    queues = {}  # retry label -> (backend, {filename: [pages]})
+    failed = 0
+    for filename, pages in targets.items():
+        for page_num in pages:
+            result = results.get((filename, page_num))
+            if result and not validate_parsed(result["parsed"], templates):
+                continue
+            failed += 1
+            
+            producer_label = result["tier"] if result else tiers[-1].label
+            if producer_label not in retry_backends:
+                producer = next((b for b in tiers if b.label == producer_label), tiers[-1])
+                retry = get_backend(RETRY_BACKEND) if RETRY_BACKEND else producer.escalated()
+                if retry is not None and not retry.check()[0]:
+                    print(f"[WARNING] Retry backend {retry.label} unavailable")
+                    retry = None
+                retry_backends[producer_label] = retry
+            
+            retry = retry_backends[producer_label]
+            if retry is not None:
+                queues.setdefault(retry.label, (retry, {}))[1].setdefault(filename, []).append(page_num)
+    
+    if not failed:
+        return
+    
+    retried = improved = 0
+    for retry, pending in queues.values():
+        retried += sum(len(pages) for pages in pending.values())
+        for filename, page_num, page_text in ocr_pass(retry, source_dir, pending):
+            if not page_text:
+                continue
+            parsed = parse_ocr_data_with_template(page_text, templates, doc_type, pattern_stats, record_hits=False)
+            previous = results.get((filename, page_num))
+            if previous and len(validate_parsed(parsed, templates)) >= len(validate_parsed(previous["parsed"], templates)):
+                continue  # not better, keep the first result
+            results[(filename, page_num)] = {"text": page_text, "parsed": parsed, "tier": retry.label}
+            improved += 1
+            print(f"      Retry improved {filename} page {page_num}")
+    
+    print(f"\nValidation retry: {failed} page(s) failed, {retried} re-OCRed, {improved} improved")
+
+
+def skip_unchanged_pages(source_dir, targets, file_hashes, manifest, previous):
+    """
+    Drop pages already in the previous summary whose PDF hash is unchanged since they
+    were extracted; returns (pages still to OCR, number of pages skipped)
+    """
+    previous_keys = set(summary_row_keys(previous)) if previous is not None else set()
+    remaining, skipped = {}, 0
+    for filename, pages in targets.items():
+        file_path = os.path.join(source_dir, filename)
+        todo = []
+        for page_num in pages:
+            key = page_key(file_path, page_num)
+            if key in previous_keys and manifest.get(key) == file_hashes.get(filename):
+                skipped += 1
+            else:
+                todo.append(page_num)
+        if todo:
+            remaining[filename] = todo
+    return remaining, skipped
+
+
+def run_extraction(backends, source_dir, output_dir, page_config="All", doc_type="auto"):
+    """
+    Run one extraction; returns a process exit code (0 = success)
+    
+    `backends` is one backend or a list of tiers (cheap first): pages whose parse fails
+    validation (missing required field, bad tax ID / amount) are sent to the next tier.
+    With OCR_SUMMARY_MERGE the existing summary is updated instead of overwritten:
+    pages whose PDF is unchanged keep their rows (and operator edits) and are not OCRed again;
+    rows of PDFs that were deleted or are not in source_dir are removed.
+    """
+    tiers = backends if isinstance(backends, (list, tuple)) else [backends]
+    tiered = len(tiers) > 1
+    
+    print(f"--- Start Processing ({' -> '.join(b.label for b in tiers)}) ---")
+    print(f"Platform: {platform.system()} {platform.release()}")
+    print(f"Source: {source_dir}")
+    print(f"Output: {output_dir}")
+    print(f"Page Config: {page_config}")
+    print(f"Document Type: {doc_type}")
+    
+    ok, message = tiers[0].check()
+    if not ok:
+        print(f"[ERROR] {message}")
+        return 1
+    available_tiers = [tiers[0]]
+    for backend in tiers[1:]:
+        ok, message = backend.check()
+        if ok:
+            available_tiers.append(backend)
+        else:
+            print(f"[WARNING] {backend.label} unavailable, not escalating to it: {message}")
+    tiers = available_tiers
+    
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # Load templates
+    templates = load_templates()
+    if templates:
+        available_types = list(templates.get("templates", {}).keys())
+        print(f"Loaded templates: {available_types}")
+    
+    # Adaptive pattern ordering (optional)
+    pattern_stats = load_pattern_stats() if ADAPTIVE_PATTERNS else None
+    if pattern_stats is not None:
+        print(f"Adaptive pattern ordering: ON ({len(pattern_stats.get('vendors', {}))} vendor profiles)")
+    
+    # Load Vendor Master
+    vendor_df = load_vendor_master()
+    
+    if not os.path.exists(source_dir):
+        print(f"[ERROR] Source directory not found: {source_dir}")
+        return 1
+    
+    files = sorted(f for f in os.listdir(source_dir) if f.lower().endswith(".pdf"))
+    if not files:
+        print("No PDF files found.")
+        return 0
+    
+    targets = collect_target_pages(source_dir, files, page_config)
+    
+    output_excel_path = os.path.join(output_dir, TIERED_SUMMARY_FILE if tiered else tiers[0].summary_file)
+    previous, manifest, file_hashes, dropped = None, {}, {}, 0
+    if SUMMARY_MERGE:
+        # Rows of PDFs deleted or from another source folder are not carried over
+        previous, dropped = drop_stale_summary_rows(read_summary_rows(output_excel_path), source_dir)
+        if dropped:
+            print(f"\nIncremental summary: {dropped} row(s) of deleted PDFs or another folder removed")
+        manifest = load_summary_manifest(output_excel_path)
+        if previous is not None:
+            kept_keys = set(summary_row_keys(previous))
+            manifest = {key: value for key, value in manifest.items() if key in kept_keys}
+        file_hashes = {filename: file_sha256(os.path.join(source_dir, filename)) for filename in targets}
+        targets, skipped = skip_unchanged_pages(source_dir, targets, file_hashes, manifest, previous)
+        if previous is not None:
+            print(f"\nIncremental summary: {skipped} unchanged page(s) kept, "
+                  f"{sum(len(pages) for pages in targets.values())} page(s) to OCR")
+    
+    # (filename, page) -> {"text", "parsed", "tier"}; later tiers replace earlier results
+    results = {}
+    pending = targets
+    tier_counts = []
+    failing_counts = []  # pages not read or failing validation after each tier
+    for tier_index, backend in enumerate(tiers):
+        tier_counts.append(sum(len(pages) for pages in pending.values()))
+        for filename, page_num, page_text in ocr_pass(backend, source_dir, pending):
+            if not page_text:
+                continue
+            # Pattern hits are recorded once per page, for the result that is kept (below)
+            parsed = parse_ocr_data_with_template(page_text, templates, doc_type, pattern_stats, record_hits=False)
+            results[(filename, page_num)] = {"text": page_text, "parsed": parsed, "tier": backend.label}
+            print(f"      {filename} page {page_num}: {parsed['document_type_name']}")
+        
+        if not tiered:
+            break
+        
+        # Escalate pages that were not read or failed validation (counted even without a next tier)
+        last_tier = tier_index == len(tiers) - 1
+        escalate = {}
+        for filename, pages in pending.items():
+            for page_num in pages:
+                result = results.get((filename, page_num))
+                problems = validate_parsed(result["parsed"], templates) if result else ["no text"]
+                if problems:
+                    if not last_tier:
+                        print(f"      Escalate {filename} page {page_num}: {', '.join(problems)}")
+                    escalate.setdefault(filename, []).append(page_num)
+        failing_counts.append(sum(len(pages) for pages in escalate.values()))
+        if last_tier or not escalate:
+            break
+        pending = escalate
+    
+    if RETRY_FAILED:
+        retry_failed_pages(tiers, source_dir, targets, results, templates, doc_type, pattern_stats)
+    
+    # Which engine produced each row (only when more than one was used)
+    show_tier = tiered or any(result["tier"] != tiers[0].label for result in results.values())
+    if previous is not None and "OCR Tier" in previous.columns:
+        show_tier = True
+    
+    data_rows = []
+    for filename, pages in targets.items():
+        file_path = os.path.join(source_dir, filename)
+        for page_num in pages:
+            result = results.get((filename, page_num))
+            if not result:
+                print(f"      Warning: Failed to read {filename} page {page_num}")
+                continue
+            
+            # Save raw OCR text (of the tier that produced the row)
+            txt_path = page_text_path(output_dir, filename, page_num)
+            save_page_text(txt_path, result["text"])
+            save_field_spans(txt_path, page_num, result["parsed"])
+            
+            if pattern_stats is not None:
+                record_parse_hits(pattern_stats, result["parsed"], templates)
+            
+            row_data = build_summary_row(file_path, page_num, result["parsed"])
+            if show_tier:
+                row_data["OCR Tier"] = result["tier"]
+            data_rows.append(row_data)
+            if SUMMARY_MERGE:
+                manifest[page_key(file_path, page_num)] = file_hashes[filename]
+    
+    if tiered and tier_counts[0]:
+        print("\nOCR tiers:")
+        for backend, count in zip(tiers, tier_counts):
+            print(f"   - {backend.label}: {count} page(s)")
+        needed = failing_counts[0] if failing_counts else 0
+        escalated = tier_counts[1] if len(tier_counts) > 1 else 0
+        print(f"Needed escalation: {needed}/{tier_counts[0]} ({needed / tier_counts[0]:.0%})")
+        print(f"Escalation rate: {escalated}/{tier_counts[0]} ({escalated / tier_counts[0]:.0%})")
+        if needed > escalated:
+            print(f"[WARNING] {needed - escalated} page(s) failed validation but were not escalated "
+                  f"(no other tier available)")
+    
+    if pattern_stats is not None:
+        save_pattern_stats(pattern_stats)
+    
+    if REGEX_QUARANTINE:
+        print(f"\nRegex guard skipped {len(REGEX_QUARANTINE)} pattern(s):")
+        for pattern, reason in REGEX_QUARANTINE.items():
+            print(f"   - {pattern[:80]} ({reason})")
+    
+    # Save and merge data
+    if not data_rows and not dropped:
+        if previous is not None:
+            print(f"No new or changed pages, summary unchanged: {output_excel_path}")
+        else:
+            print("No data extracted.")
+        return 0
+    
+    # Vendor mapping only for the new rows (kept rows may carry operator corrections)
+    df = merge_vendor_codes(pd.DataFrame(data_rows), vendor_df) if data_rows else pd.DataFrame()
+    if SUMMARY_MERGE:
+        df = upsert_summary_rows(previous, df)
+    df = order_summary_columns(df)
+    
+    if not write_summary_excel(df, output_excel_path):
+        return 1
+    if SUMMARY_MERGE:
+        save_summary_manifest(output_excel_path, manifest)
+    print(f"\nSuccess! Output saved at: {output_excel_path}")
+    print(f"Total rows: {len(df)} ({len(data_rows)} new or updated)")
+    return 0
+
+
+def main(backend_name, argv=None):
+    """
+    Command line entry of the Extract_Inv*.py scripts
+    Usage: python <script> <source_dir> <output_dir> <page_config> [document_type]
+    backend_name "tiered" runs the comma separated OCR_TIERS backends as escalation tiers
+    """
+    argv = sys.argv if argv is None else argv
+    if len(argv) >= 3:
+        source_dir = argv[1]
+        output_dir = argv[2]
+        page_config = argv[3] if len(argv) > 3 else "All"
+        doc_type = argv[4] if len(argv) > 4 else "auto"
+    else:
+        source_dir = get_default_source_dir()
+        output_dir = get_default_output_dir()
+        page_config = "2"
+        doc_type = "auto"
+    
+    if backend_name == "tiered":
+        tier_names = [n.strip() for n in os.environ.get("OCR_TIERS", DEFAULT_TIERS).split(",") if n.strip()]
+        backends = [get_backend(name) for name in tier_names]
+    else:
+        backends = get_backend(backend_name)
+    
+    return run_extraction(backends, source_dir, output_dir, page_config, doc_type)
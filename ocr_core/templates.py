@@ -0,0 +1,277 @@
+"""Document templates: loading, regex guard, adaptive pattern ordering and field matching"""
+import os
+import re
+import json
+import time
+
+from .config import SCRIPT_DIR, TEMPLATES_FILE, PATTERN_STATS_FILE, REGEX_GUARD, REGEX_TIMEOUT
+
+# Optional: `regex` supports a per-search timeout (used by the regex guard)
+try:
+    import regex as regex_engine
+    HAS_REGEX_TIMEOUT = True
+except ImportError:
+    regex_engine = None
+    HAS_REGEX_TIMEOUT = False
+
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# Patterns skipped by the regex guard: {pattern: reason}
+REGEX_QUARANTINE = {}
+
+
+# --- Load Document Templates ---
+def load_templates():
+    """Load document templates from JSON file"""
+    path = os.path.join(SCRIPT_DIR, TEMPLATES_FILE)
+    if not os.path.exists(path):
+        print(f"Warning: Templates file not found: {TEMPLATES_FILE}")
+        return None
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            templates = json.load(f)
+    except Exception as e:
+        print(f"Error loading templates: {e}")
+        return None
+    
+    check_template_patterns(templates)
+    return templates
+
+
+# --- Regex Safety Guard ---
+def check_pattern_safety(pattern):
+    """
+    Static check for constructs that can backtrack catastrophically.
+    Returns a list of problems (empty list = looks safe).
+    """
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE | re.DOTALL)
+    except Exception as e:
+        return [f"invalid regex: {e}"]
+    
+    problems = []
+    
+    def is_unbounded(max_count):
+        return max_count == sre_parse.MAXREPEAT or max_count > 1000
+    
+    def overlaps(sub_a, sub_b):
+        # two repeated atoms compete for the same characters: either one is "." or both are identical
+        any_char = [(sre_parse.ANY, None)]
+        return sub_a == any_char or sub_b == any_char or sub_a == sub_b
+    
+    def walk(items, inside_unbounded):
+        prev_repeat = None  # atoms of the previous unbounded single-atom repeat
+        for op, av in items:
+            if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+                min_count, max_count, sub = av
+                sub = list(sub)
+                unbounded = is_unbounded(max_count)
+                if unbounded and inside_unbounded:
+                    problems.append("nested quantifier (e.g. (a+)+)")
+                if unbounded and len(sub) == 1:
+                    if prev_repeat is not None and overlaps(prev_repeat, sub):
+                        problems.append("adjacent overlapping quantifiers (e.g. .*.*)")
+                    prev_repeat = sub
+                else:
+                    prev_repeat = None
+                walk(sub, inside_unbounded or unbounded)
+                continue
+            
+            prev_repeat = None
+            if op == sre_parse.SUBPATTERN:
+                walk(list(av[-1]), inside_unbounded)
+            elif op == sre_parse.BRANCH:
+                branches = av[1]
+                if inside_unbounded and len(set(str(b) for b in branches)) < len(branches):
+                    problems.append("duplicate alternatives inside a quantifier")
+                for branch in branches:
+                    walk(list(branch), inside_unbounded)
+            elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+                walk(list(av[1]), inside_unbounded)
+    
+    walk(list(parsed), False)
+    return sorted(set(problems))
+
+
+def check_template_patterns(templates):
+    """Run the static regex check over every template pattern and report risky ones"""
+    sections = [(f"templates.{doc_type}", template.get("fields", {}))
+                for doc_type, template in templates.get("templates", {}).items()]
+    sections.append(("common_fields", templates.get("common_fields", {})))
+    
+    flagged = 0
+    for section, fields in sections:
+        for field_name, field_config in fields.items():
+            for idx, pattern in enumerate(field_config.get("patterns", [])):
+                problems = check_pattern_safety(pattern)
+                if problems:
+                    flagged += 1
+                    print(f"Warning: Risky regex {section}.{field_name}[{idx}]: {', '.join(problems)}")
+                    if REGEX_GUARD:
+                        REGEX_QUARANTINE[pattern] = "static check: " + ", ".join(problems)
+    return flagged
+
+
+def guarded_search(pattern, text, flags):
+    """
+    re.search with a per-pattern time budget (REGEX_TIMEOUT seconds).
+    With the `regex` package the budget is enforced; otherwise a pattern that
+    overruns is quarantined so it is not run again in this batch.
+    Returns the match, or None if the pattern is quarantined / timed out.
+    """
+    if pattern in REGEX_QUARANTINE:
+        return None
+    
+    start = time.perf_counter()
+    if HAS_REGEX_TIMEOUT:
+        try:
+            match = regex_engine.search(pattern, text, flags, timeout=REGEX_TIMEOUT)
+        except TimeoutError:
+            REGEX_QUARANTINE[pattern] = f"timed out after {REGEX_TIMEOUT}s"
+            print(f"      Warning: Regex quarantined (timeout): {pattern[:80]}")
+            return None
+    else:
+        match = re.search(pattern, text, flags)
+    
+    elapsed = time.perf_counter() - start
+    if elapsed > REGEX_TIMEOUT and pattern not in REGEX_QUARANTINE:
+        REGEX_QUARANTINE[pattern] = f"took {elapsed:.2f}s (budget {REGEX_TIMEOUT}s)"
+        print(f"      Warning: Regex quarantined (slow, {elapsed:.2f}s): {pattern[:80]}")
+    return match
+
+
+def detect_document_type(text, templates):
+    """Auto-detect document type based on keywords in text"""
+    if not text or not templates:
+        return "invoice"  # default
+    
+    text_lower = text.lower()
+    scores = {}
+    
+    for doc_type, template in templates.get("templates", {}).items():
+        keywords = template.get("detect_keywords", [])
+        score = 0
+        for keyword in keywords:
+            if keyword.lower() in text_lower:
+                score += 1
+        if score > 0:
+            scores[doc_type] = score
+    
+    if scores:
+        # Return type with highest score
+        return max(scores, key=scores.get)
+    
+    return "invoice"  # default fallback
+
+
+def extract_field_by_patterns(text, patterns, options=None):
+    """Extract field value using multiple regex patterns"""
+    value, _, _ = match_field_patterns(text, patterns, options)
+    return value
+
+
+def match_field_patterns(text, patterns, options=None, order=None):
+    """
+    Try patterns in `order` (default: file order) and return (value, pattern_index, span)
+    of the first pattern that yields a non-empty value, or ("", None, None).
+    span is the (start, end) character offset of the matched group in `text`.
+    """
+    if not text or not patterns:
+        return "", None, None
+    
+    options = options or {}
+    
+    for pattern_index in (order if order is not None else range(len(patterns))):
+        pattern = patterns[pattern_index]
+        try:
+            if REGEX_GUARD:
+                match = guarded_search(pattern, text, re.IGNORECASE | re.DOTALL)
+            else:
+                match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            if match:
+                # Get first capturing group or full match
+                group = 1 if match.lastindex and match.lastindex >= 1 else 0
+                value = match.group(group)
+                
+                # Clean HTML if specified
+                if options.get("clean_html"):
+                    value = re.sub(r'<br\s*/?>', ' ', value)
+                    value = re.sub(r'<[^>]+>', '', value)
+                
+                # Clean whitespace
+                value = re.sub(r'[\r\n]+', ' ', value)
+                value = re.sub(r'\s+', ' ', value).strip()
+                
+                # Clean non-digits if specified
+                if options.get("clean_non_digits"):
+                    value = re.sub(r'\D', '', value)
+                    # Truncate to specified length
+                    if options.get("length"):
+                        value = value[:options["length"]]
+                
+                if value:
+                    return value, pattern_index, match.span(group)
+        except Exception:
+            continue
+    
+    return "", None, None
+
+
+# --- Adaptive Pattern Ordering ---
+def load_pattern_stats():
+    """Load per-vendor pattern hit statistics (adaptive mode)"""
+    path = os.path.join(SCRIPT_DIR, PATTERN_STATS_FILE)
+    if not os.path.exists(path):
+        return {"vendors": {}}
+    
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            stats = json.load(f)
+        if isinstance(stats, dict) and isinstance(stats.get("vendors"), dict):
+            return stats
+    except Exception as e:
+        print(f"Warning: Could not read pattern stats: {e}")
+    return {"vendors": {}}
+
+
+def save_pattern_stats(stats):
+    """Persist pattern hit statistics (written atomically)"""
+    path = os.path.join(SCRIPT_DIR, PATTERN_STATS_FILE)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Warning: Could not save pattern stats: {e}")
+
+
+def order_patterns(patterns, stats, vendor_key, doc_type, field_name):
+    """
+    Return pattern indices ordered by historical hits, most frequent first.
+    Uses the vendor's own statistics when available, otherwise the global ("*") ones.
+    Ties (and patterns never seen) keep their file order, so the order is deterministic.
+    """
+    vendors = stats.get("vendors", {})
+    field_hits = {}
+    for key in (vendor_key, "*"):
+        if key and key in vendors:
+            field_hits = vendors[key].get(doc_type, {}).get(field_name, {})
+            if field_hits:
+                break
+    
+    if not field_hits:
+        return list(range(len(patterns)))
+    return sorted(range(len(patterns)), key=lambda i: (-field_hits.get(patterns[i], 0), i))
+
+
+def record_pattern_hit(stats, vendor_key, doc_type, field_name, pattern):
+    """Count a winning pattern for the vendor and for the global ("*") bucket"""
+    vendors = stats.setdefault("vendors", {})
+    for key in {vendor_key or "*", "*"}:
+        field_hits = vendors.setdefault(key, {}).setdefault(doc_type, {}).setdefault(field_name, {})
+        field_hits[pattern] = field_hits.get(pattern, 0) + 1
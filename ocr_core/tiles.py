@@ -0,0 +1,79 @@
+"""
+Page pyramid for the Document Editor viewer: each page is rendered at a few fixed DPIs
+(levels) and cut into tiles stored as static files; a zoom step picks a level and the
+browser scales it, so zooming never re-rasterizes or resizes on the server
+"""
+import threading
+from collections import OrderedDict
+
+from .config import TILE_SIZE
+
+# Rendered levels; the viewer shows 150 DPI x zoom
+BASE_DPI = 150
+PYRAMID_DPIS = (75, 150, 300, 450)
+
+# Levels whose tile list is remembered
+TILE_MEMO_LEVELS = 256
+
+
+def pyramid_dpi(zoom_level):
+    """Smallest level sharp enough for the zoom (150 DPI x zoom), else the largest"""
+    target = BASE_DPI * zoom_level
+    return next((dpi for dpi in PYRAMID_DPIS if dpi >= target), PYRAMID_DPIS[-1])
+
+
+class PageTiles:
+    """
+    Tiles of a page level: the level comes from the raster cache, each tile is written
+    once to the static assets (content-hash names) and the list is remembered per
+    (path, mtime, page, DPI). tile_size 0 = the whole level as one image.
+    """
+
+    def __init__(self, raster_cache, assets, tile_size=TILE_SIZE):
+        self.raster_cache = raster_cache
+        self.assets = assets
+        self.tile_size = tile_size
+        self._levels = OrderedDict()
+        self._building = {}  # key -> Event while one thread cuts the level (e.g. the prefetcher)
+        self._lock = threading.Lock()
+
+    def level(self, pdf_path, page_num, dpi, poppler_path=None):
+        """{'dpi', 'width', 'height', 'tiles': [(x, y, w, h, url), ...]} in level pixels"""
+        key = self.raster_cache.key(pdf_path, page_num, dpi)
+        while True:
+            with self._lock:
+                level = self._levels.get(key)
+                if level is not None:
+                    self._levels.move_to_end(key)
+                event = self._building.get(key)
+            if event is not None:
+                event.wait()  # being built by another thread (e.g. the prefetcher), use its result
+                continue
+            if level is not None and all(self.assets.exists(url) for *_, url in level['tiles']):
+                return level
+            with self._lock:
+                if key not in self._building:
+                    self._building[key] = threading.Event()
+                    break
+
+        try:
+            return self._build(key, pdf_path, page_num, dpi, poppler_path)
+        finally:
+            with self._lock:
+                self._building.pop(key).set()
+
+    def _build(self, key, pdf_path, page_num, dpi, poppler_path):
+        image = self.raster_cache.get_cached(pdf_path, page_num, dpi, poppler_path)
+        size = self.tile_size or max(image.width, image.height)
+        tiles = []
+        for y in range(0, image.height, size):
+            for x in range(0, image.width, size):
+                w, h = min(size, image.width - x), min(size, image.height - y)
+                tile = image if (w, h) == image.size else image.crop((x, y, x + w, y + h))
+                tiles.append((x, y, w, h, self.assets.put_image(tile)))
+        level = {'dpi': dpi, 'width': image.width, 'height': image.height, 'tiles': tiles}
+        with self._lock:
+            self._levels[key] = level
+            while len(self._levels) > TILE_MEMO_LEVELS:
+                self._levels.popitem(last=False)
+        return level
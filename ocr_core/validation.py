@@ -0,0 +1,83 @@
+"""Sanity checks on parsed page data (used to decide OCR escalation)"""
+import re
+
+
+def tax_id_checksum_ok(tax_id):
+    """Thai 13-digit tax ID: last digit = (11 - sum(d[i] * (13 - i)) % 11) % 10"""
+    digits = re.sub(r"\D", "", str(tax_id or ""))
+    if len(digits) != 13:
+        return False
+    total = sum(int(d) * (13 - i) for i, d in enumerate(digits[:12]))
+    return (11 - total % 11) % 10 == int(digits[12])
+
+
+def parse_amount(amount):
+    """"1,234.50" -> 1234.5, None if empty/invalid"""
+    try:
+        return float(str(amount).replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def amount_ok(amount):
+    """Amount parses as a positive number ("1,234.50")"""
+    number = parse_amount(amount)
+    return number is not None and number > 0
+
+
+def amounts_reconcile(parsed):
+    """VAT total and withholding tax (when found) must be valid numbers not above the amount"""
+    amount = parse_amount(parsed.get("amount", ""))
+    for field_name in ("total_amount", "withholding_tax"):
+        value = parsed_value(parsed, field_name)
+        if not value:
+            continue
+        number = parse_amount(value)
+        if number is None or number < 0 or (amount is not None and number > amount):
+            return False
+    return True
+
+
+def parsed_value(parsed, field_name):
+    """Value of a fixed or extra field of a parse result"""
+    if field_name in parsed:
+        return parsed[field_name]
+    return parsed.get("extra_fields", {}).get(field_name, "")
+
+
+def required_fields(templates, doc_type):
+    """Names of the fields marked "required" for a document type (plus required common fields)"""
+    if not templates:
+        return ["document_no", "date", "tax_id"]
+    fields = [name for name, config in templates.get("common_fields", {}).items() if config.get("required")]
+    template = templates.get("templates", {}).get(doc_type, {})
+    fields += [name for name, config in template.get("fields", {}).items() if config.get("required")]
+    return fields
+
+
+def has_field(templates, doc_type, field_name):
+    """The document type defines the field (no templates = built-in invoice layout, which has all of them)"""
+    if not templates:
+        return True
+    template = templates.get("templates", {}).get(doc_type, {})
+    return field_name in template.get("fields", {}) or field_name in templates.get("common_fields", {})
+
+
+def validate_parsed(parsed, templates):
+    """
+    Problems of a parse result: missing required fields, tax ID failing the checksum,
+    amount not a positive number (document types with an amount field only),
+    VAT / withholding tax above the amount.
+    Empty list = page looks good.
+    """
+    doc_type = parsed.get("document_type")
+    required = required_fields(templates, doc_type)
+    problems = [f"missing {name}" for name in required if not parsed_value(parsed, name)]
+    if parsed.get("tax_id") and not tax_id_checksum_ok(parsed["tax_id"]):
+        problems.append("invalid tax_id")
+    checks_amount = "amount" in required or has_field(templates, doc_type, "amount")
+    if checks_amount and "missing amount" not in problems and not amount_ok(parsed.get("amount", "")):
+        problems.append("invalid amount")
+    if not amounts_reconcile(parsed):
+        problems.append("amounts do not reconcile")
+    return problems
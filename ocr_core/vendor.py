@@ -0,0 +1,431 @@
+"""Vendor master (Vendor_branch.xlsx) loading, cleaning, compiled cache and Vendor code mapping"""
+import os
+import re
+import time
+import pickle
+import hashlib
+import threading
+from collections import namedtuple
+
+import openpyxl
+import pandas as pd
+
+from .fuzzy import FuzzyTaxIndex
+from .validation import tax_id_checksum_ok
+from .config import SCRIPT_DIR, VENDOR_MASTER_FILE, VENDOR_CACHE, VENDOR_WATCH_INTERVAL, VENDOR_DB
+
+TAX_COL = 'เลขประจำตัวผู้เสียภาษี'
+BRANCH_COL = 'สาขา'
+VENDOR_CODE_COL = 'Vendor code SAP'
+NAME_COL = 'ชื่อบริษัท'
+
+# Head office wording in a branch cell -> "00000"
+HEAD_OFFICE_PATTERN = r'(?:สำนักงานใหญ่|สนญ|Head\s*Office|H\.?O\.?)'
+
+# Bump when the cleaning rules / cached layout change
+VENDOR_CACHE_VERSION = 1
+
+
+def clean_tax_id(x):
+    """Tax ID: digits only"""
+    if x is None or pd.isna(x):
+        return ""
+    return re.sub(r'\D', '', str(x).strip())
+
+
+def clean_branch(x):
+    """Branch: "สำนักงานใหญ่"/"Head Office" -> "00000", digits padded to 5 ("0" -> "00000")"""
+    if x is None or pd.isna(x):
+        return ""
+    x = str(x).strip()
+    if re.search(HEAD_OFFICE_PATTERN, x, re.IGNORECASE):
+        return "00000"
+    if x.isdigit():
+        return x.zfill(5)
+    return x
+
+
+def normalize_tax_ids(series):
+    """clean_tax_id for a whole column"""
+    return series.fillna('').astype(str).str.replace(r'\D', '', regex=True)
+
+
+def normalize_branches(series):
+    """clean_branch for a whole column"""
+    s = series.fillna('').astype(str).str.strip()
+    s = s.where(~s.str.fullmatch(r'\d+'), s.str.zfill(5))
+    return s.mask(s.str.contains(HEAD_OFFICE_PATTERN, case=False, regex=True), "00000")
+
+
+# --- Reading / cleaning ---
+def count_sheet_rows(ws):
+    """
+    Rows of a read-only worksheet from its stored dimension (no cell parsing);
+    streams the rows only when the dimension is missing or says "empty"
+    """
+    max_row = ws.max_row
+    if max_row and max_row > 1:
+        return max_row
+    return sum(1 for _ in ws.iter_rows(values_only=True))
+
+
+def select_vendor_sheet(path):
+    """Sheet with the most data rows (first sheet if all are empty), from workbook metadata"""
+    wb = openpyxl.load_workbook(path, read_only=True, keep_links=False)
+    try:
+        max_rows = 0
+        best_sheet = wb.sheetnames[0]
+        for ws in wb.worksheets:
+            data_rows = count_sheet_rows(ws) - 1  # header row
+            if data_rows > max_rows:
+                max_rows = data_rows
+                best_sheet = ws.title
+        return best_sheet
+    finally:
+        wb.close()
+
+
+def read_vendor_master(path):
+    """Parse the master workbook (only the selected sheet) and clean tax ID / branch; returns (df, sheet_name)"""
+    sheet_name = select_vendor_sheet(path)
+    df = pd.read_excel(path, sheet_name=sheet_name, dtype=str)
+    df.columns = df.columns.str.strip()
+    
+    if TAX_COL in df.columns:
+        df[TAX_COL] = df[TAX_COL].fillna('').apply(clean_tax_id)
+    if BRANCH_COL in df.columns:
+        df[BRANCH_COL] = df[BRANCH_COL].fillna('').apply(clean_branch)
+    return df, sheet_name
+
+
+# --- Compiled cache ---
+def vendor_cache_path(path):
+    """.<master file name>.pkl next to the master"""
+    return os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.pkl")
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_vendor_master_frame(path=None):
+    """
+    Cleaned master as (df, sheet_name), through the compiled cache.
+    Cache key: mtime + size (fast path), then SHA-256 of the file (e.g. after a copy / touch).
+    The first load after a change parses the workbook and rewrites the cache.
+    """
+    path = path or os.path.join(SCRIPT_DIR, VENDOR_MASTER_FILE)
+    if not VENDOR_CACHE:
+        return read_vendor_master(path)
+    
+    stat = os.stat(path)
+    cache_path = vendor_cache_path(path)
+    cached = None
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+            if cached.get("version") != VENDOR_CACHE_VERSION:
+                cached = None
+        except Exception:
+            cached = None
+    
+    if cached and cached["mtime"] == stat.st_mtime and cached["size"] == stat.st_size:
+        return cached["df"], cached["sheet"]
+    
+    sha256 = file_sha256(path)
+    if cached and cached["sha256"] == sha256:
+        df, sheet_name = cached["df"], cached["sheet"]
+    else:
+        df, sheet_name = read_vendor_master(path)
+    
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({
+                "version": VENDOR_CACHE_VERSION,
+                "mtime": stat.st_mtime,
+                "size": stat.st_size,
+                "sha256": sha256,
+                "sheet": sheet_name,
+                "df": df
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Warning: Could not write vendor master cache: {e}")
+    return df, sheet_name
+
+
+# --- Lookup index / shared store (app.py) ---
+def find_vendor_code_column(columns):
+    """Vendor code column: first name containing "vendor" and "code" ("Vendor code SAP", "Vendor code SA", ...)"""
+    for col in columns:
+        col_lower = str(col).lower()
+        if 'vendor' in col_lower and 'code' in col_lower:
+            return col
+    return None
+
+
+def build_vendor_index(master):
+    """
+    Lookup index of a cleaned master (built once per master version)
+    - by_key: (tax ID, branch) -> {'code', 'name'} (first row wins)
+    - by_tax: tax ID -> [(branch, code, name), ...] ("same tax ID, other branches")
+    - code_col: detected Vendor code column (None = index is empty)
+    """
+    index = {'by_key': {}, 'by_tax': {}, 'code_col': None}
+    if TAX_COL not in master.columns or BRANCH_COL not in master.columns:
+        return index
+    
+    index['code_col'] = find_vendor_code_column(master.columns)
+    if not index['code_col']:
+        return index
+    
+    def clean_value(x):
+        x = str(x).strip() if x is not None and pd.notna(x) else ""
+        return "" if x.lower() == 'nan' else x
+    
+    names = master[NAME_COL] if NAME_COL in master.columns else [""] * len(master)
+    for tax, br, code, name in zip(master[TAX_COL], master[BRANCH_COL], master[index['code_col']], names):
+        entry = {}
+        code, name = clean_value(code), clean_value(name)
+        if code:
+            entry['code'] = code
+        if name:
+            entry['name'] = name
+        index['by_key'].setdefault((tax, br), entry)
+        index['by_tax'].setdefault(tax, []).append((br, code, name))
+    return index
+
+
+def vendor_suggestions(index, tax_id, branch="", limit=5):
+    """
+    Masters whose tax ID is one edit away from tax_id (OCR misread one digit), as
+    [{'tax_id', 'branch', 'code', 'name', 'checksum_ok'}]: checksum-valid IDs first,
+    then rows of the same branch first. The fuzzy index is built on first use.
+    """
+    if not tax_id or not index.get('by_tax'):
+        return []
+    if index.get('fuzzy') is None:
+        index['fuzzy'] = FuzzyTaxIndex(index['by_tax'].keys())
+    
+    suggestions = []
+    for candidate in index['fuzzy'].candidates(tax_id):
+        rows = [row for row in index['by_tax'][candidate] if row[1]]
+        rows.sort(key=lambda row: row[0] != branch)
+        for br, code, name in rows:
+            suggestions.append({
+                'tax_id': candidate, 'branch': br, 'code': code, 'name': name,
+                'checksum_ok': tax_id_checksum_ok(candidate)
+            })
+    return suggestions[:limit]
+
+
+def remap_vendor_codes(df, index, col_vid, col_branch, col_vcode, col_vname=None):
+    """
+    Look up every row's (tax ID, branch) in one pass and write Vendor code / name in place.
+    Rows without a match keep their current values (same rule as the per-row lookup).
+    Returns (changed, matched): rows whose code changed, rows that matched the master.
+    """
+    tax = normalize_tax_ids(df[col_vid])
+    branch = normalize_branches(df[col_branch])
+    by_key = index['by_key']
+    keys = list(zip(tax, branch))
+    if hasattr(by_key, 'lookup_many'):
+        found = by_key.lookup_many(keys)  # SQLite: one batch join instead of a query per row
+        entries = [found.get(key) if key[0] and key[1] else None for key in keys]
+    else:
+        entries = [by_key.get(key) if key[0] and key[1] else None for key in keys]
+    codes = pd.Series([e.get('code') if e else None for e in entries], index=df.index, dtype=object)
+    names = pd.Series([e.get('name') if e else None for e in entries], index=df.index, dtype=object)
+    
+    matched = codes.notna()
+    if col_vcode not in df.columns:
+        df[col_vcode] = ""
+    old_codes = df[col_vcode].fillna('').astype(str).str.strip()
+    changed = matched & (old_codes != codes)
+    
+    df.loc[matched, col_vcode] = codes[matched]
+    if col_vname and col_vname in df.columns:
+        named = matched & names.notna()
+        df.loc[named, col_vname] = names[named]
+    return int(changed.sum()), int(matched.sum())
+
+
+def format_vendor_suggestions(suggestions):
+    """"0105551234567/00000 -> 9102077; ..." for the summary workbook"""
+    return "; ".join(f"{s['tax_id']}/{s['branch']} -> {s['code']}" for s in suggestions)
+
+
+# One immutable version of the master; readers grab `store.snapshot` once and use it throughout
+VendorSnapshot = namedtuple("VendorSnapshot", ["version", "mtime", "df", "index", "sheet", "error", "rows"])
+
+
+class VendorMasterStore:
+    """
+    Process-wide vendor master + index. A daemon thread polls the file mtime every
+    VENDOR_WATCH_INTERVAL seconds and swaps in a new snapshot (a single reference
+    assignment, so readers never see a half-built version). A failed reload keeps
+    the previous good snapshot. With db_path (OCR_VENDOR_DB) the master lives in
+    SQLite: snapshot.df is None and snapshot.index answers lookups by query on the
+    store's single VendorDB connection, which each reload re-syncs in place.
+    """
+    
+    def __init__(self, path, watch_interval=VENDOR_WATCH_INTERVAL, db_path=VENDOR_DB):
+        self.path = path
+        self.db_path = db_path
+        self.watch_interval = watch_interval
+        self.snapshot = VendorSnapshot(0, None, None, None, None, "not loaded", 0)
+        self.last_error = None
+        self._db = None  # VendorDB of SQLite mode, opened once and kept for the process
+        self._lock = threading.Lock()
+        self.reload()
+        if watch_interval > 0:
+            threading.Thread(target=self._watch, name="vendor-master-watcher", daemon=True).start()
+    
+    def reload(self, force=False):
+        """Load the file if its mtime changed (or force); returns the current snapshot"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                self.last_error = str(e)  # file gone: keep serving the previous good snapshot
+                if self.snapshot.index is None:
+                    self.snapshot = self.snapshot._replace(error=str(e))
+                return self.snapshot
+            
+            if not force and mtime == self.snapshot.mtime and self.snapshot.index is not None:
+                return self.snapshot
+            
+            try:
+                if self.db_path:
+                    # SQLite mode: no DataFrame, lookups are queries on the synced table
+                    if self._db is None:
+                        from .vendor_db import VendorDB
+                        self._db = VendorDB(self.db_path)
+                    db = self._db
+                    db.sync(self.path, force=force)
+                    df, index, sheet_name, rows = None, db.index(), db.sheet, db.count()
+                else:
+                    df, sheet_name = load_vendor_master_frame(self.path)
+                    index, rows = build_vendor_index(df), len(df)
+                self.snapshot = VendorSnapshot(self.snapshot.version + 1, mtime, df, index, sheet_name, None, rows)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                if self.snapshot.index is None:
+                    self.snapshot = self.snapshot._replace(mtime=mtime, error=str(e))
+            return self.snapshot
+    
+    def _watch(self):
+        while True:
+            time.sleep(self.watch_interval)
+            self.reload()
+
+
+def open_vendor_db(path, db_path, force=False):
+    """VendorDB at db_path, re-imported from path when the workbook changed"""
+    from .vendor_db import VendorDB
+    db = VendorDB(db_path)
+    try:
+        db.sync(path, force=force)
+    except Exception:
+        db.close()
+        raise
+    return db
+
+
+# --- Extraction scripts ---
+def load_vendor_master(path=None):
+    """
+    Load vendor master data from Excel file (None if missing or invalid).
+    With OCR_VENDOR_DB set, returns a synced VendorDB instead of a DataFrame.
+    """
+    path = path or os.path.join(SCRIPT_DIR, VENDOR_MASTER_FILE)
+    if not os.path.exists(path):
+        print(f"Warning: Vendor master file not found: {os.path.basename(path)} in {os.path.dirname(path)}")
+        return None
+    
+    if VENDOR_DB:
+        try:
+            print(f"Loading Vendor Master from: {path} (SQLite: {VENDOR_DB})")
+            db = open_vendor_db(path, VENDOR_DB)
+            print(f"Vendor Master rows: {db.count()}")
+            return db
+        except Exception as e:
+            print(f"Error reading Vendor file: {e}")
+            return None
+    
+    try:
+        print(f"Loading Vendor Master from: {path}")
+        df, _ = load_vendor_master_frame(path)
+        
+        req_cols = [TAX_COL, BRANCH_COL, VENDOR_CODE_COL]
+        if not all(col in df.columns for col in req_cols):
+            print(f"Error: Missing columns in Master file (required: {req_cols})")
+            return None
+        
+        # Also get company name if available
+        cols_to_return = [TAX_COL, BRANCH_COL, VENDOR_CODE_COL]
+        if NAME_COL in df.columns:
+            cols_to_return.append(NAME_COL)
+        
+        return df[cols_to_return]
+        
+    except Exception as e:
+        print(f"Error reading Vendor file: {e}")
+        return None
+
+
+def add_vendor_suggestions(df, make_index):
+    """
+    "Vendor Suggestion" column for rows with a tax ID but no Vendor code;
+    make_index() is called only when there are such rows (every row matched = no index built)
+    """
+    unmatched = df['Vendor code'].isna() & (df['VendorID_OCR'].fillna('') != '')
+    df['Vendor Suggestion'] = ""
+    if unmatched.any():
+        index = make_index()
+        for i in df.index[unmatched]:
+            suggestions = vendor_suggestions(index, df.at[i, 'VendorID_OCR'], df.at[i, 'Branch_OCR'], limit=3)
+            df.at[i, 'Vendor Suggestion'] = format_vendor_suggestions(suggestions)
+        print(f"Vendor suggestions (tax ID one digit off) for {int((df['Vendor Suggestion'] != '').sum())} "
+              f"of {int(unmatched.sum())} unmatched row(s)")
+    return df
+
+
+def merge_vendor_codes(df, vendor_df):
+    """
+    Add "Vendor code" (and company name) to the summary rows by (VendorID_OCR, Branch_OCR).
+    vendor_df may be a DataFrame or a VendorDB (batch join in SQLite).
+    """
+    if vendor_df is None:
+        df['Vendor code'] = ""
+        return df
+    
+    print("\nMapping Vendor Code...")
+    if hasattr(vendor_df, 'lookup_many'):
+        keys = list(zip(df['VendorID_OCR'].fillna('').astype(str), df['Branch_OCR'].fillna('').astype(str)))
+        found = vendor_df.lookup_many(keys)
+        entries = [found.get(key) for key in keys]
+        df['Vendor code'] = [e.get('code') if e else None for e in entries]
+        if vendor_df.get_meta("has_name"):
+            df[NAME_COL] = [e.get('name') if e else None for e in entries]
+        return add_vendor_suggestions(df, vendor_df.index)
+    
+    df = pd.merge(
+        df,
+        vendor_df,
+        left_on=['VendorID_OCR', 'Branch_OCR'],
+        right_on=[TAX_COL, BRANCH_COL],
+        how='left'
+    )
+    df.rename(columns={VENDOR_CODE_COL: 'Vendor code'}, inplace=True)
+    df.drop(columns=[TAX_COL, BRANCH_COL], inplace=True, errors='ignore')
+    
+    # No exact match: propose masters whose tax ID is one digit away
+    return add_vendor_suggestions(df, lambda: build_vendor_index(vendor_df))
@@ -0,0 +1,240 @@
+"""Optional SQLite vendor master (OCR_VENDOR_DB) for masters too large to keep in pandas"""
+import os
+import sqlite3
+import threading
+
+import openpyxl
+
+from .vendor import TAX_COL, BRANCH_COL, NAME_COL, clean_tax_id, clean_branch, select_vendor_sheet, \
+    find_vendor_code_column, file_sha256
+from .fuzzy import deletions, rank_candidates
+
+IMPORT_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vendors (
+    row_no INTEGER PRIMARY KEY,
+    tax_id TEXT NOT NULL,
+    branch TEXT NOT NULL,
+    code TEXT NOT NULL DEFAULT '',
+    name TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_vendors_tax_branch ON vendors (tax_id, branch);
+CREATE TABLE IF NOT EXISTS tax_keys (key TEXT NOT NULL, tax_id TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_tax_keys_key ON tax_keys (key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Bumped when an import writes tables an older one did not (forces a re-import)
+SCHEMA_VERSION = "2"
+
+# Deletion neighborhood of every distinct tax ID (see fuzzy.FuzzyTaxIndex), built in SQL
+BUILD_TAX_KEYS = """
+WITH RECURSIVE
+    ids(tax_id) AS (SELECT DISTINCT tax_id FROM vendors WHERE tax_id != ''),
+    pos(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM pos WHERE n < (SELECT MAX(length(tax_id)) FROM ids))
+INSERT INTO tax_keys (key, tax_id)
+SELECT tax_id, tax_id FROM ids
+UNION
+SELECT substr(tax_id, 1, n - 1) || substr(tax_id, n + 1), tax_id FROM ids JOIN pos ON n <= length(tax_id)
+"""
+
+
+def cell_text(value):
+    """Excel cell -> stripped string ("" for empty / nan)"""
+    if value is None:
+        return ""
+    text = str(value).strip()
+    return "" if text.lower() == 'nan' else text
+
+
+class VendorDB:
+    """
+    Vendor master in SQLite: table vendors(row_no, tax_id, branch, code, name) with an
+    index on (tax_id, branch). sync() streams the workbook in batches (constant memory)
+    and is skipped when the source file is unchanged. Thread-safe (one connection + lock).
+    """
+    
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+    
+    # --- meta ---
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+    
+    @property
+    def code_col(self):
+        return self.get_meta("code_col")
+    
+    @property
+    def sheet(self):
+        return self.get_meta("sheet")
+    
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM vendors").fetchone()[0]
+    
+    # --- import ---
+    def sync(self, xlsx_path, force=False):
+        """Import the workbook if it changed since the last import; returns True if imported"""
+        stat = os.stat(xlsx_path)
+        source_key = f"{stat.st_mtime}:{stat.st_size}"
+        force = force or self.get_meta("schema") != SCHEMA_VERSION
+        if not force and self.get_meta("source_key") == source_key:
+            return False
+        sha256 = file_sha256(xlsx_path)
+        if not force and self.get_meta("sha256") == sha256:
+            self._set_meta({"source_key": source_key})
+            return False
+        
+        self.import_workbook(xlsx_path)
+        self._set_meta({"source_key": source_key, "sha256": sha256})
+        return True
+    
+    def import_workbook(self, xlsx_path):
+        """
+        Stream the selected sheet into the table (same column rules as the pandas loader:
+        tax ID / branch columns by name, Vendor code = first "vendor"+"code" column,
+        optional company name); the old rows are replaced in one transaction
+        """
+        sheet_name = select_vendor_sheet(xlsx_path)
+        wb = openpyxl.load_workbook(xlsx_path, read_only=True, keep_links=False)
+        try:
+            rows = wb[sheet_name].iter_rows(values_only=True)
+            header = [cell_text(h) for h in next(rows, [])]
+            if TAX_COL not in header or BRANCH_COL not in header:
+                raise ValueError(f"Missing columns in Master file (required: {[TAX_COL, BRANCH_COL]})")
+            code_col = find_vendor_code_column(header)
+            if not code_col:
+                raise ValueError("Vendor code column not found in Master file")
+            
+            tax_i, branch_i, code_i = header.index(TAX_COL), header.index(BRANCH_COL), header.index(code_col)
+            name_i = header.index(NAME_COL) if NAME_COL in header else None
+            
+            def get(row, i):
+                return cell_text(row[i]) if i is not None and i < len(row) else ""
+            
+            with self._lock, self.conn:
+                self.conn.execute("DELETE FROM vendors")
+                batch = []
+                for row_no, row in enumerate(rows, start=1):
+                    batch.append((row_no, clean_tax_id(get(row, tax_i)), clean_branch(get(row, branch_i)),
+                                  get(row, code_i), get(row, name_i)))
+                    if len(batch) >= IMPORT_BATCH_SIZE:
+                        self.conn.executemany("INSERT INTO vendors VALUES (?, ?, ?, ?, ?)", batch)
+                        batch = []
+                if batch:
+                    self.conn.executemany("INSERT INTO vendors VALUES (?, ?, ?, ?, ?)", batch)
+                self.conn.execute("DELETE FROM tax_keys")
+                self.conn.execute(BUILD_TAX_KEYS)
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                    [("code_col", code_col), ("sheet", sheet_name), ("has_name", "1" if name_i is not None else ""),
+                     ("schema", SCHEMA_VERSION)]
+                )
+        finally:
+            wb.close()
+    
+    def _set_meta(self, values):
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(values.items()))
+    
+    # --- lookups ---
+    def lookup(self, tax_id, branch):
+        """{'code', 'name'} of the first row with this (tax ID, branch), or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT code, name FROM vendors WHERE tax_id = ? AND branch = ? ORDER BY row_no LIMIT 1",
+                (tax_id, branch)
+            ).fetchone()
+        if row is None:
+            return None
+        return {k: v for k, v in (('code', row[0]), ('name', row[1])) if v}
+    
+    def rows_by_tax(self, tax_id):
+        """[(branch, code, name), ...] of a tax ID in file order"""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT branch, code, name FROM vendors WHERE tax_id = ? ORDER BY row_no", (tax_id,)
+            ).fetchall()
+    
+    def fuzzy_candidates(self, tax_id):
+        """Tax IDs within one edit of tax_id, via the tax_keys table (no in-memory index)"""
+        if not tax_id:
+            return []
+        keys = list(deletions(tax_id) | {tax_id})
+        with self._lock:
+            found = [r[0] for r in self.conn.execute(
+                f"SELECT DISTINCT tax_id FROM tax_keys WHERE key IN ({', '.join('?' * len(keys))})", keys
+            )]
+        return rank_candidates(tax_id, found)
+    
+    def lookup_many(self, pairs):
+        """Batch join: {(tax ID, branch): {'code', 'name'}} for the pairs found (one query)"""
+        keys = list({(t, b) for t, b in pairs if t and b})
+        if not keys:
+            return {}
+        with self._lock:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS lookup_keys (tax_id TEXT, branch TEXT)")
+            self.conn.execute("DELETE FROM lookup_keys")
+            self.conn.executemany("INSERT INTO lookup_keys VALUES (?, ?)", keys)
+            rows = self.conn.execute(
+                "SELECT k.tax_id, k.branch, v.code, v.name FROM lookup_keys k "
+                "JOIN vendors v ON v.row_no = ("
+                "  SELECT MIN(row_no) FROM vendors WHERE tax_id = k.tax_id AND branch = k.branch)"
+            ).fetchall()
+        return {(t, b): {k: v for k, v in (('code', code), ('name', name)) if v} for t, b, code, name in rows}
+    
+    def index(self):
+        """Same shape as vendor.build_vendor_index(), answered by queries"""
+        return {'by_key': _KeyView(self), 'by_tax': _TaxView(self), 'code_col': self.code_col,
+                'fuzzy': _FuzzyView(self)}
+
+
+class _KeyView:
+    """index['by_key'] backed by VendorDB.lookup"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def get(self, key, default=None):
+        result = self.db.lookup(*key)
+        return default if result is None else result
+    
+    def lookup_many(self, keys):
+        return self.db.lookup_many(keys)
+
+
+class _TaxView:
+    """index['by_tax'] backed by VendorDB.rows_by_tax"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def get(self, tax_id, default=None):
+        return self.db.rows_by_tax(tax_id) or default
+    
+    def __getitem__(self, tax_id):
+        return self.db.rows_by_tax(tax_id)
+    
+    def __bool__(self):
+        return True
+
+
+class _FuzzyView:
+    """index['fuzzy'] backed by VendorDB.fuzzy_candidates (same interface as FuzzyTaxIndex)"""
+    
+    def __init__(self, db):
+        self.db = db
+    
+    def candidates(self, tax_id):
+        return self.db.fuzzy_candidates(tax_id)
@@ -0,0 +1,150 @@
+"""
+Document Editor workbooks read once per file version: the sheet as a DataFrame (same as
+pd.read_excel(dtype=str)) together with the hyperlinks of every row, cached by file identity
+"""
+import os
+import re
+import hashlib
+import threading
+from collections import namedtuple, OrderedDict
+
+import numpy as np
+import openpyxl
+from openpyxl.cell.cell import TYPE_ERROR, TYPE_NUMERIC, TYPE_FORMULA
+from pandas.io.parsers import TextParser
+
+# Workbook sheets kept parsed
+WORKBOOK_CACHE_SHEETS = 8
+
+WorkbookSheet = namedtuple("WorkbookSheet", ["df", "links", "sheet", "sheet_names"])
+
+
+def cell_link(cell):
+    """{'target', 'display'} of a hyperlink object or =HYPERLINK("target", "display") formula, None otherwise"""
+    target = None
+    display = None
+    if cell.hyperlink:
+        target = cell.hyperlink.target
+        display = cell.value if cell.value else target
+    elif isinstance(cell.value, str) and cell.value.strip().upper().startswith("=HYPERLINK"):
+        matches = re.findall(r'["\']([^"\']+)["\']', cell.value.strip())
+        if matches:
+            target = matches[0]
+            display = matches[1] if len(matches) >= 2 else target
+    if target:
+        return {'target': target, 'display': display if display else target}
+    return None
+
+
+def convert_cell(value, data_type):
+    """Cell value as pandas' openpyxl reader converts it"""
+    if value is None:
+        return ""
+    if data_type == TYPE_ERROR:
+        return np.nan
+    if data_type == TYPE_NUMERIC:
+        as_int = int(value)
+        return as_int if as_int == value else float(value)
+    return value
+
+
+def rows_to_frame(data):
+    """DataFrame from converted rows (header first): trailing empty cells/rows trimmed like pd.read_excel"""
+    for row in data:
+        while row and row[-1] == "":
+            row.pop()
+    last = max((i for i, row in enumerate(data) if row), default=-1)
+    data = data[:last + 1]
+    if data:
+        width = max(len(row) for row in data)
+        data = [row + [""] * (width - len(row)) for row in data]
+    return TextParser(data, header=0, dtype=str, skip_blank_lines=False).read()
+
+
+def read_workbook_sheet(source, sheet_name=None):
+    """
+    WorkbookSheet of one sheet (None = the first) read in a single openpyxl pass.
+    links[i] = {column header: {'target', 'display'}} of data row i. Formulas are read as
+    written (for HYPERLINK), so when the sheet has any, their cached values come from a
+    read-only pass over the same sheet, as pd.read_excel would show them.
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    wb = openpyxl.load_workbook(source, data_only=False)
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+        sheet_names = wb.sheetnames
+        data, links, formulas = [], [], []
+        header = []
+        for r, row in enumerate(ws.iter_rows()):
+            values = []
+            row_links = {}
+            for c, cell in enumerate(row):
+                if cell.data_type == TYPE_FORMULA:
+                    formulas.append((r, c))
+                values.append(convert_cell(cell.value, cell.data_type))
+                if r == 0:
+                    header.append(cell.value)
+                else:
+                    link = cell_link(cell)
+                    if link:
+                        row_links[header[c] if c < len(header) else None] = link
+            data.append(values)
+            if r > 0:
+                links.append(row_links)
+        title = ws.title
+    finally:
+        wb.close()
+
+    if formulas:
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        wb = openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        try:
+            wanted = set(formulas)
+            for r, row in enumerate(wb[title].iter_rows()):
+                for c, cell in enumerate(row):
+                    if (r, c) in wanted:
+                        data[r][c] = convert_cell(cell.value, cell.data_type)
+        finally:
+            wb.close()
+
+    return WorkbookSheet(rows_to_frame(data), links, title, sheet_names)
+
+
+def source_identity(source):
+    """Identity of a workbook version: (path, mtime, size) or the upload's id/content hash"""
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        return (os.path.abspath(source), stat.st_mtime, stat.st_size)
+    file_id = getattr(source, 'file_id', None)
+    if file_id:
+        return ('upload', file_id)
+    return ('upload', hashlib.sha1(source.getvalue()).hexdigest())
+
+
+class WorkbookCache:
+    """
+    Thread-safe LRU of parsed sheets keyed by (file identity, sheet). get() does no Excel I/O
+    while the file is unchanged; the DataFrame is shared, callers copy it before editing.
+    """
+
+    def __init__(self, max_sheets=WORKBOOK_CACHE_SHEETS):
+        self.max_sheets = max_sheets
+        self._sheets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, source, sheet_name=None):
+        key = (source_identity(source), sheet_name)
+        with self._lock:
+            sheet = self._sheets.get(key)
+            if sheet is not None:
+                self._sheets.move_to_end(key)
+                return sheet
+        sheet = read_workbook_sheet(source, sheet_name)
+        with self._lock:
+            self._sheets[key] = sheet
+            self._sheets[(key[0], sheet.sheet)] = sheet  # also found by its name when opened as "first sheet"
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last=False)
+        return sheet
@@ -0,0 +1,53 @@
+#!/bin/bash
+# Cross-platform script to run Tesseract OCR processing (offline)
+
+# Get script directory
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+# Change to script directory
+cd "$SCRIPT_DIR"
+
+# Check if Python is available
+if command -v python3 &> /dev/null; then
+    PYTHON_CMD="python3"
+elif command -v python &> /dev/null; then
+    PYTHON_CMD="python"
+else
+    echo "[ERROR] Python not found! Please install Python 3.9 or higher."
+    exit 1
+fi
+
+echo "========================================"
+echo "  OCR Tesseract Processing (Offline)"
+echo "========================================"
+echo ""
+
+# Check if Tesseract is installed
+if ! command -v tesseract &> /dev/null && [ -z "$TESSERACT_PATH" ]; then
+    echo "[WARNING] Tesseract not found in PATH."
+    echo "Install: sudo apt-get install tesseract-ocr tesseract-ocr-tha (Linux)"
+    echo "         brew install tesseract tesseract-lang (macOS)"
+    echo ""
+fi
+
+echo "Starting OCR process..."
+echo ""
+
+# Run the OCR script with arguments
+$PYTHON_CMD Extract_Inv_tesseract.py "$@"
+
+EXIT_CODE=$?
+
+echo ""
+echo "========================================"
+if [ $EXIT_CODE -eq 0 ]; then
+    echo "[SUCCESS] OCR process completed!"
+else
+    echo "[ERROR] OCR process failed with return code: $EXIT_CODE"
+    echo "Check output above for details"
+fi
+echo "========================================"
+
+exit $EXIT_CODE
+
+
@@ -0,0 +1,34 @@
+import pandas as pd
+
+from ocr_core.output import build_summary_row, drop_stale_summary_rows
+
+
+def summary_row(path, page=1):
+    parsed = {
+        "document_type_name": "Invoice",
+        "tax_id": "",
+        "branch": "",
+        "document_no": "",
+        "date": "",
+        "amount": "",
+    }
+    return build_summary_row(str(path), page, parsed)
+
+
+def test_drop_stale_summary_rows(tmp_path):
+    source, other = tmp_path / "source", tmp_path / "other"
+    source.mkdir()
+    other.mkdir()
+    (source / "kept.pdf").write_bytes(b"%PDF")
+    (other / "moved.pdf").write_bytes(b"%PDF")
+    previous = pd.DataFrame([
+        summary_row(source / "kept.pdf"),
+        summary_row(source / "deleted.pdf"),
+        summary_row(other / "moved.pdf"),
+        {"Link PDF": "", "Page": ""},
+    ])
+
+    kept, dropped = drop_stale_summary_rows(previous, str(source))
+
+    assert dropped == 2
+    assert list(kept["Link PDF"]) == [previous["Link PDF"][0], ""]
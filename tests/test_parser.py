@@ -0,0 +1,22 @@
+from ocr_core.parser import parse_ocr_data_with_template, record_parse_hits
+from ocr_core.templates import load_templates
+
+INVOICE_TEXT = """ใบกำกับภาษี / Tax Invoice
+เลขประจำตัวผู้เสียภาษี 0105551234567 สำนักงานใหญ่
+เลขที่ INV-2024-001
+วันที่ 05/01/2024
+รวมเงินทั้งสิ้น 1,070.00
+"""
+
+
+def test_record_parse_hits_matches_hits_recorded_while_parsing():
+    templates = load_templates()
+    recorded = {}
+    parsed = parse_ocr_data_with_template(INVOICE_TEXT, templates, "auto", recorded)
+    assert recorded
+
+    deferred = {}
+    parsed = parse_ocr_data_with_template(INVOICE_TEXT, templates, "auto", deferred, record_hits=False)
+    assert deferred == {}
+    record_parse_hits(deferred, parsed, templates)
+    assert deferred == recorded
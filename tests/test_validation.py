@@ -0,0 +1,27 @@
+from ocr_core.templates import load_templates
+from ocr_core.validation import validate_parsed
+
+
+def test_delivery_note_without_amount_is_valid():
+    parsed = {
+        "document_type": "delivery_note",
+        "document_no": "DN-2024-001",
+        "date": "05/01/2024",
+        "tax_id": "0105551234567",
+        "branch": "00000",
+        "amount": "",
+        "extra_fields": {"po_reference": "PO-001"},
+    }
+    assert validate_parsed(parsed, load_templates()) == []
+
+
+def test_invoice_without_amount_is_invalid():
+    parsed = {
+        "document_type": "invoice",
+        "document_no": "INV-2024-001",
+        "date": "05/01/2024",
+        "tax_id": "0105551234567",
+        "branch": "00000",
+        "amount": "",
+    }
+    assert "invalid amount" in validate_parsed(parsed, load_templates())